@@ -0,0 +1,287 @@
+"""
+Armazém colunar da chuva, particionado por mês.
+
+Estrutura em disco (RAIZ_ARMAZEM):
+    estacoes.csv    tabela de estações (id, codestacao, nome, cidade, uf, latitude, longitude, id_sensor)
+    AAAA-MM.npz     uma partição por mês com as colunas tipadas:
+                      datahora      int64   segundos desde 1970 no horário local de Recife (sem fuso)
+                      estacao       int32   id da estação em estacoes.csv
+                      valor         float64 medida de chuva (mm)
+                      qualificacao  int16   código de qualificação do CEMADEN (-1 = ausente)
+
+As linhas de cada partição ficam ordenadas por (datahora, estacao), então a leitura
+de um intervalo de datas é uma busca binária, sem reparsear texto.
+
+Uso:
+    python armazem_chuva.py migrar     # converte os chuva_recife_*.csv existentes
+    python armazem_chuva.py migrar --desde-manifesto --todas-cidades   # dias desde o último calculado (workflow diário)
+    python armazem_chuva.py resumo     # lista as partições e o número de leituras
+"""
+import os
+import re
+import sys
+import glob
+import hashlib
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+RAIZ_ARMAZEM = os.path.join('dados', 'chuva')
+ARQUIVO_ESTACOES = 'estacoes.csv'
+COLUNAS_ESTACOES = ['id', 'codestacao', 'nome', 'cidade', 'uf', 'latitude', 'longitude', 'id_sensor']
+# Mesma ordem de colunas dos arquivos chuva_recife_*.csv
+COLUNAS_CSV = ['cidade', 'codestacao', 'datahora', 'id_sensor', 'latitude', 'longitude', 'nome', 'offset', 'qualificacao', 'uf', 'valor']
+
+def _para_epoch(datahora):
+    """Converte datas (texto ou datetime, horário local) para segundos desde 1970."""
+    return pd.to_datetime(datahora).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+def _inicio_do_dia(data):
+    return int(pd.Timestamp(data).normalize().value // 10**9)
+
+def _caminho_particao(mes, raiz):
+    return os.path.join(raiz, f"{mes}.npz")
+
+def listar_particoes(raiz=RAIZ_ARMAZEM):
+    """Meses (AAAA-MM) com partição gravada, em ordem cronológica."""
+    arquivos = glob.glob(os.path.join(raiz, '*.npz'))
+    return sorted(os.path.basename(a)[:-4] for a in arquivos if re.fullmatch(r'\d{4}-\d{2}\.npz', os.path.basename(a)))
+
+def existe_armazem(raiz=RAIZ_ARMAZEM):
+    return bool(listar_particoes(raiz))
+
+def carregar_estacoes(raiz=RAIZ_ARMAZEM):
+    caminho = os.path.join(raiz, ARQUIVO_ESTACOES)
+    if not os.path.exists(caminho):
+        return pd.DataFrame(columns=COLUNAS_ESTACOES)
+    return pd.read_csv(caminho, dtype={'codestacao': str})
+
+def _salvar_estacoes(df_estacoes, raiz):
+    caminho = os.path.join(raiz, ARQUIVO_ESTACOES)
+    tmp = f"{caminho}.tmp"
+    df_estacoes[COLUNAS_ESTACOES].to_csv(tmp, index=False)
+    os.replace(tmp, caminho)
+
+def ler_particao(mes, raiz=RAIZ_ARMAZEM):
+    """Lê as colunas brutas de uma partição; devolve um dict de arrays (vazios se não existir)."""
+    caminho = _caminho_particao(mes, raiz)
+    if not os.path.exists(caminho):
+        return {
+            'datahora': np.empty(0, np.int64), 'estacao': np.empty(0, np.int32),
+            'valor': np.empty(0, np.float64), 'qualificacao': np.empty(0, np.int16),
+        }
+    with np.load(caminho) as npz:
+        return {k: npz[k] for k in ('datahora', 'estacao', 'valor', 'qualificacao')}
+
+def _gravar_particao(mes, colunas, raiz):
+    caminho = _caminho_particao(mes, raiz)
+    tmp = f"{caminho}.tmp.npz"
+    np.savez(tmp, **colunas)
+    os.replace(tmp, caminho)
+
+def _registrar_estacoes(df, raiz):
+    """Garante que toda estação do lote está na tabela de estações; devolve o mapa codestacao -> id."""
+    df_estacoes = carregar_estacoes(raiz)
+    atributos = df.drop_duplicates('codestacao', keep='last').set_index('codestacao')
+    alterou = False
+    for cod, linha in atributos.iterrows():
+        campos = {c: linha[c] for c in COLUNAS_ESTACOES[2:] if c in linha.index}
+        existente = df_estacoes.index[df_estacoes['codestacao'] == cod]
+        if len(existente) == 0:
+            novo_id = int(df_estacoes['id'].max()) + 1 if not df_estacoes.empty else 1
+            df_estacoes = pd.concat([df_estacoes, pd.DataFrame([{'id': novo_id, 'codestacao': cod, **campos}])], ignore_index=True)
+            alterou = True
+        else:
+            i = existente[0]
+            for c, v in campos.items():
+                if pd.notna(v) and df_estacoes.at[i, c] != v:
+                    df_estacoes.at[i, c] = v
+                    alterou = True
+    if alterou:
+        _salvar_estacoes(df_estacoes, raiz)
+    return dict(zip(df_estacoes['codestacao'], df_estacoes['id'].astype(np.int32)))
+
+def gravar_chuva(df_chuva, raiz=RAIZ_ARMAZEM):
+    """
+    Grava leituras no formato dos CSVs do CEMADEN (colunas de COLUNAS_CSV).
+    Só as partições dos meses presentes no lote são reescritas; leituras repetidas
+    (mesma estação e horário) são substituídas pela versão mais recente.
+    Devolve o número de partições reescritas.
+    """
+    if df_chuva.empty:
+        return 0
+    os.makedirs(raiz, exist_ok=True)
+    df = df_chuva.copy()
+    df['codestacao'] = df['codestacao'].astype(str)
+    ids = _registrar_estacoes(df, raiz)
+
+    datahora = _para_epoch(df['datahora'])
+    estacao = df['codestacao'].map(ids).to_numpy(np.int32)
+    valor = pd.to_numeric(df['valor'], errors='coerce').to_numpy(np.float64)
+    qualificacao = pd.to_numeric(df.get('qualificacao'), errors='coerce') if 'qualificacao' in df else pd.Series(np.nan, index=df.index)
+    qualificacao = qualificacao.fillna(-1).to_numpy(np.int16)
+    meses = datahora.astype('datetime64[s]').astype('datetime64[M]').astype(str)
+
+    reescritas = 0
+    for mes in np.unique(meses):
+        sel = meses == mes
+        atual = ler_particao(mes, raiz)
+        colunas = {
+            'datahora': np.concatenate([atual['datahora'], datahora[sel]]),
+            'estacao': np.concatenate([atual['estacao'], estacao[sel]]),
+            'valor': np.concatenate([atual['valor'], valor[sel]]),
+            'qualificacao': np.concatenate([atual['qualificacao'], qualificacao[sel]]),
+        }
+        # Ordena por (datahora, estacao) de forma estável e fica com a última ocorrência de cada chave
+        ordem = np.lexsort((colunas['estacao'], colunas['datahora']))
+        colunas = {k: v[ordem] for k, v in colunas.items()}
+        ultima = np.ones(len(ordem), dtype=bool)
+        ultima[:-1] = (colunas['datahora'][1:] != colunas['datahora'][:-1]) | (colunas['estacao'][1:] != colunas['estacao'][:-1])
+        colunas = {k: v[ultima] for k, v in colunas.items()}
+
+        if all(np.array_equal(colunas[k], atual[k], equal_nan=(k == 'valor')) for k in colunas):
+            continue
+        reescritas += 1
+        _gravar_particao(mes, colunas, raiz)
+    return reescritas
+
+def _meses_entre(inicio, fim):
+    return [str(m) for m in np.arange(np.datetime64(inicio, 'M'), np.datetime64(fim, 'M') + 1)]
+
+def carregar_chuva(inicio, fim=None, estacoes=None, raiz=RAIZ_ARMAZEM):
+    """
+    Carrega as leituras entre as datas `inicio` e `fim` (inclusivas), lendo apenas as
+    partições dos meses envolvidos. `estacoes` filtra por código ou nome de estação.
+    Devolve um DataFrame com as colunas dos CSVs e `datahora` já como datetime.
+    """
+    fim = fim if fim is not None else inicio
+    ini_s = _inicio_do_dia(inicio)
+    fim_s = _inicio_do_dia(fim) + 86400
+    df_estacoes = carregar_estacoes(raiz)
+
+    ids_filtro = None
+    if estacoes is not None:
+        alvo = set(estacoes)
+        ids_filtro = df_estacoes.loc[df_estacoes['codestacao'].isin(alvo) | df_estacoes['nome'].isin(alvo), 'id'].to_numpy(np.int32)
+
+    pedacos = []
+    for mes in _meses_entre(pd.Timestamp(inicio).strftime('%Y-%m'), pd.Timestamp(fim).strftime('%Y-%m')):
+        colunas = ler_particao(mes, raiz)
+        a, b = np.searchsorted(colunas['datahora'], [ini_s, fim_s], side='left')
+        colunas = {k: v[a:b] for k, v in colunas.items()}
+        if ids_filtro is not None:
+            sel = np.isin(colunas['estacao'], ids_filtro)
+            colunas = {k: v[sel] for k, v in colunas.items()}
+        if len(colunas['datahora']):
+            pedacos.append(colunas)
+
+    if not pedacos:
+        return pd.DataFrame(columns=COLUNAS_CSV)
+    colunas = {k: np.concatenate([p[k] for p in pedacos]) for k in pedacos[0]}
+    return montar_dataframe(colunas, df_estacoes)
+
+def montar_dataframe(colunas, df_estacoes):
+    """Junta as colunas brutas de uma partição com a tabela de estações no formato dos CSVs."""
+    qualificacao = pd.Series(colunas['qualificacao']).astype('Int16')
+    df = pd.DataFrame({
+        'estacao': colunas['estacao'],
+        'datahora': colunas['datahora'].astype('datetime64[s]').astype('datetime64[ns]'),
+        'offset': np.nan,
+        'qualificacao': qualificacao.mask(qualificacao < 0),
+        'valor': colunas['valor'],
+    })
+    df = df.merge(df_estacoes.rename(columns={'id': 'estacao'}), on='estacao', how='left', sort=False)
+    return df[COLUNAS_CSV]
+
+def resumo_por_dia(mes, raiz=RAIZ_ARMAZEM):
+    """Número de leituras e um hash do conteúdo de cada dia da partição (para detectar mudanças)."""
+    colunas = ler_particao(mes, raiz)
+    dias = (colunas['datahora'] // 86400).astype(np.int64)
+    resumo = {}
+    if not len(dias):
+        return resumo
+    cortes = np.flatnonzero(np.diff(dias)) + 1
+    for a, b in zip(np.r_[0, cortes], np.r_[cortes, len(dias)]):
+        h = hashlib.sha256()
+        for k in ('datahora', 'estacao', 'valor', 'qualificacao'):
+            h.update(np.ascontiguousarray(colunas[k][a:b]).tobytes())
+        data = str(np.datetime64(int(dias[a]), 'D'))
+        resumo[data] = {'sha256': h.hexdigest(), 'linhas': int(b - a)}
+    return resumo
+
+def ultimo_dia_manifesto(caminho):
+    """Último dia (AAAA-MM-DD) já calculado segundo o manifesto da CLI de risco, ou None."""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return max(json.load(f).get('dias') or {}, default=None)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def migrar_csvs(padrao='chuva_recife_*.csv', raiz=RAIZ_ARMAZEM, dias=None, desde=None):
+    """
+    Converte o histórico de CSVs diários para o armazém. Quando a mesma leitura
+    aparece em mais de um arquivo, vale a do arquivo do próprio dia da leitura.
+    Com `dias`, só os arquivos dos últimos `dias` dias (pela data no nome) entram;
+    com `desde`, só os de `desde` em diante.
+    """
+    arquivos = sorted(glob.glob(padrao))
+    if dias or desde:
+        datas = [re.search(r'(\d{4}-\d{2}-\d{2})', a) for a in arquivos]
+        limite = desde or ''
+        if dias:
+            ultimo = max((d.group(1) for d in datas if d), default='')
+            limite = max(limite, str((pd.Timestamp(ultimo) - pd.Timedelta(days=dias - 1)).date()) if ultimo else '')
+        arquivos = [a for a, d in zip(arquivos, datas) if d and d.group(1) >= limite]
+    if not arquivos:
+        print(f"Nenhum arquivo encontrado para '{padrao}'.", file=sys.stderr)
+        return 0
+    lista_dfs = []
+    for ordem, arq in enumerate(arquivos):
+        try:
+            df = pd.read_csv(arq, dtype={'codestacao': str})
+        except pd.errors.EmptyDataError:
+            continue
+        match = re.search(r'(\d{4}-\d{2}-\d{2})', arq)
+        df['_proprio_dia'] = df['datahora'].astype(str).str[:10] == (match.group(1) if match else '')
+        df['_ordem'] = ordem
+        lista_dfs.append(df)
+    df_total = pd.concat(lista_dfs, ignore_index=True)
+    df_total = df_total.sort_values(['_proprio_dia', '_ordem'], kind='stable').drop(columns=['_proprio_dia', '_ordem'])
+    gravar_chuva(df_total, raiz)
+    total = sum(len(ler_particao(mes, raiz)['datahora']) for mes in listar_particoes(raiz))
+    print(f"✅ {len(arquivos)} arquivos migrados para '{raiz}' ({total} leituras).")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazém colunar da chuva.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_migrar = sub.add_parser('migrar', help="Converte os CSVs diários para o armazém.")
+    p_migrar.add_argument('--padrao', default='chuva_recife_*.csv')
+    p_migrar.add_argument('--raiz', default=RAIZ_ARMAZEM)
+    p_migrar.add_argument('--dias', type=int, help="Só os arquivos dos últimos N dias.")
+    p_migrar.add_argument('--desde-manifesto', action='store_true',
+                          help="Só os arquivos do último dia do manifesto da CLI de risco em diante "
+                               "(sincronização diária; sem manifesto, todos).")
+    p_migrar.add_argument('--todas-cidades', action='store_true',
+                          help="Cada cidade do registro, com os CSVs e o armazém da sua pasta (ignora --padrao/--raiz).")
+    p_resumo = sub.add_parser('resumo', help="Lista as partições gravadas.")
+    p_resumo.add_argument('--raiz', default=RAIZ_ARMAZEM)
+    args = parser.parse_args()
+
+    if args.comando == 'migrar' and args.todas_cidades:
+        import registro_estacoes
+        for cidade in registro_estacoes.selecionar_cidades():
+            if glob.glob(f"{cidade['prefixo_csv_diario']}*.csv"):
+                desde = ultimo_dia_manifesto(cidade['manifesto']) if args.desde_manifesto else None
+                migrar_csvs(f"{cidade['prefixo_csv_diario']}*.csv", cidade['raiz_chuva'], args.dias, desde)
+    elif args.comando == 'migrar':
+        desde = ultimo_dia_manifesto('manifesto_risco.json') if args.desde_manifesto else None
+        migrar_csvs(args.padrao, args.raiz, args.dias, desde)
+    else:
+        for mes in listar_particoes(args.raiz):
+            colunas = ler_particao(mes, args.raiz)
+            print(f"{mes}: {len(colunas['datahora'])} leituras, {len(np.unique(colunas['estacao']))} estações")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,88 @@
 import os
 import sys
+import json
+import time
+import random
+import hashlib
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta 
 from pytz import timezone
+import armazem_chuva
+import mare_harmonica
+import metricas
+import nowcast
+import registro_estacoes
+import vp_continuo
 
-def obter_token(email, senha):
+URL_TOKEN_CEMADEN = 'https://sgaa.cemaden.gov.br/SGAA/rest/controle-token/tokens'
+URL_DADOS_CEMADEN = 'https://sws.cemaden.gov.br/PED/rest/pcds/pcds-dados-recentes'
+
+# Parâmetros do motor de coleta (ajustáveis por variável de ambiente)
+PARALELISMO = int(os.getenv('CEMADEN_PARALELISMO', '8'))
+TIMEOUT_REQUISICAO = (5, float(os.getenv('CEMADEN_TIMEOUT', '20')))  # (conexão, leitura) em segundos
+TENTATIVAS = int(os.getenv('CEMADEN_TENTATIVAS', '4'))
+BACKOFF_BASE = 0.5
+BACKOFF_MAXIMO = 8.0
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# O token é reaproveitado entre execuções até perto de expirar; no GitHub Actions o workflow
+# de coleta leva este arquivo de uma execução para a outra (cifrado) pelo actions/cache
+ARQUIVO_CACHE_TOKEN = os.getenv('CEMADEN_TOKEN_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'risco-hoje', 'token_cemaden.json'))
+VALIDADE_TOKEN_S = int(os.getenv('CEMADEN_VALIDADE_TOKEN', str(50 * 60)))
+
+# Índices de chaves dos arquivos diários (ingestão só de leituras novas)
+PASTA_INDICES_INGESTAO = os.path.join('dados', 'ingestao')
+
+class TokenInvalido(Exception):
+    """A API recusou o token (401/403); é preciso obter um novo."""
+
+def criar_sessao(max_conexoes=PARALELISMO):
+    """Cria uma sessão HTTP com pool de conexões keep-alive do tamanho do paralelismo."""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=max_conexoes, max_retries=0)
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    return sessao
+
+def espera_backoff(tentativa):
+    """Backoff exponencial com jitter completo: sorteia entre 0 e base * 2^tentativa."""
+    return random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * (2 ** tentativa)))
+
+def requisitar(sessao, metodo, url, tentativas=TENTATIVAS, alvo=None, **kwargs):
+    """
+    Faz a requisição com timeout e repete em falhas de rede, 429 e 5xx.
+    Erros definitivos (4xx) são levantados na hora, sem novas tentativas.
+    Cada tentativa entra nas métricas com a latência e o status, sob `alvo`.
+    """
+    kwargs.setdefault('timeout', TIMEOUT_REQUISICAO)
+    for tentativa in range(tentativas):
+        inicio = time.perf_counter()
+        try:
+            response = sessao.request(metodo, url, **kwargs)
+            metricas.http(alvo or url, time.perf_counter() - inicio, response.status_code)
+            if response.status_code not in STATUS_RETENTAVEIS:
+                response.raise_for_status()
+                return response
+            erro = requests.exceptions.HTTPError(f"{response.status_code} em {url}", response=response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            metricas.http(alvo or url, time.perf_counter() - inicio, type(e).__name__)
+            erro = e
+        if tentativa < tentativas - 1:
+            time.sleep(espera_backoff(tentativa))
+    raise erro
+
+def obter_token(email, senha, sessao=None):
     """Obtém o token de autenticação da API do CEMADEN."""
     if not email or not senha:
         print("ERRO: Credenciais do Cemaden (email/senha) não encontradas nos segredos.", file=sys.stderr)
         sys.exit(1)
     try:
-        token_url = 'https://sgaa.cemaden.gov.br/SGAA/rest/controle-token/tokens'
         login = {'email': email, 'password': senha}
         print("Tentando obter o token de acesso...")
-        response = requests.post(token_url, json=login)
-        response.raise_for_status()
+        response = requisitar(sessao or requests.Session(), 'POST', URL_TOKEN_CEMADEN, alvo='token', json=login)
         content = response.json()
         token = content.get('token')
         if token:
@@ -28,33 +95,96 @@ def obter_token(email, senha):
         print(f"❌ Erro ao obter token: {e}", file=sys.stderr)
         return None
 
-def buscar_dados_cemaden(token, lista_estacoes, uf='PE', rede='11', sensor='10'):
-    """Busca os dados e converte os horários para o fuso local de Recife."""
+def obter_token_cacheado(email, senha, sessao=None, renovar=False, caminho_cache=None):
+    """
+    Devolve o token guardado em disco enquanto estiver dentro da validade;
+    senão (ou com renovar=True) pede um novo a obter_token e atualiza o cache.
+    """
+    caminho_cache = caminho_cache or ARQUIVO_CACHE_TOKEN
+    chave = hashlib.sha256(f"{email}".encode('utf-8')).hexdigest()
+    if not renovar and os.path.exists(caminho_cache):
+        try:
+            with open(caminho_cache, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('chave') == chave and cache.get('expira_em', 0) > time.time():
+                print("Usando token em cache.")
+                metricas.cache('token', True)
+                return cache['token']
+        except (OSError, ValueError, KeyError):
+            pass
+    metricas.cache('token', False)
+
+    token = obter_token(email, senha, sessao)
+    if token:
+        try:
+            os.makedirs(os.path.dirname(caminho_cache) or '.', exist_ok=True)
+            tmp = f"{caminho_cache}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'chave': chave, 'token': token, 'expira_em': time.time() + VALIDADE_TOKEN_S}, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, caminho_cache)
+        except OSError as e:
+            print(f"Aviso: não foi possível salvar o token em cache: {e}", file=sys.stderr)
+    return token
+
+def buscar_estacao(sessao, url_base, token, codestacao, uf, rede, sensor):
+    """Busca os dados recentes de uma estação; devolve um DataFrame ou None se não houver dados."""
+    params = {'codestacao': codestacao, 'uf': uf, 'rede': rede, 'sensor': sensor, 'formato': 'JSON'}
+    try:
+        response = requisitar(sessao, 'GET', url_base, alvo=codestacao, headers={'token': token}, params=params)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in (401, 403):
+            raise TokenInvalido(codestacao) from e
+        raise
+    dados = response.json()
+    if isinstance(dados, dict) and 'Nenhum resultado foi encontrado' in dados.get('Info', ''):
+        return None
+    if not dados:
+        return None
+    dados_para_df = [dados] if isinstance(dados, dict) else dados
+    return pd.DataFrame(dados_para_df)
+
+def buscar_dados_cemaden(token, lista_estacoes, uf='PE', rede='11', sensor='10',
+                         sessao=None, paralelismo=PARALELISMO, url_base=None, renovar_token=None):
+    """
+    Busca os dados das estações em paralelo e converte os horários para o fuso local de Recife.
+    Se o token for recusado e `renovar_token` for informado, pede um token novo uma única vez
+    e repete apenas as estações recusadas.
+    """
     if not token:
         print("❌ Token de acesso não fornecido.", file=sys.stderr)
         return pd.DataFrame()
-    
-    url_base = 'https://sws.cemaden.gov.br/PED/rest/pcds/pcds-dados-recentes'
-    headers = {'token': token}
-    lista_dfs = []
-    
-    for codestacao in lista_estacoes:
-        params = {'codestacao': codestacao, 'uf': uf, 'rede': rede, 'sensor': sensor, 'formato': 'JSON'}
-        try:
-            response = requests.get(url_base, headers=headers, params=params)
-            response.raise_for_status()
-            dados = response.json()
-            if isinstance(dados, dict) and 'Nenhum resultado foi encontrado' in dados.get('Info', ''):
-                continue
-            if dados:
-                dados_para_df = [dados] if isinstance(dados, dict) else dados
-                lista_dfs.append(pd.DataFrame(dados_para_df))
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Erro na estação {codestacao}: {e}", file=sys.stderr)
-            
+
+    url_base = url_base or URL_DADOS_CEMADEN
+    sessao = sessao or criar_sessao(paralelismo)
+    resultados = {}
+    pendentes = list(lista_estacoes)
+
+    for rodada in range(2):
+        recusadas = []
+        with ThreadPoolExecutor(max_workers=max(1, min(paralelismo, len(pendentes)))) as executor:
+            futuros = {cod: executor.submit(buscar_estacao, sessao, url_base, token, cod, uf, rede, sensor) for cod in pendentes}
+            for codestacao, futuro in futuros.items():
+                try:
+                    resultados[codestacao] = futuro.result()
+                except TokenInvalido:
+                    recusadas.append(codestacao)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"❌ Erro na estação {codestacao}: {e}", file=sys.stderr)
+        if not recusadas:
+            break
+        novo_token = renovar_token() if (renovar_token and rodada == 0) else None
+        if not novo_token:
+            print(f"❌ Token recusado para {len(recusadas)} estação(ões).", file=sys.stderr)
+            break
+        token, pendentes = novo_token, recusadas
+
+    # Mantém a ordem da lista de estações, independente da ordem de chegada das respostas
+    lista_dfs = [resultados[cod] for cod in lista_estacoes if resultados.get(cod) is not None]
     if not lista_dfs: return pd.DataFrame()
     
     df_final = pd.concat(lista_dfs, ignore_index=True)
+    metricas.contar('linhas_lidas', len(df_final), origem='cemaden')
 
     if not df_final.empty and 'datahora' in df_final.columns:
         df_final['datahora'] = pd.to_datetime(df_final['datahora'])
@@ -63,65 +193,234 @@ def buscar_dados_cemaden(token, lista_estacoes, uf='PE', rede='11', sensor='10')
     
     return df_final
 
+def _pasta_indices(nome_arquivo):
+    # Ao lado da pasta do arquivo diário (a raiz para Recife, a pasta da cidade para as demais)
+    return os.path.join(os.path.dirname(nome_arquivo), PASTA_INDICES_INGESTAO)
+
+def _caminho_indice_chaves(nome_arquivo):
+    return os.path.join(_pasta_indices(nome_arquivo), f"{os.path.basename(nome_arquivo)}.json")
+
+def _chaves_e_assinaturas(df):
+    """Chave (estação|horário) e assinatura do conteúdo (valor|qualificação) de cada linha."""
+    chaves = df['codestacao'].astype(str) + '|' + df['datahora'].astype(str)
+    valor = pd.to_numeric(df['valor'], errors='coerce').map(repr)
+    if 'qualificacao' in df.columns:
+        qualificacao = pd.to_numeric(df['qualificacao'], errors='coerce').map(lambda q: '' if pd.isna(q) else str(int(q)))
+    else:
+        qualificacao = pd.Series('', index=df.index)
+    return chaves.tolist(), (valor + '|' + qualificacao).tolist()
+
+def _carregar_indice_chaves(nome_arquivo):
+    """
+    Lê o índice de chaves do arquivo diário. Se não existir ou não bater com o
+    tamanho atual do CSV (arquivo mexido por fora), reconstrói a partir do CSV.
+    """
+    caminho = _caminho_indice_chaves(nome_arquivo)
+    if not os.path.exists(nome_arquivo):
+        return None
+    tamanho = os.path.getsize(nome_arquivo)
+    if os.path.exists(caminho):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+            if indice.get('tamanho') == tamanho:
+                metricas.cache('indice_chaves', True)
+                return indice
+        except (OSError, ValueError):
+            pass
+    metricas.cache('indice_chaves', False)
+    try:
+        df_existente = pd.read_csv(nome_arquivo, dtype={'codestacao': str, 'datahora': str})
+    except pd.errors.EmptyDataError:
+        return None
+    chaves, assinaturas = _chaves_e_assinaturas(df_existente)
+    return {'colunas': list(df_existente.columns), 'linhas': len(df_existente), 'tamanho': tamanho,
+            'chaves': dict(zip(chaves, assinaturas))}
+
+def _salvar_indice_chaves(nome_arquivo, indice):
+    os.makedirs(_pasta_indices(nome_arquivo), exist_ok=True)
+    indice['tamanho'] = os.path.getsize(nome_arquivo)
+    caminho = _caminho_indice_chaves(nome_arquivo)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        # Uma chave por linha: o diff no git fica só com as leituras novas
+        json.dump(indice, f, indent=0, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
 def atualizar_csv_diario(df_novos_dados, nome_arquivo):
-    """Combina dados novos com existentes e remove duplicatas."""
-    if os.path.exists(nome_arquivo):
+    """
+    Acrescenta ao arquivo diário só as leituras que ainda não estão nele, usando um
+    índice de chaves (estação|horário) guardado ao lado. O arquivo só é reescrito
+    inteiro quando chega uma correção tardia (mesma chave com valor diferente).
+    Devolve as linhas novas ou corrigidas.
+    """
+    df_lote = df_novos_dados.drop_duplicates(subset=['codestacao', 'datahora'], keep='last')
+    chaves, assinaturas = _chaves_e_assinaturas(df_lote)
+    indice = _carregar_indice_chaves(nome_arquivo)
+    conhecidas = indice['chaves'] if indice else {}
+
+    novas = [c not in conhecidas for c in chaves]
+    corrigidas = [c in conhecidas and conhecidas[c] != a for c, a in zip(chaves, assinaturas)]
+    df_diferencas = df_lote[[n or c for n, c in zip(novas, corrigidas)]]
+    if df_diferencas.empty:
+        print(f"✅ Arquivo '{nome_arquivo}' sem leituras novas. Total: {indice['linhas']} registros.")
+        return df_diferencas
+
+    criado = indice is None
+    colunas_novas = not criado and not set(df_lote.columns) <= set(indice['colunas'])
+    if criado or any(corrigidas) or colunas_novas:
+        # Caminho de compactação: mescla tudo, remove duplicatas e reescreve o arquivo
         try:
-            df_existente = pd.read_csv(nome_arquivo)
-            df_combinado = pd.concat([df_existente, df_novos_dados], ignore_index=True)
+            df_existente = pd.read_csv(nome_arquivo) if indice is not None else pd.DataFrame()
         except pd.errors.EmptyDataError:
-            df_combinado = df_novos_dados
+            df_existente = pd.DataFrame()
+        df_combinado = pd.concat([df_existente, df_lote], ignore_index=True)
+        df_final = df_combinado.drop_duplicates(subset=['codestacao', 'datahora'], keep='last')
+        os.makedirs(os.path.dirname(nome_arquivo) or '.', exist_ok=True)
+        df_final.to_csv(nome_arquivo, index=False)
+        chaves_finais, assinaturas_finais = _chaves_e_assinaturas(df_final)
+        indice = {'colunas': list(df_final.columns), 'linhas': len(df_final), 'chaves': dict(zip(chaves_finais, assinaturas_finais))}
+        metricas.contar('linhas_gravadas', len(df_final), destino='csv_diario')
+        if criado:
+            print(f"✅ Arquivo '{nome_arquivo}' criado. Total: {len(df_final)} registros.")
+        elif any(corrigidas):
+            print(f"✅ Arquivo '{nome_arquivo}' reescrito com {sum(corrigidas)} correção(ões) (+{sum(novas)} novas). Total: {len(df_final)} registros.")
+        else:
+            print(f"✅ Arquivo '{nome_arquivo}' compactado com colunas novas (+{sum(novas)}). Total: {len(df_final)} registros.")
     else:
-        df_combinado = df_novos_dados
+        df_novas = df_lote[novas].reindex(columns=indice['colunas'])
+        df_novas.to_csv(nome_arquivo, mode='a', header=False, index=False)
+        indice['chaves'].update({c: a for c, a, n in zip(chaves, assinaturas, novas) if n})
+        indice['linhas'] += len(df_novas)
+        metricas.contar('linhas_gravadas', len(df_novas), destino='csv_diario')
+        print(f"✅ Arquivo '{nome_arquivo}' atualizado (+{len(df_novas)}). Total: {indice['linhas']} registros.")
+
+    _salvar_indice_chaves(nome_arquivo, indice)
+    return df_diferencas
+
+
+def atualizar_cidade(cidade, df_chuva_recente, agora, indice=None, recebido_em=None):
+    """
+    Grava as leituras de uma cidade: arquivos diários de hoje e de ontem, armazém,
+    risco agora e alertas do nowcast, todos na pasta da cidade. Cidades diferentes não
+    compartilham arquivos, então podem ser atualizadas em paralelo. `recebido_em` é a
+    hora (time.time()) em que as leituras chegaram, origem da latência dos alertas.
+    """
+    prefixo = f"[{cidade['nome']}] "
+    df_chuva_recente = df_chuva_recente.copy()
+    # Criar coluna temporária para filtro de datas
+    df_chuva_recente['data_temp'] = pd.to_datetime(df_chuva_recente['datahora']).dt.strftime('%Y-%m-%d')
+
+    diferencas = []
+
+    # --- 1. LÓGICA DE HOJE (Tempo Real) ---
+    data_hoje = agora.strftime('%Y-%m-%d')
+    nome_hoje = f"{cidade['prefixo_csv_diario']}{data_hoje}.csv"
+    df_hoje = df_chuva_recente[df_chuva_recente['data_temp'] == data_hoje].copy()
+    
+    if not df_hoje.empty:
+        print(f"{prefixo}Atualizando dados de HOJE ({data_hoje})...")
+        df_hoje.drop(columns=['data_temp'], inplace=True)
+        with metricas.etapa('csv_diario', cidade=cidade['slug']):
+            diferencas.append(atualizar_csv_diario(df_hoje, nome_hoje))
+
+    # --- 2. LÓGICA DE ONTEM (Consolidação D-1) ---
+    data_ontem = (agora - timedelta(days=1)).strftime('%Y-%m-%d')
+    nome_ontem = f"{cidade['prefixo_csv_diario']}{data_ontem}.csv"
+    df_ontem = df_chuva_recente[df_chuva_recente['data_temp'] == data_ontem].copy()
+    
+    if not df_ontem.empty:
+        print(f"{prefixo}Consolidando dados de ONTEM ({data_ontem})...")
+        df_ontem.drop(columns=['data_temp'], inplace=True)
+        with metricas.etapa('csv_diario', cidade=cidade['slug']):
+            diferencas.append(atualizar_csv_diario(df_ontem, nome_ontem))
     
-    df_final = df_combinado.drop_duplicates(subset=['codestacao', 'datahora'], keep='last')
-    df_final.to_csv(nome_arquivo, index=False)
-    print(f"✅ Arquivo '{nome_arquivo}' atualizado. Total: {len(df_final)} registros.")
+    # --- 3. ARMAZÉM COLUNAR (fonte de leitura do cálculo de risco e do painel) ---
+    # Só as leituras novas ou corrigidas chegam ao armazém
+    df_armazem = pd.concat(diferencas, ignore_index=True) if diferencas else pd.DataFrame()
+    with metricas.etapa('armazem', cidade=cidade['slug']):
+        particoes = armazem_chuva.gravar_chuva(df_armazem, cidade['raiz_chuva'])
+    metricas.contar('linhas_gravadas', len(df_armazem), destino='armazem', cidade=cidade['slug'])
+    print(f"{prefixo}Armazém de chuva atualizado ({particoes} partição(ões) reescrita(s)).")
+
+    # --- 4. RISCO AGORA (VP contínuo, só com as leituras novas) ---
+    try:
+        indice = indice or mare_harmonica.carregar_mare_cidade(cidade)
+        with metricas.etapa('risco_agora', cidade=cidade['slug']):
+            retrato = vp_continuo.atualizar_risco_agora(
+                df_armazem, data_hoje, indice=indice,
+                raiz=cidade['raiz_chuva'], caminho_estado=cidade['estado_vp'], caminho_retrato=cidade['risco_agora']
+            )
+        print(f"{prefixo}Risco agora atualizado para {len(retrato['estacoes'])} estação(ões).")
+    except Exception as e:
+        print(f"{prefixo}❌ Erro ao atualizar o risco agora: {e}", file=sys.stderr)
+        return
 
+    # --- 5. NOWCAST (risco das próximas horas; alerta só nas mudanças de classe) ---
+    try:
+        alertas = nowcast.executar_nowcast(pd.DataFrame(retrato['estacoes']), indice, cidade, recebido_em=recebido_em)
+        if alertas:
+            print(f"{prefixo}🔔 {len(alertas)} alerta(s) emitido(s) em {alertas[0]['latencia_s']:.2f} s desde a leitura.")
+    except Exception as e:
+        print(f"{prefixo}❌ Erro no nowcast: {e}", file=sys.stderr)
 
 def main():
     """
     Orquestra o processo buscando dados para Hoje (Tempo Real) 
-    e Ontem (Consolidação do Histórico).
+    e Ontem (Consolidação do Histórico), para todas as cidades do registro.
     """
     cemaden_email = os.getenv("CEMADEN_EMAIL")
     cemaden_senha = os.getenv("CEMADEN_PASS")
+
+    try:
+        cidades = registro_estacoes.selecionar_cidades()
+    except (OSError, ValueError) as e:
+        print(f"Erro no registro de estações: {e}", file=sys.stderr)
+        sys.exit(1)
     
-    token_acesso = obter_token(cemaden_email, cemaden_senha)
+    sessao = criar_sessao()
+    with metricas.etapa('token'):
+        token_acesso = obter_token_cacheado(cemaden_email, cemaden_senha, sessao)
     
     if token_acesso:
-        estacoes_de_recife = [
-            '261160614A', '261160609A', '261160623A', '261160618A', '261160603A'
-        ]
+        # Uma coleta só, concorrente, para as estações de todas as cidades
+        codigos = list(dict.fromkeys(c for cidade in cidades for c in cidade['codigos']))
         
-        df_chuva_recente = buscar_dados_cemaden(token_acesso, estacoes_de_recife)
+        with metricas.etapa('busca_cemaden'):
+            df_chuva_recente = buscar_dados_cemaden(
+                token_acesso, codigos, sessao=sessao,
+                renovar_token=lambda: obter_token_cacheado(cemaden_email, cemaden_senha, sessao, renovar=True)
+            )
+        recebido_em = time.time()
 
         if not df_chuva_recente.empty:
             tz_recife = timezone('America/Recife')
             agora = datetime.now(tz_recife)
-            
-            # Criar coluna temporária para filtro de datas
-            df_chuva_recente['data_temp'] = pd.to_datetime(df_chuva_recente['datahora']).dt.strftime('%Y-%m-%d')
+            df_chuva_recente['codestacao'] = df_chuva_recente['codestacao'].astype(str)
 
-            # --- 1. LÓGICA DE HOJE (Tempo Real) ---
-            data_hoje = agora.strftime('%Y-%m-%d')
-            nome_hoje = f"chuva_recife_{data_hoje}.csv"
-            df_hoje = df_chuva_recente[df_chuva_recente['data_temp'] == data_hoje].copy()
-            
-            if not df_hoje.empty:
-                print(f"Atualizando dados de HOJE ({data_hoje})...")
-                df_hoje.drop(columns=['data_temp'], inplace=True)
-                atualizar_csv_diario(df_hoje, nome_hoje)
-
-            # --- 2. LÓGICA DE ONTEM (Consolidação D-1) ---
-            data_ontem = (agora - timedelta(days=1)).strftime('%Y-%m-%d')
-            nome_ontem = f"chuva_recife_{data_ontem}.csv"
-            df_ontem = df_chuva_recente[df_chuva_recente['data_temp'] == data_ontem].copy()
-            
-            if not df_ontem.empty:
-                print(f"Consolidando dados de ONTEM ({data_ontem})...")
-                df_ontem.drop(columns=['data_temp'], inplace=True)
-                atualizar_csv_diario(df_ontem, nome_ontem)
+            # Cada cidade é um fragmento com pastas próprias, gravado em paralelo
+            fragmentos = [(cidade, df_chuva_recente[df_chuva_recente['codestacao'].isin(cidade['codigos'])]) for cidade in cidades]
+            fragmentos = [(cidade, df) for cidade, df in fragmentos if not df.empty]
+            # Cidades podem dividir a mesma tábua de maré: cada fonte é carregada uma vez só
+            def chave_mare(cidade):
+                return (cidade['mare_fonte'], cidade['mare_csv'], cidade['mare_indice'], cidade['mare_harmonicas'])
+            indices = {}
+            for cidade, _ in fragmentos:
+                chave = chave_mare(cidade)
+                if chave not in indices:
+                    try:
+                        with metricas.etapa('carregar_mare'):
+                            indices[chave] = mare_harmonica.carregar_mare_cidade(cidade)
+                    except Exception as e:
+                        print(f"[{cidade['nome']}] Aviso: índice de maré indisponível ({e}).", file=sys.stderr)
+                        indices[chave] = None
+            with ThreadPoolExecutor(max_workers=max(1, min(PARALELISMO, len(fragmentos)))) as pool:
+                futuros = [pool.submit(atualizar_cidade, cidade, df, agora, indices[chave_mare(cidade)], recebido_em) for cidade, df in fragmentos]
+                for (cidade, _), futuro in zip(fragmentos, futuros):
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        print(f"[{cidade['nome']}] ❌ Erro ao gravar os dados: {e}", file=sys.stderr)
             
             print("🚀 Processamento de datas concluído.")
         else:
@@ -130,4 +429,8 @@ def main():
         print("Falha na autenticação.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    metricas.iniciar('coleta')
+    try:
+        main()
+    finally:
+        metricas.exportar()
@@ -0,0 +1,215 @@
+"""
+Mede cada etapa do pipeline de risco sobre dados sintéticos: chuva de 5 em 5 minutos
+no formato dos chuva_recife_*.csv e uma tabela de maré no formato de tide/, para um
+número configurável de estações e dias. O resultado sai em JSON, com o tempo e o pico
+de memória de cada etapa, para comparar execuções (5 estações × 1 ano até 500 × 10 anos).
+
+Uso:
+    python benchmarks/pipeline.py                              # 5 estações, 365 dias
+    python benchmarks/pipeline.py --estacoes 500 --dias 3650 --saida bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import armazem_chuva  # noqa: E402
+import calculo_vp  # noqa: E402
+import indice_mare  # noqa: E402
+import historico_risco  # noqa: E402
+from classificacao_risco import classificar_risco  # noqa: E402
+
+LEITURAS_POR_DIA = 24 * 12
+RESOLUCAO_PLUVIOMETRO = 0.2  # mm por basculada
+
+def gerar_estacoes(n_estacoes, rng):
+    return pd.DataFrame({
+        'cidade': 'RECIFE',
+        'codestacao': [f"{261160000 + i}A" for i in range(n_estacoes)],
+        'id_sensor': 10,
+        'latitude': np.round(-8.05 + rng.uniform(-0.1, 0.1, n_estacoes), 3),
+        'longitude': np.round(-34.9 + rng.uniform(-0.1, 0.1, n_estacoes), 3),
+        'nome': [f"Estação {i:04d}" for i in range(n_estacoes)],
+    })
+
+def gerar_dia_chuva(estacoes, data, rng, falhas=0.03):
+    """Leituras de 5 min de um dia: a maior parte zero, com pancadas em parte dos dias e das estações."""
+    n = len(estacoes)
+    chove = rng.random(n) < 0.3
+    intensidade = rng.gamma(0.6, 2.0, (n, LEITURAS_POR_DIA))
+    ativa = rng.random((n, LEITURAS_POR_DIA)) < 0.12
+    valor = np.where(chove[:, None] & ativa, intensidade, 0.0)
+    valor = np.round(np.round(valor / RESOLUCAO_PLUVIOMETRO) * RESOLUCAO_PLUVIOMETRO, 2)
+
+    horarios = pd.Timestamp(data) + pd.to_timedelta(np.arange(LEITURAS_POR_DIA) * 5, unit='min')
+    presente = rng.random((n, LEITURAS_POR_DIA)) >= falhas
+    est, pos = np.nonzero(presente)
+    df = estacoes.iloc[est].reset_index(drop=True)
+    df['datahora'] = horarios[pos].strftime('%Y-%m-%d %H:%M:%S')
+    df['offset'] = np.nan
+    df['qualificacao'] = 0
+    df['uf'] = 'PE'
+    df['valor'] = valor[est, pos]
+    return df.sort_values('datahora', kind='stable')[armazem_chuva.COLUNAS_CSV]
+
+def gerar_mare(inicio, n_dias, caminho):
+    """Tabela horária no formato do CSV de tide/ (separador ';' e vírgula decimal), com M2 e S2."""
+    horas = pd.date_range(inicio, periods=(n_dias + 1) * 24, freq='h')
+    t = np.arange(len(horas), dtype=np.float64)
+    altura = 1.3 + 0.9 * np.cos(2 * np.pi * t / 12.4206) + 0.3 * np.cos(2 * np.pi * t / 12.0 + 0.7)
+    df = pd.DataFrame({'Hora_Exata': horas.strftime('%Y-%m-%d %H:%M:%S'), 'Altura_m': np.round(altura, 2)})
+    df.to_csv(caminho, sep=';', decimal=',', index=False)
+
+def gerar_dados(pasta, n_estacoes, n_dias, inicio, semente):
+    rng = np.random.default_rng(semente)
+    estacoes = gerar_estacoes(n_estacoes, rng)
+    arquivos = []
+    for data in pd.date_range(inicio, periods=n_dias, freq='D'):
+        caminho = os.path.join(pasta, f"chuva_recife_{data.strftime('%Y-%m-%d')}.csv")
+        gerar_dia_chuva(estacoes, data, rng).to_csv(caminho, index=False)
+        arquivos.append(caminho)
+    caminho_mare = os.path.join(pasta, 'mare.csv')
+    gerar_mare(inicio, n_dias, caminho_mare)
+    return arquivos, caminho_mare
+
+class Cronometro:
+    """
+    Mede o tempo de parede ou o pico de memória (tracemalloc) de cada etapa. O tracemalloc
+    deixa as etapas várias vezes mais lentas, então cada grandeza sai de uma passada própria.
+    """
+
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.etapas = {}
+
+    def medir(self, nome, funcao, *args, **kwargs):
+        if self.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        if self.memoria:
+            self.etapas[nome] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        else:
+            self.etapas[nome] = round(segundos, 4)
+        return resultado
+
+def ler_csvs(arquivos):
+    return pd.concat([pd.read_csv(a, dtype={'codestacao': str}) for a in arquivos], ignore_index=True)
+
+def vp_por_mes(raiz, meses):
+    """Como na CLI: uma passada do VP por mês lido do armazém."""
+    pedacos = []
+    for mes in meses:
+        inicio = pd.Timestamp(f"{mes}-01")
+        fim = inicio + pd.offsets.MonthEnd(0)
+        df_raw = armazem_chuva.carregar_chuva(inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d'), raiz=raiz)
+        df_raw = df_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'})
+        pedacos.append(calculo_vp.calcular_vp(df_raw))
+    return pd.concat(pedacos, ignore_index=True)
+
+def montar_risco(df_vp, indice):
+    df = df_vp[['data', 'hora_ref', 'nomeEstacao', 'VP']].copy()
+    df['AM'] = indice.consultar(df_vp['datahora'])
+    df['Nivel_Risco_Valor'] = (df['VP'] * df['AM']).round(2)
+    return df
+
+def dedupe_sort_legado(df_historico, df_novos):
+    """O que a CLI fazia antes do histórico particionado: concat, drop_duplicates e sort de tudo."""
+    df = pd.concat([df_historico, df_novos], ignore_index=True)
+    df.drop_duplicates(subset=historico_risco.CHAVE_HISTORICO, keep='last', inplace=True)
+    df.sort_values(['data', 'hora_ref'], ascending=[False, False], inplace=True)
+    return df
+
+def _pipeline(crono, arquivos, caminho_mare, pasta):
+    """Executa as etapas em ordem, cada uma medida por `crono`; devolve o número de linhas de chuva e de risco."""
+    raiz_chuva = os.path.join(pasta, 'dados', 'chuva')
+    raiz_risco = os.path.join(pasta, 'dados', 'risco')
+    df_chuva = crono.medir('carga_csv', ler_csvs, arquivos)
+    crono.medir('armazem_gravar', armazem_chuva.gravar_chuva, df_chuva, raiz_chuva)
+    linhas_chuva = len(df_chuva)
+    del df_chuva
+    meses = armazem_chuva.listar_particoes(raiz_chuva)
+    df_vp = crono.medir('vp', vp_por_mes, raiz_chuva, meses)
+    with open(caminho_mare, 'rb') as f:
+        conteudo_mare = f.read()
+    indice = crono.medir('mare_indice', indice_mare.construir_indice, conteudo_mare)
+    df_risco = crono.medir('mare_consulta', montar_risco, df_vp, indice)
+    df_risco['Classificacao_Risco'] = crono.medir('classificacao', classificar_risco, df_risco['Nivel_Risco_Valor'])
+
+    ultimo_dia = df_risco['data'].max()
+    df_anterior, df_ultimo = df_risco[df_risco['data'] != ultimo_dia], df_risco[df_risco['data'] == ultimo_dia]
+    crono.medir('historico_legado', dedupe_sort_legado, df_anterior, df_ultimo)
+    crono.medir('historico_importar', historico_risco.importar, df_anterior, raiz_risco)
+    crono.medir('historico_mesclar_dia', historico_risco.mesclar, df_ultimo, raiz_risco)
+    crono.medir('historico_montar', historico_risco.montar_consolidado, os.path.join(pasta, 'resultado_risco_final.csv'), raiz_risco)
+    return linhas_chuva, len(df_risco)
+
+def executar(n_estacoes, n_dias, inicio='2025-01-01', semente=42, pasta=None, memoria=True):
+    temporaria = pasta is None
+    pasta = pasta or tempfile.mkdtemp(prefix='bench_risco_')
+    os.makedirs(pasta, exist_ok=True)
+    try:
+        t0 = time.perf_counter()
+        arquivos, caminho_mare = gerar_dados(pasta, n_estacoes, n_dias, inicio, semente)
+        geracao_s = time.perf_counter() - t0
+        print(f"Dados gerados em '{pasta}' ({geracao_s:.1f} s).", file=sys.stderr)
+
+        tempo = Cronometro()
+        linhas_chuva, linhas_risco = _pipeline(tempo, arquivos, caminho_mare, os.path.join(pasta, 'tempo'))
+        etapas = {nome: {'segundos': s} for nome, s in tempo.etapas.items()}
+        pico_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KB no Linux
+        if memoria:
+            pico = Cronometro(memoria=True)
+            _pipeline(pico, arquivos, caminho_mare, os.path.join(pasta, 'memoria'))
+            for nome, mb in pico.etapas.items():
+                etapas[nome]['pico_memoria_mb'] = mb
+        for nome, etapa in etapas.items():
+            print(f"{nome:<24} {etapa['segundos']:9.3f} s" + (f" | pico {etapa['pico_memoria_mb']:8.1f} MB" if memoria else ''), file=sys.stderr)
+
+        return {
+            'estacoes': n_estacoes,
+            'dias': n_dias,
+            'inicio': inicio,
+            'semente': semente,
+            'linhas_chuva': linhas_chuva,
+            'linhas_risco': linhas_risco,
+            'geracao_segundos': round(geracao_s, 2),
+            'etapas': etapas,
+            # Pico do processo ao fim da passada de tempo (sem o tracemalloc)
+            'pico_rss_mb': pico_rss_mb,
+        }
+    finally:
+        if temporaria:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede as etapas do pipeline de risco com dados sintéticos.")
+    parser.add_argument('--estacoes', type=int, default=5)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--inicio', default='2025-01-01', help="Primeiro dia dos dados (AAAA-MM-DD).")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--pasta', help="Onde gerar os dados (padrão: pasta temporária apagada ao final).")
+    parser.add_argument('--sem-memoria', action='store_true', help="Pula a passada de memória (tracemalloc).")
+    parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: stdout).")
+    args = parser.parse_args()
+
+    resultado = executar(args.estacoes, args.dias, args.inicio, args.semente, args.pasta, not args.sem_memoria)
+    texto = json.dumps(resultado, indent=1, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Servidor local que imita a API do CEMADEN (token + dados recentes) para medir
+o tempo de parede de `buscar_dados_cemaden` sem depender da rede. Os testes
+(tests/test_coleta_cemaden.py) usam o mesmo servidor com falhas, latências e
+token programados por estação.
+
+Uso:
+    python benchmarks/stub_cemaden.py                      # 5, 50 e 500 estações
+    python benchmarks/stub_cemaden.py --estacoes 50 --latencia 0.2 --falhas 0.1
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import atualizar_dados  # noqa: E402
+
+class ServidorStub(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, endereco, latencia=0.1, jitter=0.05, taxa_falha=0.0, leituras=12):
+        super().__init__(endereco, ManipuladorStub)
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_falha = taxa_falha
+        self.leituras = leituras
+        self.requisicoes = 0
+        self.trava = threading.Lock()
+        # Comportamento programado (testes)
+        self.token_valido = None  # se definido, GET com outro token recebe 401
+        self.falhas = {}          # codestacao -> status devolvido nas próximas requisições (lista consumida em ordem)
+        self.latencias = {}       # codestacao -> latência fixa em segundos
+        self.tokens_emitidos = 0
+        self.por_estacao = {}     # codestacao -> requisições recebidas
+
+class ManipuladorStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # mantém a conexão aberta (keep-alive)
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        tamanho = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(tamanho)
+        with self.server.trava:
+            self.server.tokens_emitidos += 1
+        self._responder(200, {'token': self.server.token_valido or 'token-stub'})
+
+    def do_GET(self):
+        srv = self.server
+        codestacao = parse_qs(urlparse(self.path).query).get('codestacao', [''])[0]
+        with srv.trava:
+            srv.requisicoes += 1
+            srv.por_estacao[codestacao] = srv.por_estacao.get(codestacao, 0) + 1
+            programadas = srv.falhas.get(codestacao)
+            falha = programadas.pop(0) if programadas else None
+        time.sleep(srv.latencias.get(codestacao, max(0.0, srv.latencia + random.uniform(-srv.jitter, srv.jitter))))
+        if srv.token_valido and self.headers.get('token') != srv.token_valido:
+            self._responder(401, {'erro': 'token inválido'})
+            return
+        if falha:
+            self._responder(falha, {'erro': 'falha programada'})
+            return
+        if random.random() < srv.taxa_falha:
+            self._responder(503, {'erro': 'indisponível'})
+            return
+        agora = time.time()
+        leituras = [{
+            'cidade': 'RECIFE', 'codestacao': codestacao,
+            'datahora': time.strftime('%Y-%m-%d %H:%M:%S.0', time.gmtime(agora - 600 * i)),
+            'id_sensor': 10, 'latitude': -8.05, 'longitude': -34.9, 'nome': f"Estação {codestacao}",
+            'offset': None, 'qualificacao': 0, 'uf': 'PE', 'valor': round(random.random(), 2),
+        } for i in range(srv.leituras)]
+        self._responder(200, leituras)
+
+def iniciar_stub(latencia=0.1, jitter=0.05, taxa_falha=0.0, leituras=12):
+    """Sobe o stub numa porta livre em background; devolve (servidor, url_base_dados)."""
+    servidor = ServidorStub(('127.0.0.1', 0), latencia, jitter, taxa_falha, leituras)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/dados"
+
+def medir(url_base, n_estacoes, paralelismo):
+    estacoes = [f"{261160000 + i}A" for i in range(n_estacoes)]
+    sessao = atualizar_dados.criar_sessao(paralelismo)
+    inicio = time.perf_counter()
+    df = atualizar_dados.buscar_dados_cemaden('token-stub', estacoes, sessao=sessao, paralelismo=paralelismo, url_base=url_base)
+    return time.perf_counter() - inicio, len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a coleta do CEMADEN contra um servidor local.")
+    parser.add_argument('--estacoes', type=int, nargs='+', default=[5, 50, 500])
+    parser.add_argument('--paralelismo', type=int, nargs='+', default=[1, atualizar_dados.PARALELISMO, 32])
+    parser.add_argument('--latencia', type=float, default=0.1, help="Latência média por requisição (s).")
+    parser.add_argument('--falhas', type=float, default=0.0, help="Fração de respostas 503.")
+    args = parser.parse_args()
+
+    servidor, url_base = iniciar_stub(args.latencia, taxa_falha=args.falhas)
+    resultados = []
+    try:
+        for n in args.estacoes:
+            for p in args.paralelismo:
+                segundos, linhas = medir(url_base, n, p)
+                resultados.append({'estacoes': n, 'paralelismo': p, 'segundos': round(segundos, 3), 'linhas': linhas})
+                print(f"{n:>4} estações | paralelismo {p:>3} | {segundos:7.2f} s | {linhas} linhas")
+    finally:
+        servidor.shutdown()
+    print(json.dumps(resultados, indent=1))
+
+if __name__ == "__main__":
+    main()
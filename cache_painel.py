@@ -0,0 +1,201 @@
+"""
+Cache em disco compartilhado pelas sessões e processos do painel.
+
+Cada URL remota (CSV de chuva do dia, tábua de maré) fica em PASTA_CACHE já analisada,
+em binário (pickle), ao lado de um JSON com ETag/Last-Modified e a hora da última
+verificação. Dentro da validade, todas as sessões leem a mesma cópia (em memória,
+enquanto o arquivo não mudar). Vencida, a renovação é uma requisição condicional
+(If-None-Match/If-Modified-Since) feita por uma sessão só: as demais esperam por ela
+ou, se já houver uma cópia, seguem com a cópia anterior. Um Renovador em segundo plano
+pode manter as URLs em uso sempre dentro da validade.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import threading
+from contextlib import contextmanager
+import requests
+import pandas as pd
+import metricas
+
+try:
+    import fcntl
+except ImportError:  # sem flock (Windows): a renovação única vale só dentro do processo
+    fcntl = None
+
+PASTA_CACHE = os.getenv('PAINEL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'risco-hoje', 'painel'))
+TIMEOUT = (5, 30)
+# Pedidos de "Atualizar" com menos que isto desde a última verificação reaproveitam a cópia
+INTERVALO_MINIMO_S = 10
+
+_memoria = {}  # url -> (mtime_ns do arquivo, objeto)
+_travas = {}   # url -> threading.Lock
+_trava_travas = threading.Lock()
+
+def _arquivos(url, pasta):
+    base = os.path.join(pasta, hashlib.sha256(url.encode('utf-8')).hexdigest()[:24])
+    return f"{base}.pkl", f"{base}.json", f"{base}.lock"
+
+def _ler_meta(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _gravar(caminho, conteudo, modo='w'):
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, modo) as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+
+def _ler_objeto(url, caminho):
+    try:
+        mtime = os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    em_memoria = _memoria.get(url)
+    if em_memoria and em_memoria[0] == mtime:
+        return em_memoria[1]
+    try:
+        with open(caminho, 'rb') as f:
+            objeto = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Aviso: cache ilegível para {url}: {e}", file=sys.stderr)
+        return None
+    _memoria[url] = (mtime, objeto)
+    return objeto
+
+def _copia(objeto):
+    # Sessões diferentes recebem o mesmo objeto em memória: DataFrames saem copiados
+    return objeto.copy() if isinstance(objeto, pd.DataFrame) else objeto
+
+def _trava_processo(url):
+    with _trava_travas:
+        return _travas.setdefault(url, threading.Lock())
+
+@contextmanager
+def _trava_arquivo(caminho, esperar):
+    """flock exclusivo entre processos; devolve False se ocupado e esperar=False."""
+    if fcntl is None:
+        yield True
+        return
+    with open(caminho, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _recente(meta, caminho_objeto, validade_s):
+    return os.path.exists(caminho_objeto) and time.time() - meta.get('verificado_em', 0) < validade_s
+
+def _baixar(url, analisar, nome, caminho_objeto, caminho_meta):
+    meta = _ler_meta(caminho_meta) if os.path.exists(caminho_objeto) else {}
+    cabecalhos = {}
+    if meta.get('etag'):
+        cabecalhos['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = meta['last_modified']
+    inicio = time.perf_counter()
+    try:
+        res = requests.get(url, headers=cabecalhos, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        metricas.http(nome, time.perf_counter() - inicio, type(e).__name__)
+        raise
+    metricas.http(nome, time.perf_counter() - inicio, res.status_code)
+
+    if res.status_code == 304:
+        metricas.contar('cache', cache=nome, resultado='revalidado')
+    else:
+        res.raise_for_status()
+        _gravar(caminho_objeto, pickle.dumps(analisar(res.content), protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+        meta = {'url': url, 'etag': res.headers.get('ETag'), 'last_modified': res.headers.get('Last-Modified')}
+        metricas.cache(nome, False)
+    meta['verificado_em'] = time.time()
+    _gravar(caminho_meta, json.dumps(meta))
+
+def renovar(url, analisar, validade_s=0, nome='painel', pasta=PASTA_CACHE, esperar=True):
+    """
+    Renova a cópia de `url` se ela tiver mais de `validade_s` segundos, uma renovação
+    por vez entre threads e processos. Quem esperava a vez e encontra a cópia já renovada
+    não baixa de novo. Com esperar=False desiste se outra renovação estiver em curso.
+    Devolve True se a cópia está em dia ao final.
+    """
+    caminho_objeto, caminho_meta, caminho_trava = _arquivos(url, pasta)
+    os.makedirs(pasta, exist_ok=True)
+    trava = _trava_processo(url)
+    if not trava.acquire(blocking=esperar):
+        return False
+    try:
+        with _trava_arquivo(caminho_trava, esperar) as obtida:
+            if not obtida:
+                return False
+            if _recente(_ler_meta(caminho_meta), caminho_objeto, validade_s):
+                return True
+            _baixar(url, analisar, nome, caminho_objeto, caminho_meta)
+            return True
+    except (requests.RequestException, ValueError, KeyError, OSError) as e:
+        print(f"Aviso: falha ao renovar {url}: {e}", file=sys.stderr)
+        return False
+    finally:
+        trava.release()
+
+def obter(url, analisar, validade_s=60, nome='painel', pasta=PASTA_CACHE):
+    """
+    Objeto de `url` analisado por `analisar(bytes)`, do cache compartilhado. Vencida a
+    validade, renova antes de devolver, ou devolve a cópia anterior se outra sessão já
+    estiver renovando. Sem cópia e sem resposta do servidor, devolve None.
+    """
+    caminho_objeto, caminho_meta, _ = _arquivos(url, pasta)
+    objeto = _ler_objeto(url, caminho_objeto)
+    if objeto is not None and _recente(_ler_meta(caminho_meta), caminho_objeto, validade_s):
+        metricas.cache(nome, True)
+        return _copia(objeto)
+    if not renovar(url, analisar, validade_s, nome, pasta, esperar=objeto is None) and objeto is not None:
+        metricas.contar('cache', cache=nome, resultado='vencido')
+        return _copia(objeto)
+    objeto = _ler_objeto(url, caminho_objeto)
+    return _copia(objeto) if objeto is not None else None
+
+class Renovador(threading.Thread):
+    """
+    Thread que renova as URLs registradas um pouco antes de vencerem. URLs que nenhuma
+    sessão pediu em `esquecer_apos_s` segundos (o CSV de um dia que já passou) saem da lista.
+    """
+
+    def __init__(self, intervalo_s=30, esquecer_apos_s=3600, pasta=PASTA_CACHE):
+        super().__init__(name='renovador-cache-painel', daemon=True)
+        self.intervalo_s = intervalo_s
+        self.esquecer_apos_s = esquecer_apos_s
+        self.pasta = pasta
+        self.urls = {}  # url -> (analisar, validade_s, nome, último uso)
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+
+    def registrar(self, url, analisar, validade_s, nome='painel'):
+        with self._trava:
+            self.urls[url] = (analisar, validade_s, nome, time.time())
+
+    def renovar_vencidas(self):
+        agora = time.time()
+        with self._trava:
+            for url in [u for u, (_, _, _, uso) in self.urls.items() if agora - uso > self.esquecer_apos_s]:
+                del self.urls[url]
+            itens = list(self.urls.items())
+        for url, (analisar, validade_s, nome, _) in itens:
+            renovar(url, analisar, max(0, validade_s - self.intervalo_s), nome, self.pasta, esperar=False)
+
+    def run(self):
+        while not self._parar.wait(self.intervalo_s):
+            self.renovar_vencidas()
+
+    def parar(self):
+        self._parar.set()
@@ -1,116 +1,364 @@
 import os
 import sys
-import requests
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import numpy as np
-import glob
-import re
 from datetime import datetime
 from pytz import timezone
-from io import StringIO
+import armazem_chuva
+import calculo_vp
+import mare_harmonica
+import metricas
+import historico_risco
+import registro_estacoes
+from classificacao_risco import classificar_risco
 
-URL_ARQUIVO_HISTORICO = 'https://raw.githubusercontent.com/RafaellaB/risco-hoje/main/resultado_risco_final.csv'
-URL_ARQUIVO_MARE_AM = 'https://raw.githubusercontent.com/RafaellaB/risco-hoje/main/tide/mare_calculada_hora_em_hora_ano-completo.csv' 
-NOME_ARQUIVO_SAIDA_FINAL = 'resultado_risco_final.csv'
-CSV_DELIMITADOR = ','
-ESTACOES_DESEJADAS = ["Campina do Barreto", "Torreão", "RECIFE - APAC", "Imbiribeira", "Dois Irmãos"]
+def hash_arquivo(caminho):
+    """Calcula o SHA-256 do conteúdo de um arquivo."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
 
-def carregar_dados_mare(url_am_data):
+def assinatura_arquivo(caminho, anterior=None):
+    """
+    Retorna a assinatura (tamanho, mtime e hash) de um arquivo.
+    Se tamanho e mtime baterem com a assinatura anterior, reaproveita o hash
+    sem reler o arquivo (o checkout do git muda o mtime, então o hash decide).
+    """
+    st = os.stat(caminho)
+    assinatura = {'tamanho': st.st_size, 'mtime': st.st_mtime}
+    if anterior and anterior.get('tamanho') == st.st_size and anterior.get('mtime') == st.st_mtime:
+        assinatura['sha256'] = anterior.get('sha256')
+    else:
+        assinatura['sha256'] = hash_arquivo(caminho)
+    return assinatura
+
+def carregar_manifesto(caminho):
+    """
+    Lê o manifesto do que já foi processado (vazio se não existir ou estiver corrompido):
+    assinatura de cada partição do armazém e hash/linhas de cada dia.
+    """
+    vazio = {'particoes': {}, 'dias': {}, 'historico': None}
+    if not os.path.exists(caminho):
+        return vazio
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+        for chave, padrao in vazio.items():
+            manifesto.setdefault(chave, padrao)
+        return manifesto
+    except (OSError, ValueError) as e:
+        print(f"Aviso: manifesto ilegível ({e}), reprocessando tudo.", file=sys.stderr)
+        return vazio
+
+def salvar_manifesto(manifesto, caminho):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, sort_keys=True)
+    os.replace(tmp, caminho)
+
+def carregar_indice_cidade(cidade):
+    return mare_harmonica.carregar_mare_cidade(cidade)
+
+def calcular_risco_dias(cidade, datas, indice):
+    """
+    Lê do armazém da cidade a chuva de um conjunto de dias e devolve o VP de todos eles,
+    calculado numa só passada, mesclado com a maré e classificado (na ordem dia, estação, hora).
+    """
+    # As estações são filtradas pelo código do registro; o nome publicado é o do CEMADEN
+    with metricas.etapa('ler_armazem', cidade=cidade['slug']):
+        df_raw = armazem_chuva.carregar_chuva(min(datas), max(datas), estacoes=cidade['codigos'], raiz=cidade['raiz_chuva'])
+    metricas.contar('linhas_lidas', len(df_raw), origem='armazem', cidade=cidade['slug'])
+    df_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'}, inplace=True)
+    with metricas.etapa('vp', cidade=cidade['slug']):
+        df_vp = calculo_vp.calcular_vp(df_raw, datas)
+    if df_vp.empty:
+        return pd.DataFrame()
+    with metricas.etapa('mare_e_classificacao', cidade=cidade['slug']):
+        df_vp = df_vp.sort_values('data', kind='stable')
+        df_mesclado = df_vp[['data', 'hora_ref', 'nomeEstacao', 'VP']].reset_index(drop=True)
+        df_mesclado['AM'] = indice.consultar(df_vp['datahora'])
+        df_mesclado['Nivel_Risco_Valor'] = (df_mesclado['VP'].astype(float) * df_mesclado['AM'].astype(float)).round(2)
+        df_mesclado['Classificacao_Risco'] = classificar_risco(df_mesclado['Nivel_Risco_Valor'])
+    return df_mesclado
+
+_indice_do_processo = None
+
+def _iniciar_processo(cidade):
+    global _indice_do_processo
+    _indice_do_processo = carregar_indice_cidade(cidade)
+
+def _calcular_mes_no_processo(cidade, datas):
+    # As métricas do filho voltam junto com o resultado para o processo principal
+    metricas.iniciar('mes')
+    return calcular_risco_dias(cidade, datas, _indice_do_processo), metricas.retrato()
+
+def calcular_pendentes(cidade, pendentes, indice, processos=1):
+    """
+    Calcula o risco dos dias pendentes [(data, resumo)]. Os dias de um mês são calculados
+    juntos, numa só passada do VP; com mais de um processo os meses são distribuídos num
+    pool. Os resultados voltam sempre na ordem dos meses, então a saída é a mesma com
+    qualquer número de processos. Devolve (lista de DataFrames, resumos processados).
+    """
+    por_mes = {}
+    for data_do_arquivo, resumo in pendentes:
+        por_mes.setdefault(data_do_arquivo[:7], {})[data_do_arquivo] = resumo
+    meses = sorted(por_mes)
+
+    lista_novos_dados, processados = [], {}
+    pool = None
+    if processos > 1 and len(meses) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(processos, len(meses)), initializer=_iniciar_processo, initargs=(cidade,))
     try:
-        df_am_raw = pd.read_csv(url_am_data, sep=';', decimal=',')
-        df_am_raw.rename(columns={'Hora_Exata': 'datahora', 'Altura_m': 'AM'}, inplace=True)
-        if 'datahora' not in df_am_raw.columns:
-            raise KeyError("Coluna 'Hora_Exata' não encontrada.")
-        df_am_raw['datahora'] = pd.to_datetime(df_am_raw['datahora'])
-        df_am_raw['data'] = df_am_raw['datahora'].dt.strftime('%Y-%m-%d')
-        df_am_raw['hora_ref'] = df_am_raw['datahora'].dt.strftime('%H:00:00')
-        
-        return df_am_raw[['data', 'hora_ref', 'AM']]
+        futuros = {mes: pool.submit(_calcular_mes_no_processo, cidade, sorted(por_mes[mes])) for mes in meses} if pool else {}
+        for mes in meses:
+            resumos = por_mes[mes]
+            try:
+                print(f"-> Processando {mes}: {len(resumos)} dia(s)")
+                if pool:
+                    df_mesclado, retrato = futuros[mes].result()
+                    metricas.incorporar(retrato)
+                else:
+                    df_mesclado = calcular_risco_dias(cidade, sorted(resumos), indice)
+                if not df_mesclado.empty:
+                    lista_novos_dados.append(df_mesclado)
+                processados.update(resumos)
+            except Exception as e:
+                print(f"Erro no mês {mes}: {e}")
+    finally:
+        if pool:
+            pool.shutdown()
+    return lista_novos_dados, processados
+
+def preparar_historico(cidade, manifesto, incremental):
+    """
+    Garante o histórico particionado em disco. No modo incremental as partições
+    locais são usadas como estão, desde que o consolidado seja o mesmo arquivo
+    gravado na última execução. Caso contrário reimporta o consolidado local (ou,
+    sem ele, o remoto, com requisição condicional) e devolve False: o manifesto é
+    refeito, e só os dias que faltam no histórico publicado são calculados.
+    """
+    consolidado, raiz = cidade['historico'], cidade['raiz_historico']
+    if incremental and historico_risco.existe_historico(raiz) and manifesto.get('historico') and os.path.exists(consolidado):
+        assinatura = assinatura_arquivo(consolidado, manifesto['historico'])
+        if assinatura['sha256'] == manifesto['historico'].get('sha256'):
+            manifesto['historico'] = assinatura
+            return True
+        print("Aviso: histórico local diferente do registrado no manifesto, reimportando.")
+
+    if os.path.exists(consolidado):
+        df_historico = pd.read_csv(consolidado, float_precision='round_trip')
+    elif historico_risco.existe_historico(raiz) or not cidade['url_historico']:
+        return False
+    else:
+        cache = os.path.join(os.path.dirname(historico_risco.ARQUIVO_CACHE_REMOTO), f"historico_remoto_{cidade['slug']}.csv")
+        df_historico = historico_risco.baixar_historico_remoto(cidade['url_historico'], cache)
+    if not df_historico.empty:
+        meses = historico_risco.importar(df_historico, raiz)
+        print(f"Histórico importado em {len(meses)} partição(ões) mensais.")
+    return False
+
+def gravar_historico(cidade, lista_novos_dados):
+    """Mescla os dados novos só nas partições dos seus meses e remonta o consolidado."""
+    df_total_novo = pd.concat(lista_novos_dados, ignore_index=True)
+    with metricas.etapa('mesclar_historico', cidade=cidade['slug']):
+        meses = historico_risco.mesclar(df_total_novo, cidade['raiz_historico'])
+    with metricas.etapa('montar_consolidado', cidade=cidade['slug']):
+        historico_risco.montar_consolidado(cidade['historico'], cidade['raiz_historico'])
+    metricas.contar('linhas_gravadas', len(df_total_novo), destino='historico', cidade=cidade['slug'])
+    return len(df_total_novo), meses
+
+def backfill(cidade, de, ate, processos, hoje_str):
+    """
+    Recalcula todos os dias do armazém entre `de` e `ate` (inclusivos, nunca o dia de hoje),
+    com os meses distribuídos entre processos, e mescla o resultado no histórico como a
+    execução diária faria. Devolve o código de saída.
+    """
+    manifesto = carregar_manifesto(cidade['manifesto'])
+    if not preparar_historico(cidade, manifesto, True):
+        manifesto['particoes'], manifesto['dias'] = {}, {}
+
+    pendentes = []
+    for mes in armazem_chuva.listar_particoes(cidade['raiz_chuva']):
+        if (de and mes < de[:7]) or (ate and mes > ate[:7]):
+            continue
+        for data_do_arquivo, resumo in armazem_chuva.resumo_por_dia(mes, cidade['raiz_chuva']).items():
+            if (de and data_do_arquivo < de) or (ate and data_do_arquivo > ate) or data_do_arquivo >= hoje_str:
+                continue
+            pendentes.append((data_do_arquivo, resumo))
+    if not pendentes:
+        print("Nenhum dia do armazém no intervalo pedido.")
+        return 0
+    print(f"Backfill de {pendentes[0][0]} a {pendentes[-1][0]}: {len(pendentes)} dia(s), {processos} processo(s).")
+
+    try:
+        with metricas.etapa('carregar_mare', cidade=cidade['slug']):
+            indice = carregar_indice_cidade(cidade)
     except Exception as e:
         print(f"ERRO Maré: {e}", file=sys.stderr)
-        return pd.DataFrame()
+        return 1
 
-def processar_chuva_arquivo(df_chuva, data_alvo):
-    # --- MANTÉM CÁLCULO ORIGINAL ---
-    df = df_chuva[df_chuva['nomeEstacao'].isin(ESTACOES_DESEJADAS)].copy()
-    df['datahora'] = pd.to_datetime(df['datahora'])
-    df['data_str'] = df['datahora'].dt.strftime('%Y-%m-%d')
-    df = df[df['data_str'] == data_alvo]
-    if df.empty: return pd.DataFrame()
-    
-    df = df.set_index('datahora').sort_index()
-    resultados = []
-    for estacao, grupo in df.groupby('nomeEstacao'):
-        chuva_10min = grupo['valorMedida'].rolling('10min').sum()
-        chuva_2h = grupo['valorMedida'].rolling('2h').sum()
-        temp = pd.DataFrame({'chuva_10min': chuva_10min, 'chuva_2h': chuva_2h})
-        agregado = temp.resample('h').last()
-        agregado['VP'] = (agregado['chuva_10min'] * 6) + agregado['chuva_2h']
-        agregado['nomeEstacao'] = estacao
-        resultados.append(agregado)
-    df_vp = pd.concat(resultados).reset_index()
-    df_vp['data'] = df_vp['datahora'].dt.strftime('%Y-%m-%d')
-    df_vp['hora_ref'] = df_vp['datahora'].dt.strftime('%H:00:00')
-    return df_vp[['data', 'hora_ref', 'nomeEstacao', 'VP']]
+    lista_novos_dados, processados = calcular_pendentes(cidade, pendentes, indice, processos)
+    if lista_novos_dados:
+        registros, meses = gravar_historico(cidade, lista_novos_dados)
+        print(f"✅ Backfill concluído: {registros} registros em {len(meses)} partição(ões) do histórico.")
+    manifesto['dias'].update(processados)
+    if os.path.exists(cidade['historico']):
+        manifesto['historico'] = assinatura_arquivo(cidade['historico'])
+    salvar_manifesto(manifesto, cidade['manifesto'])
+    return 0 if len(processados) == len(pendentes) else 1
+
+def processar_cidade(cidade, completo, processos, hoje_str):
+    """Execução diária de uma cidade: só os dias novos ou alterados. Devolve o código de saída."""
+    manifesto = carregar_manifesto(cidade['manifesto']) if not completo else {'particoes': {}, 'dias': {}, 'historico': None}
+    incremental = preparar_historico(cidade, manifesto, not completo)
+    if not incremental:
+        manifesto['particoes'], manifesto['dias'] = {}, {}
+
+    particoes = armazem_chuva.listar_particoes(cidade['raiz_chuva'])
+    if not particoes:
+        print(f"Erro: armazém de chuva vazio em '{cidade['raiz_chuva']}'. Rode 'python armazem_chuva.py migrar'.", file=sys.stderr)
+        return 1
+    print(f"Partições encontradas no armazém: {len(particoes)}")
+
+    # Só abre as partições cujo arquivo mudou; dentro delas, só os dias cujo conteúdo mudou
+    pendentes = []
+    particoes_lidas = {}
+    for mes in particoes:
+        caminho = os.path.join(cidade['raiz_chuva'], f"{mes}.npz")
+        anterior = manifesto['particoes'].get(mes)
+        assinatura = assinatura_arquivo(caminho, anterior)
+        if anterior and anterior.get('sha256') == assinatura['sha256']:
+            # Conteúdo inalterado: só atualiza o mtime para evitar rehash na próxima execução
+            anterior.update(tamanho=assinatura['tamanho'], mtime=assinatura['mtime'])
+            metricas.cache('manifesto_particoes', True)
+            continue
+        metricas.cache('manifesto_particoes', False)
+        particoes_lidas[mes] = assinatura
+        for data_do_arquivo, resumo in armazem_chuva.resumo_por_dia(mes, cidade['raiz_chuva']).items():
+            # --- AJUSTE DE TEMPO: TRAVA DE SEGURANÇA ---
+            # Ignora o dia de hoje, pois ele ainda está incompleto.
+            # O histórico consolidado deve conter apenas dias inteiros (D-1).
+            if data_do_arquivo == hoje_str:
+                print(f"-> Pulando {data_do_arquivo} (Dia de hoje ainda em preenchimento)")
+                # A partição precisa ser relida amanhã, quando o dia estiver completo
+                particoes_lidas.pop(mes, None)
+                continue
+            if manifesto['dias'].get(data_do_arquivo, {}).get('sha256') != resumo['sha256']:
+                pendentes.append((data_do_arquivo, resumo))
+            else:
+                metricas.cache('manifesto_dias', True)
+
+    # Sem manifesto (primeira execução ou histórico reimportado), os dias que já estão no
+    # histórico publicado ficam como foram publicados; recalculá-los é com --completo ou --de/--ate
+    adotados = {}
+    if not incremental and not completo:
+        publicados = historico_risco.dias_no_historico(cidade['raiz_historico'])
+        adotados = {d: r for d, r in pendentes if d in publicados}
+        if adotados:
+            print(f"{len(adotados)} dia(s) já no histórico publicado mantido(s) como estão (use --completo para recalculá-los).")
+            pendentes = [(d, r) for d, r in pendentes if d not in adotados]
+            manifesto['dias'].update(adotados)
+
+    if not pendentes:
+        print("Nenhum dia novo ou alterado desde a última execução.")
+        if incremental or adotados:
+            if not incremental and not os.path.exists(cidade['historico']):
+                historico_risco.montar_consolidado(cidade['historico'], cidade['raiz_historico'])
+            manifesto['particoes'].update(particoes_lidas)
+            manifesto['historico'] = assinatura_arquivo(cidade['historico'])
+            salvar_manifesto(manifesto, cidade['manifesto'])
+        return 0
+    print(f"{len(pendentes)} dia(s) novo(s) ou alterado(s) para processar.")
+    metricas.cache('manifesto_dias', False, len(pendentes))
+
+    try:
+        with metricas.etapa('carregar_mare', cidade=cidade['slug']):
+            indice = carregar_indice_cidade(cidade)
+    except Exception as e:
+        print(f"ERRO Maré: {e}", file=sys.stderr)
+        return 1
+
+    lista_novos_dados, processados = calcular_pendentes(cidade, pendentes, indice, processos)
+
+    if lista_novos_dados:
+        # Só as partições dos meses com dias novos são reescritas; o consolidado é só concatenado
+        registros, meses = gravar_historico(cidade, lista_novos_dados)
+        print(f"✅ Finalizado: {registros} registros novos em {len(meses)} partição(ões) do histórico.")
+    elif not incremental and not adotados:
+        print("Aviso: Nenhum dia de chuva anterior a hoje foi processado.")
+        return 0
+    elif not os.path.exists(cidade['historico']):
+        historico_risco.montar_consolidado(cidade['historico'], cidade['raiz_historico'])
+
+    # O manifesto só é gravado depois do histórico, e amarrado a ele: se o
+    # histórico não for salvo, a próxima execução reprocessa os mesmos dias.
+    # Uma partição só é dada como vista se todos os seus dias pendentes deram certo
+    falharam = {d[:7] for d, _ in pendentes if d not in processados}
+    manifesto['particoes'].update({mes: a for mes, a in particoes_lidas.items() if mes not in falharam})
+    manifesto['dias'].update(processados)
+    manifesto['historico'] = assinatura_arquivo(cidade['historico'])
+    salvar_manifesto(manifesto, cidade['manifesto'])
+    return 0
+
+def executar_cidade(cidade, args, hoje_str, processos):
+    print(f"=== {cidade['nome']} ({len(cidade['codigos'])} estações) ===")
+    with metricas.etapa('cidade', cidade=cidade['slug']):
+        if args.de or args.ate:
+            return backfill(cidade, args.de, args.ate, processos, hoje_str)
+        return processar_cidade(cidade, args.completo, processos, hoje_str)
+
+def _executar_cidade_no_processo(cidade, args, hoje_str):
+    metricas.iniciar('cidade')
+    return executar_cidade(cidade, args, hoje_str, 1), metricas.retrato()
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula o risco diário e incrementa o histórico consolidado.")
+    parser.add_argument('--completo', action='store_true',
+                        help="Ignora o manifesto e reprocessa todos os arquivos de chuva "
+                             "(reescreve dias já publicados no histórico).")
+    parser.add_argument('--de', '--from', dest='de', metavar='AAAA-MM-DD',
+                        help="Backfill: recalcula os dias do armazém a partir desta data, ignorando o manifesto "
+                             "(reescreve dias já publicados no histórico).")
+    parser.add_argument('--ate', '--to', dest='ate', metavar='AAAA-MM-DD',
+                        help="Backfill: última data a recalcular (padrão: ontem).")
+    parser.add_argument('--processos', '--workers', dest='processos', type=int, default=1,
+                        help="Número de processos: entre cidades, ou entre meses quando há uma só cidade (padrão: 1).")
+    parser.add_argument('--cidade', action='append', metavar='SLUG',
+                        help="Processa só esta cidade do registro (pode repetir; padrão: todas).")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     print("Iniciando Nova Versão do Script de Risco (Varredura de Arquivos)...")
     
     # Define a data de hoje para a trava de segurança
     fuso = timezone('America/Recife')
     hoje_str = datetime.now(fuso).strftime('%Y-%m-%d')
-    
-    df_am = carregar_dados_mare(URL_ARQUIVO_MARE_AM)
-    if df_am.empty: 
-        print("Erro: Maré vazia")
+
+    try:
+        cidades = registro_estacoes.selecionar_cidades(args.cidade)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erro no registro de estações: {e}", file=sys.stderr)
         sys.exit(1)
 
-    arquivos_disponiveis = glob.glob("chuva_recife_*.csv")
-    print(f"Arquivos encontrados na pasta: {arquivos_disponiveis}")
-
-    lista_novos_dados = []
-
-    for arq in arquivos_disponiveis:
-        match = re.search(r'(\d{4}-\d{2}-\d{2})', arq)
-        if not match: continue
-        data_do_arquivo = match.group(1)
-        
-        # --- AJUSTE DE TEMPO: TRAVA DE SEGURANÇA ---
-        # Ignora o arquivo se for o dia de hoje, pois ele ainda está incompleto.
-        # O histórico consolidado deve conter apenas dias inteiros (D-1).
-        if data_do_arquivo == hoje_str:
-            print(f"-> Pulando {data_do_arquivo} (Arquivo de hoje ainda em preenchimento)")
-            continue
-        
-        try:
-            print(f"-> Processando: {data_do_arquivo}")
-            df_raw = pd.read_csv(arq, sep=CSV_DELIMITADOR)
-            df_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'}, inplace=True)
-            df_vp = processar_chuva_arquivo(df_raw, data_do_arquivo)
-            if not df_vp.empty:
-                df_mesclado = pd.merge(df_vp, df_am, on=['data', 'hora_ref'], how='left')
-                df_mesclado['Nivel_Risco_Valor'] = (df_mesclado['VP'].astype(float) * df_mesclado['AM'].astype(float)).round(2)
-                bins = [-np.inf, 30, 50, 100, np.inf]
-                labels = ['Baixo', 'Moderado', 'Moderado Alto', 'Alto']
-                df_mesclado['Classificacao_Risco'] = pd.cut(df_mesclado['Nivel_Risco_Valor'], bins=bins, labels=labels)
-                lista_novos_dados.append(df_mesclado)
-        except Exception as e:
-            print(f"Erro no arquivo {arq}: {e}")
-
-    if not lista_novos_dados:
-        print("Aviso: Nenhum arquivo de chuva de dias anteriores foi processado.")
-        sys.exit(0)
+    # Cada cidade é um fragmento independente (pastas e manifestos próprios): com várias
+    # cidades o paralelismo é entre elas; com uma só, entre os meses dela
+    if len(cidades) > 1 and args.processos > 1:
+        with ProcessPoolExecutor(max_workers=min(args.processos, len(cidades))) as pool:
+            codigos = []
+            for codigo, retrato in pool.map(_executar_cidade_no_processo, cidades, [args] * len(cidades), [hoje_str] * len(cidades)):
+                metricas.incorporar(retrato)
+                codigos.append(codigo)
+    else:
+        codigos = [executar_cidade(cidade, args, hoje_str, args.processos) for cidade in cidades]
+    sys.exit(max(codigos))
 
-    df_total_novo = pd.concat(lista_novos_dados, ignore_index=True)
-    
+if __name__ == "__main__":
+    metricas.iniciar('risco')
     try:
-        res = requests.get(URL_ARQUIVO_HISTORICO)
-        df_historico = pd.read_csv(StringIO(res.text)) if res.status_code == 200 else pd.DataFrame()
-    except:
-        df_historico = pd.DataFrame()
-
-    df_final = pd.concat([df_historico, df_total_novo], ignore_index=True)
-    df_final.drop_duplicates(subset=['data', 'hora_ref', 'nomeEstacao'], keep='last', inplace=True)
-    df_final.sort_values(['data', 'hora_ref'], ascending=[False, False], inplace=True)
-    df_final.to_csv(NOME_ARQUIVO_SAIDA_FINAL, index=False)
-    print(f"✅ Finalizado com {len(df_final)} registros consolidados.")
\ No newline at end of file
+        main()
+    finally:
+        metricas.exportar()
@@ -0,0 +1,181 @@
+"""
+Cálculo vetorizado do VP (índice de chuva) para todas as estações e dias de uma vez.
+
+VP = soma móvel de 10 min × 6 + soma móvel de 2 h, tomando a última leitura de cada hora.
+As janelas são calculadas dentro de cada par (estação, dia), como sempre foi feito no
+cálculo diário do histórico e no painel.
+
+Para dar exatamente os mesmos números que `rolling(...).sum()` + `resample('h').last()`
+do pandas, a soma segue o mesmo algoritmo do pandas (soma de Kahan com entrada e saída
+de valores da janela), só que avançando todas as séries em paralelo: as leituras são
+dispostas numa grade (estação-dia × posição) e cada passo do laço trata uma posição
+de todas as séries com operações do NumPy.
+"""
+import numpy as np
+import pandas as pd
+
+JANELA_10MIN = np.timedelta64(10, 'm')
+JANELA_2H = np.timedelta64(2, 'h')
+COLUNAS_VP = ['datahora', 'chuva_10min', 'chuva_2h', 'VP', 'nomeEstacao', 'data', 'hora_ref']
+
+def _inicio_janelas(chave, largura):
+    """Para cada linha, o índice da primeira linha da mesma série dentro de (t - largura, t]."""
+    return np.searchsorted(chave, chave - largura, side='right')
+
+def _soma_movel(valores, inicio, tamanhos):
+    """
+    Soma móvel por série, idêntica à `roll_sum` do pandas para janelas de tempo.
+    `valores` e `inicio` estão na grade [série, posição]; `inicio` é relativo à série.
+    """
+    n_series, n_pos = valores.shape
+    saida = np.full((n_series, n_pos), np.nan)
+    soma = np.zeros(n_series)
+    comp_add = np.zeros(n_series)
+    comp_rem = np.zeros(n_series)
+    nobs = np.zeros(n_series, dtype=np.int64)
+    repetidos = np.zeros(n_series, dtype=np.int64)
+    anterior = np.zeros(n_series)
+    linhas = np.arange(n_series)
+
+    for p in range(n_pos):
+        ativas = tamanhos > p
+        if not ativas.any():
+            break
+        s = inicio[:, p]
+        # O pandas recomeça a soma do zero quando a janela não tem nenhuma linha da anterior
+        reinicia = ativas & ((p == 0) | (s >= p))
+        continua = ativas & ~reinicia
+
+        if reinicia.any():
+            soma[reinicia] = 0.0
+            comp_add[reinicia] = 0.0
+            comp_rem[reinicia] = 0.0
+            nobs[reinicia] = 0
+            repetidos[reinicia] = 0
+            anterior[reinicia] = valores[reinicia, p]
+
+        if continua.any() and p > 0:
+            s_ant = inicio[:, p - 1]
+            n_saidas = np.where(continua, s - s_ant, 0)
+            for k in range(int(n_saidas.max(initial=0))):
+                sai = continua & (n_saidas > k)
+                idx = np.where(sai, s_ant + k, 0)
+                val = valores[linhas, idx]
+                sai &= ~np.isnan(val)
+                nobs[sai] -= 1
+                y = -val[sai] - comp_rem[sai]
+                t = soma[sai] + y
+                comp_rem[sai] = t - soma[sai] - y
+                soma[sai] = t
+
+        val = valores[:, p]
+        entra = ativas & ~np.isnan(val)
+        nobs[entra] += 1
+        y = val[entra] - comp_add[entra]
+        t = soma[entra] + y
+        comp_add[entra] = t - soma[entra] - y
+        soma[entra] = t
+        igual = entra & (val == anterior)
+        repetidos[igual] += 1
+        repetidos[entra & ~igual] = 1
+        anterior[entra] = val[entra]
+
+        # Igual ao pandas: janela com um único valor repetido devolve valor × nobs
+        resultado = np.where(repetidos >= nobs, anterior * nobs, soma)
+        resultado = np.where(nobs > 0, resultado, np.nan)
+        saida[ativas, p] = resultado[ativas]
+    return saida
+
+def _ultimo_valido(valores, grupo, n_grupos):
+    """Índice da última linha não-NaN de cada grupo (linhas ordenadas); -1 se não houver."""
+    validas = np.flatnonzero(~np.isnan(valores))
+    ultimo = np.full(n_grupos, -1, dtype=np.int64)
+    g = grupo[validas]
+    fim_de_grupo = np.ones(len(g), dtype=bool)
+    fim_de_grupo[:-1] = g[1:] != g[:-1]
+    ultimo[g[fim_de_grupo]] = validas[fim_de_grupo]
+    return ultimo
+
+def calcular_vp(df_chuva, datas=None, estacoes=None):
+    """
+    Calcula o VP horário de todas as estações e dias do DataFrame numa só passada.
+
+    `df_chuva` precisa das colunas `datahora`, `nomeEstacao` e `valorMedida`.
+    `datas` (lista de 'AAAA-MM-DD') e `estacoes` (nomes) filtram a entrada.
+    Devolve as colunas de COLUNAS_VP, ordenadas por estação e hora.
+    """
+    df = df_chuva
+    if estacoes is not None:
+        df = df[df['nomeEstacao'].isin(estacoes)]
+    datahora = pd.to_datetime(df['datahora']).to_numpy(dtype='datetime64[ns]')
+    dias = datahora.astype('datetime64[D]')
+    if datas is not None:
+        sel = np.isin(dias, np.array(list(datas), dtype='datetime64[D]'))
+        df, datahora, dias = df[sel], datahora[sel], dias[sel]
+    if df.empty:
+        return pd.DataFrame()
+
+    nomes, cod_estacao = np.unique(df['nomeEstacao'].to_numpy(dtype=object), return_inverse=True)
+    valores = df['valorMedida'].to_numpy(dtype=np.float64)
+    t = datahora.astype(np.int64)
+    dia = dias.astype(np.int64)
+
+    # Ordena por (estação, dia, horário) mantendo a ordem original nos empates
+    ordem = np.lexsort((t, dia, cod_estacao))
+    t, dia, cod_estacao, valores = t[ordem], dia[ordem], cod_estacao[ordem], valores[ordem]
+
+    novo_grupo = np.ones(len(t), dtype=bool)
+    novo_grupo[1:] = (dia[1:] != dia[:-1]) | (cod_estacao[1:] != cod_estacao[:-1])
+    grupo = np.cumsum(novo_grupo) - 1
+    inicio_grupo = np.flatnonzero(novo_grupo)
+    tamanhos = np.diff(np.r_[inicio_grupo, len(t)])
+    pos = np.arange(len(t)) - inicio_grupo[grupo]
+
+    # Chave única e crescente por série: grupos ficam separados por um salto maior que a janela
+    deslocamento = np.int64(2 * 86400 * 10**9)
+    chave = grupo.astype(np.int64) * deslocamento + (t - dia * np.int64(86400 * 10**9))
+    ini_10 = _inicio_janelas(chave, JANELA_10MIN.astype('timedelta64[ns]').astype(np.int64)) - inicio_grupo[grupo]
+    ini_2h = _inicio_janelas(chave, JANELA_2H.astype('timedelta64[ns]').astype(np.int64)) - inicio_grupo[grupo]
+
+    n_series, n_pos = len(tamanhos), int(tamanhos.max())
+    grade_val = np.full((n_series, n_pos), np.nan)
+    grade_val[grupo, pos] = valores
+    grade_10 = np.zeros((n_series, n_pos), dtype=np.int64)
+    grade_10[grupo, pos] = ini_10
+    grade_2h = np.zeros((n_series, n_pos), dtype=np.int64)
+    grade_2h[grupo, pos] = ini_2h
+
+    chuva_10min = _soma_movel(grade_val, grade_10, tamanhos)[grupo, pos]
+    chuva_2h = _soma_movel(grade_val, grade_2h, tamanhos)[grupo, pos]
+
+    # resample('h').last(): por hora, a última leitura não-NaN de cada coluna,
+    # com todas as horas entre a primeira e a última leitura de cada série
+    hora = t // np.int64(3600 * 10**9)
+    primeira_hora = hora[inicio_grupo]
+    n_horas = hora[inicio_grupo + tamanhos - 1] - primeira_hora + 1
+    base_saida = np.r_[0, np.cumsum(n_horas)[:-1]]
+    slot = base_saida[grupo] + (hora - primeira_hora[grupo])
+    total = int(n_horas.sum())
+
+    saida_10 = np.full(total, np.nan)
+    saida_2h = np.full(total, np.nan)
+    u10 = _ultimo_valido(chuva_10min, slot, total)
+    u2h = _ultimo_valido(chuva_2h, slot, total)
+    tem10, tem2h = u10 >= 0, u2h >= 0
+    saida_10[np.flatnonzero(tem10)] = chuva_10min[u10[tem10]]
+    saida_2h[np.flatnonzero(tem2h)] = chuva_2h[u2h[tem2h]]
+
+    grupo_saida = np.repeat(np.arange(n_series), n_horas)
+    horas_saida = primeira_hora[grupo_saida] + (np.arange(total) - base_saida[grupo_saida])
+    datahora_saida = (horas_saida * 3600).astype('datetime64[s]').astype('datetime64[ns]')
+
+    df_vp = pd.DataFrame({
+        'datahora': datahora_saida,
+        'chuva_10min': saida_10,
+        'chuva_2h': saida_2h,
+    })
+    df_vp['VP'] = (df_vp['chuva_10min'] * 6) + df_vp['chuva_2h']
+    df_vp['nomeEstacao'] = nomes[cod_estacao[inicio_grupo]][grupo_saida]
+    df_vp['data'] = df_vp['datahora'].dt.strftime('%Y-%m-%d')
+    df_vp['hora_ref'] = df_vp['datahora'].dt.strftime('%H:00:00')
+    return df_vp[COLUNAS_VP]
@@ -0,0 +1,10 @@
+import numpy as np
+import pandas as pd
+
+# Limites do nível de risco (VP × AM) e rótulos de cada faixa
+LIMITES_RISCO = [-np.inf, 30, 50, 100, np.inf]
+ROTULOS_RISCO = ['Baixo', 'Moderado', 'Moderado Alto', 'Alto']
+
+def classificar_risco(nivel_risco):
+    """Classifica valores de nível de risco nas faixas de ROTULOS_RISCO (mesmo pd.cut de sempre)."""
+    return pd.cut(nivel_risco, bins=LIMITES_RISCO, labels=ROTULOS_RISCO)
@@ -0,0 +1,339 @@
+"""
+Consultas ao histórico de risco particionado (dados/risco/AAAA-MM.csv) sem baixar nem
+ler o resultado_risco_final.csv inteiro.
+
+Cada partição mensal vira um índice colunar (.npz, no cache do usuário) com as linhas
+ordenadas por estação e horário: o mês já é o índice de data, e dentro dele cada
+estação é um bloco contíguo localizado por busca binária. O índice de um mês só é
+refeito quando o CSV dele muda. As respostas ficam num cache LRU amarrado à versão do
+histórico (tamanho e mtime das partições), então uma mesclagem nova invalida tudo; cada
+chamada recebe uma cópia da resposta guardada, que pode alterar à vontade.
+
+Uso:
+    python consulta_risco.py servir [--porta 8502]         # HTTP/JSON em 127.0.0.1
+    python consulta_risco.py estacao "Imbiribeira" --de 2025-03-01 --ate 2025-03-31
+    python consulta_risco.py horas-por-mes [--classe Alto]
+    python consulta_risco.py piores [--n 10]
+
+Rotas do servidor (todas GET, com ?cidade=<slug> opcional):
+    /estacoes
+    /risco?estacao=X&de=AAAA-MM-DD&ate=AAAA-MM-DD
+    /horas-por-mes?classe=Alto[&estacao=X][&de=...][&ate=...]
+    /piores?n=10[&estacao=X][&de=...][&ate=...]
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+import historico_risco
+import registro_estacoes
+from classificacao_risco import ROTULOS_RISCO
+
+PASTA_INDICE = os.getenv('CONSULTA_RISCO_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'risco-hoje', 'consulta'))
+MESES_EM_MEMORIA = 240
+RESULTADOS_EM_MEMORIA = 512
+PORTA_PADRAO = 8502
+NS_POR_S = 10**9
+
+class ParticaoIndexada:
+    """Um mês do histórico em colunas, ordenado por estação e horário."""
+
+    def __init__(self, estacoes, inicio_estacao, segundos, vp, am, nivel, classe):
+        self.estacoes = estacoes              # nomes, em ordem
+        self.inicio_estacao = inicio_estacao  # linhas de cada estação: [inicio[i], inicio[i+1])
+        self.segundos = segundos              # data + hora_ref, em segundos desde 1970
+        self.vp, self.am, self.nivel = vp, am, nivel
+        self.classe = classe                  # posição em ROTULOS_RISCO (-1 sem classificação)
+
+    @classmethod
+    def de_dataframe(cls, df):
+        segundos = pd.to_datetime(df['data'].astype(str) + ' ' + df['hora_ref'].astype(str)).to_numpy(dtype='datetime64[ns]').astype(np.int64) // NS_POR_S
+        nomes = df['nomeEstacao'].astype(str).to_numpy()
+        ordem = np.lexsort((segundos, nomes))
+        nomes = nomes[ordem]
+        estacoes, inicio = np.unique(nomes, return_index=True)
+        classe = pd.Categorical(df['Classificacao_Risco'], categories=ROTULOS_RISCO).codes.astype(np.int8)
+        return cls(estacoes, np.append(inicio, len(nomes)).astype(np.int64), segundos[ordem],
+                   *(pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64)[ordem] for c in ('VP', 'AM', 'Nivel_Risco_Valor')),
+                   classe[ordem])
+
+    def salvar(self, caminho, assinatura):
+        tmp = f"{caminho}.tmp.npz"
+        np.savez(tmp, estacoes=self.estacoes.astype(str), inicio_estacao=self.inicio_estacao, segundos=self.segundos,
+                 vp=self.vp, am=self.am, nivel=self.nivel, classe=self.classe, assinatura=np.array(assinatura, dtype=np.int64))
+        os.replace(tmp, caminho)
+
+    @classmethod
+    def carregar(cls, caminho, assinatura):
+        """O índice salvo, ou None se ele não for da versão atual do CSV."""
+        try:
+            with np.load(caminho) as npz:
+                if tuple(npz['assinatura']) != tuple(assinatura):
+                    return None
+                return cls(npz['estacoes'], npz['inicio_estacao'], npz['segundos'], npz['vp'], npz['am'], npz['nivel'], npz['classe'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def linhas(self, estacao=None, de_s=None, ate_s=None):
+        """Posições das linhas de uma estação (ou de todas) entre dois instantes (inclusivos)."""
+        if estacao is None:
+            posicoes = np.arange(len(self.segundos))
+            dentro = np.ones(len(posicoes), dtype=bool)
+            if de_s is not None:
+                dentro &= self.segundos >= de_s
+            if ate_s is not None:
+                dentro &= self.segundos <= ate_s
+            return posicoes[dentro]
+        i = np.searchsorted(self.estacoes, estacao)
+        if i >= len(self.estacoes) or self.estacoes[i] != estacao:
+            return np.empty(0, dtype=np.int64)
+        a, b = self.inicio_estacao[i], self.inicio_estacao[i + 1]
+        if de_s is not None:
+            a = a + np.searchsorted(self.segundos[a:b], de_s, side='left')
+        if ate_s is not None:
+            b = a + np.searchsorted(self.segundos[a:b], ate_s, side='right')
+        return np.arange(a, b)
+
+    def estacao_da_linha(self, posicoes):
+        return self.estacoes[np.searchsorted(self.inicio_estacao, posicoes, side='right') - 1]
+
+def _numero(valor):
+    return None if np.isnan(valor) else float(valor)
+
+def _segundos(data, fim_do_dia=False):
+    if not data:
+        return None
+    t = pd.Timestamp(data)
+    if fim_do_dia and len(str(data)) <= 10:
+        t += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return int(t.value // NS_POR_S)
+
+class ConsultaRisco:
+    def __init__(self, raiz=historico_risco.RAIZ_HISTORICO, pasta_indice=PASTA_INDICE):
+        self.raiz = raiz
+        chave = hashlib.sha256(os.path.abspath(raiz).encode('utf-8')).hexdigest()[:16]
+        self.pasta_indice = os.path.join(pasta_indice, chave)
+        self._particoes = OrderedDict()   # mês -> (assinatura, ParticaoIndexada)
+        self._resultados = OrderedDict()  # (consulta, parâmetros, versão) -> resposta
+        self._trava = threading.Lock()
+
+    def versao(self):
+        """Meses com (tamanho, mtime) do CSV: muda a cada partição reescrita."""
+        versao = []
+        for mes in historico_risco.listar_particoes(self.raiz):
+            st = os.stat(os.path.join(self.raiz, f"{mes}.csv"))
+            versao.append((mes, st.st_size, st.st_mtime_ns))
+        return tuple(versao)
+
+    def _particao(self, mes, assinatura):
+        with self._trava:
+            em_memoria = self._particoes.get(mes)
+            if em_memoria and em_memoria[0] == assinatura:
+                self._particoes.move_to_end(mes)
+                return em_memoria[1]
+        caminho = os.path.join(self.pasta_indice, f"{mes}.npz")
+        particao = ParticaoIndexada.carregar(caminho, assinatura)
+        if particao is None:
+            particao = ParticaoIndexada.de_dataframe(historico_risco.ler_particao(mes, self.raiz))
+            try:
+                os.makedirs(self.pasta_indice, exist_ok=True)
+                particao.salvar(caminho, assinatura)
+            except OSError as e:
+                print(f"Aviso: não foi possível salvar o índice de {mes}: {e}", file=sys.stderr)
+        with self._trava:
+            self._particoes[mes] = (assinatura, particao)
+            if len(self._particoes) > MESES_EM_MEMORIA:
+                self._particoes.popitem(last=False)
+        return particao
+
+    def _meses(self, versao, de=None, ate=None):
+        for mes, tamanho, mtime in versao:
+            if (de and mes < de[:7]) or (ate and mes > ate[:7]):
+                continue
+            yield mes, self._particao(mes, (tamanho, mtime))
+
+    @staticmethod
+    def _copia(resultado):
+        # Registros planos (textos, números, None): copiar cada dict basta
+        return [dict(r) if isinstance(r, dict) else r for r in resultado]
+
+    def _memorizado(self, consulta, parametros, calcular):
+        versao = self.versao()
+        chave = (consulta, parametros, versao)
+        with self._trava:
+            if chave in self._resultados:
+                self._resultados.move_to_end(chave)
+                return self._copia(self._resultados[chave])
+        resultado = calcular(versao)
+        with self._trava:
+            self._resultados[chave] = tuple(self._copia(resultado))
+            if len(self._resultados) > RESULTADOS_EM_MEMORIA:
+                self._resultados.popitem(last=False)
+        return resultado
+
+    @staticmethod
+    def _registros(particao, posicoes):
+        instantes = np.datetime_as_string(particao.segundos[posicoes].astype('datetime64[s]'), unit='s')
+        nomes = particao.estacao_da_linha(posicoes)
+        return [{
+            'data': t[:10], 'hora_ref': t[11:], 'nomeEstacao': str(nome),
+            'VP': _numero(particao.vp[p]), 'AM': _numero(particao.am[p]), 'Nivel_Risco_Valor': _numero(particao.nivel[p]),
+            'Classificacao_Risco': ROTULOS_RISCO[particao.classe[p]] if particao.classe[p] >= 0 else None,
+        } for t, nome, p in zip(instantes, nomes, posicoes)]
+
+    def estacoes(self):
+        def calcular(versao):
+            nomes = set()
+            for _, particao in self._meses(versao):
+                nomes.update(particao.estacoes.tolist())
+            return sorted(nomes)
+        return self._memorizado('estacoes', (), calcular)
+
+    def por_estacao(self, estacao, de=None, ate=None):
+        """Linhas de uma estação entre duas datas (inclusivas), em ordem cronológica."""
+        def calcular(versao):
+            de_s, ate_s = _segundos(de), _segundos(ate, fim_do_dia=True)
+            registros = []
+            for _, particao in self._meses(versao, de, ate):
+                registros += self._registros(particao, particao.linhas(estacao, de_s, ate_s))
+            return registros
+        return self._memorizado('por_estacao', (estacao, de, ate), calcular)
+
+    def horas_por_mes(self, classe='Alto', estacao=None, de=None, ate=None):
+        """Horas em uma classe de risco, por mês e estação."""
+        if classe not in ROTULOS_RISCO:
+            raise ValueError(f"Classe desconhecida: {classe} (use {', '.join(ROTULOS_RISCO)}).")
+        codigo = ROTULOS_RISCO.index(classe)
+        def calcular(versao):
+            de_s, ate_s = _segundos(de), _segundos(ate, fim_do_dia=True)
+            resposta = []
+            for mes, particao in self._meses(versao, de, ate):
+                posicoes = particao.linhas(estacao, de_s, ate_s)
+                posicoes = posicoes[particao.classe[posicoes] == codigo]
+                nomes, horas = np.unique(particao.estacao_da_linha(posicoes), return_counts=True)
+                resposta += [{'mes': mes, 'nomeEstacao': str(n), 'horas': int(h)} for n, h in zip(nomes, horas)]
+            return resposta
+        return self._memorizado('horas_por_mes', (classe, estacao, de, ate), calcular)
+
+    def piores_horas(self, n=10, estacao=None, de=None, ate=None):
+        """As `n` horas de maior nível de risco (maior primeiro; empates pela data mais recente)."""
+        def calcular(versao):
+            de_s, ate_s = _segundos(de), _segundos(ate, fim_do_dia=True)
+            candidatos = []
+            for _, particao in self._meses(versao, de, ate):
+                posicoes = particao.linhas(estacao, de_s, ate_s)
+                posicoes = posicoes[~np.isnan(particao.nivel[posicoes])]
+                if len(posicoes) > n:
+                    # Só as n maiores de cada mês podem estar entre as n maiores do período
+                    posicoes = posicoes[np.argpartition(-particao.nivel[posicoes], n - 1)[:n]]
+                candidatos += self._registros(particao, posicoes)
+            candidatos.sort(key=lambda r: (r['Nivel_Risco_Valor'], r['data'], r['hora_ref']), reverse=True)
+            return candidatos[:n]
+        return self._memorizado('piores_horas', (n, estacao, de, ate), calcular)
+
+# --- Servidor HTTP/JSON ---
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, cidades):
+        super().__init__(endereco, _Tratador)
+        self.cidades = cidades
+        self.consultas = {slug: ConsultaRisco(c['raiz_historico']) for slug, c in cidades.items()}
+
+class _Tratador(BaseHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        conteudo = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        slug = params.get('cidade') or next(iter(self.server.cidades))
+        consulta = self.server.consultas.get(slug)
+        if consulta is None:
+            return self._responder(404, {'erro': f"Cidade fora do registro: {slug}"})
+        try:
+            filtros = {'estacao': params.get('estacao'), 'de': params.get('de'), 'ate': params.get('ate')}
+            if url.path == '/estacoes':
+                return self._responder(200, consulta.estacoes())
+            if url.path == '/risco':
+                if not filtros['estacao']:
+                    return self._responder(400, {'erro': "Parâmetro 'estacao' obrigatório."})
+                return self._responder(200, consulta.por_estacao(**filtros))
+            if url.path == '/horas-por-mes':
+                return self._responder(200, consulta.horas_por_mes(params.get('classe', 'Alto'), **filtros))
+            if url.path == '/piores':
+                n = int(params.get('n', 10))
+                if not 1 <= n <= 1000:
+                    raise ValueError("'n' deve estar entre 1 e 1000.")
+                return self._responder(200, consulta.piores_horas(n, **filtros))
+            return self._responder(404, {'erro': f"Rota desconhecida: {url.path}"})
+        except ValueError as e:
+            return self._responder(400, {'erro': str(e)})
+
+def servir(porta=PORTA_PADRAO, host='127.0.0.1', slugs=None):
+    cidades = {c['slug']: c for c in registro_estacoes.selecionar_cidades(slugs)}
+    servidor = _Servidor((host, porta), cidades)
+    print(f"Consultas de risco em http://{host}:{servidor.server_port}/ ({', '.join(cidades)}).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas indexadas ao histórico de risco.")
+    parser.add_argument('--cidade', help="Cidade do registro (padrão: a primeira).")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_servir = sub.add_parser('servir', help="Servidor HTTP/JSON local.")
+    p_servir.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    p_servir.add_argument('--host', default='127.0.0.1')
+    p_estacao = sub.add_parser('estacao', help="Risco de uma estação num intervalo.")
+    p_estacao.add_argument('estacao')
+    p_horas = sub.add_parser('horas-por-mes', help="Horas numa classe de risco por mês.")
+    p_horas.add_argument('--classe', default='Alto')
+    p_piores = sub.add_parser('piores', help="Horas de maior risco.")
+    p_piores.add_argument('--n', type=int, default=10)
+    for p in (p_estacao, p_horas, p_piores):
+        p.add_argument('--de', metavar='AAAA-MM-DD')
+        p.add_argument('--ate', metavar='AAAA-MM-DD')
+    for p in (p_horas, p_piores):
+        p.add_argument('--estacao')
+    args = parser.parse_args()
+
+    try:
+        cidade = registro_estacoes.selecionar_cidades([args.cidade] if args.cidade else None)[0]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erro no registro de estações: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.comando == 'servir':
+        servir(args.porta, args.host, [cidade['slug']] if args.cidade else None)
+        return
+    consulta = ConsultaRisco(cidade['raiz_historico'])
+    if args.comando == 'estacao':
+        resultado = consulta.por_estacao(args.estacao, args.de, args.ate)
+    elif args.comando == 'horas-por-mes':
+        resultado = consulta.horas_por_mes(args.classe, args.estacao, args.de, args.ate)
+    else:
+        resultado = consulta.piores_horas(args.n, args.estacao, args.de, args.ate)
+    print(json.dumps(resultado, indent=1, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
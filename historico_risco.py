@@ -0,0 +1,177 @@
+"""
+Histórico de risco particionado por mês.
+
+Cada mês fica em RAIZ_HISTORICO/AAAA-MM.csv, com as mesmas colunas do
+resultado_risco_final.csv e já na ordem do arquivo publicado (data e hora
+decrescentes, estação crescente). Dias novos entram por mesclagem apenas nas
+partições dos meses afetados, e o resultado_risco_final.csv é remontado
+concatenando os bytes das partições, sem reler nem reordenar o histórico inteiro.
+
+Uso:
+    python historico_risco.py importar [arquivo.csv]   # parte um histórico consolidado em meses
+    python historico_risco.py montar                   # remonta o resultado_risco_final.csv
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import requests
+import pandas as pd
+import metricas
+
+RAIZ_HISTORICO = os.path.join('dados', 'risco')
+ARQUIVO_CONSOLIDADO = 'resultado_risco_final.csv'
+COLUNAS_HISTORICO = ['data', 'hora_ref', 'nomeEstacao', 'VP', 'AM', 'Nivel_Risco_Valor', 'Classificacao_Risco']
+CHAVE_HISTORICO = ['data', 'hora_ref', 'nomeEstacao']
+# Cópia do histórico remoto com ETag/Last-Modified, para baixar de novo só se ele mudar
+ARQUIVO_CACHE_REMOTO = os.getenv('HISTORICO_RISCO_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'risco-hoje', 'historico_remoto.csv'))
+TIMEOUT_REMOTO = 60
+
+def _caminho_particao(mes, raiz):
+    return os.path.join(raiz, f"{mes}.csv")
+
+def listar_particoes(raiz=RAIZ_HISTORICO):
+    """Meses (AAAA-MM) com partição gravada, em ordem cronológica."""
+    arquivos = glob.glob(os.path.join(raiz, '*.csv'))
+    return sorted(os.path.basename(a)[:-4] for a in arquivos if re.fullmatch(r'\d{4}-\d{2}\.csv', os.path.basename(a)))
+
+def existe_historico(raiz=RAIZ_HISTORICO):
+    return bool(listar_particoes(raiz))
+
+def dias_no_historico(raiz=RAIZ_HISTORICO):
+    """Datas (AAAA-MM-DD) com linhas em alguma partição do histórico."""
+    dias = set()
+    for mes in listar_particoes(raiz):
+        dias.update(pd.read_csv(_caminho_particao(mes, raiz), usecols=['data'])['data'].astype(str))
+    return dias
+
+def _ordenar(df):
+    return df.sort_values(CHAVE_HISTORICO, ascending=[False, False, True], kind='stable', ignore_index=True)
+
+def ler_particao(mes, raiz=RAIZ_HISTORICO):
+    caminho = _caminho_particao(mes, raiz)
+    if not os.path.exists(caminho):
+        return pd.DataFrame(columns=COLUNAS_HISTORICO)
+    return pd.read_csv(caminho, float_precision='round_trip')
+
+def _gravar_particao(df, mes, raiz):
+    caminho = _caminho_particao(mes, raiz)
+    tmp = f"{caminho}.tmp"
+    df[COLUNAS_HISTORICO].to_csv(tmp, index=False)
+    os.replace(tmp, caminho)
+
+def _por_mes(df):
+    df = df.drop_duplicates(subset=CHAVE_HISTORICO, keep='last')
+    return df.groupby(df['data'].astype(str).str[:7], sort=True)
+
+def mesclar(df_novos, raiz=RAIZ_HISTORICO):
+    """
+    Mescla linhas novas (colunas de COLUNAS_HISTORICO) no histórico: só as partições
+    dos meses presentes no lote são lidas e reescritas, e uma linha nova substitui a
+    existente com a mesma data, hora e estação. Devolve os meses reescritos.
+    """
+    if df_novos.empty:
+        return []
+    os.makedirs(raiz, exist_ok=True)
+    reescritos = []
+    for mes, novos in _por_mes(df_novos):
+        atual = ler_particao(mes, raiz)
+        chaves_novas = pd.MultiIndex.from_frame(novos[CHAVE_HISTORICO])
+        mantidas = atual[~pd.MultiIndex.from_frame(atual[CHAVE_HISTORICO]).isin(chaves_novas)]
+        _gravar_particao(_ordenar(pd.concat([mantidas, novos[COLUNAS_HISTORICO]], ignore_index=True)), mes, raiz)
+        reescritos.append(mes)
+    return reescritos
+
+def importar(df_historico, raiz=RAIZ_HISTORICO):
+    """Substitui todas as partições pelo conteúdo de um histórico consolidado."""
+    os.makedirs(raiz, exist_ok=True)
+    meses = []
+    for mes, grupo in _por_mes(df_historico):
+        _gravar_particao(_ordenar(grupo), mes, raiz)
+        meses.append(mes)
+    for mes in set(listar_particoes(raiz)) - set(meses):
+        os.remove(_caminho_particao(mes, raiz))
+    return meses
+
+def montar_consolidado(destino=ARQUIVO_CONSOLIDADO, raiz=RAIZ_HISTORICO):
+    """Grava o histórico consolidado juntando as partições do mês mais recente ao mais antigo."""
+    tmp = f"{destino}.tmp"
+    with open(tmp, 'wb') as saida:
+        saida.write((','.join(COLUNAS_HISTORICO) + '\n').encode('utf-8'))
+        for mes in reversed(listar_particoes(raiz)):
+            with open(_caminho_particao(mes, raiz), 'rb') as f:
+                f.readline()  # cabeçalho da partição
+                for bloco in iter(lambda: f.read(1 << 20), b''):
+                    saida.write(bloco)
+    os.replace(tmp, destino)
+
+def baixar_historico_remoto(url, caminho_cache=ARQUIVO_CACHE_REMOTO):
+    """
+    Baixa o histórico remoto com requisição condicional (If-None-Match/If-Modified-Since):
+    se o servidor responder 304, usa a cópia em cache. Devolve um DataFrame (vazio se não
+    houver nem resposta nem cache).
+    """
+    caminho_meta = f"{caminho_cache}.json"
+    meta = {}
+    if os.path.exists(caminho_cache) and os.path.exists(caminho_meta):
+        try:
+            with open(caminho_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+    cabecalhos = {}
+    if meta.get('etag'):
+        cabecalhos['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = meta['last_modified']
+
+    inicio = time.perf_counter()
+    try:
+        res = requests.get(url, headers=cabecalhos, timeout=TIMEOUT_REMOTO)
+        metricas.http('historico_remoto', time.perf_counter() - inicio, res.status_code)
+    except requests.RequestException as e:
+        metricas.http('historico_remoto', time.perf_counter() - inicio, type(e).__name__)
+        print(f"Aviso: falha ao baixar o histórico remoto: {e}", file=sys.stderr)
+        res = None
+
+    if res is not None and res.status_code in (200, 304):
+        metricas.cache('historico_remoto', res.status_code == 304)
+    if res is not None and res.status_code == 200:
+        os.makedirs(os.path.dirname(caminho_cache) or '.', exist_ok=True)
+        with open(f"{caminho_cache}.tmp", 'wb') as f:
+            f.write(res.content)
+        os.replace(f"{caminho_cache}.tmp", caminho_cache)
+        with open(caminho_meta, 'w', encoding='utf-8') as f:
+            json.dump({'etag': res.headers.get('ETag'), 'last_modified': res.headers.get('Last-Modified')}, f)
+    elif res is not None and res.status_code == 304:
+        print("Histórico remoto inalterado (304), usando a cópia em cache.")
+    elif res is not None:
+        print(f"Aviso: histórico remoto respondeu {res.status_code}.", file=sys.stderr)
+
+    if not os.path.exists(caminho_cache):
+        return pd.DataFrame()
+    return pd.read_csv(caminho_cache, float_precision='round_trip')
+
+def main():
+    parser = argparse.ArgumentParser(description="Histórico de risco particionado por mês.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_importar = sub.add_parser('importar', help="Parte um histórico consolidado em partições mensais.")
+    p_importar.add_argument('arquivo', nargs='?', default=ARQUIVO_CONSOLIDADO)
+    p_importar.add_argument('--raiz', default=RAIZ_HISTORICO)
+    p_montar = sub.add_parser('montar', help="Remonta o histórico consolidado a partir das partições.")
+    p_montar.add_argument('--destino', default=ARQUIVO_CONSOLIDADO)
+    p_montar.add_argument('--raiz', default=RAIZ_HISTORICO)
+    args = parser.parse_args()
+
+    if args.comando == 'importar':
+        meses = importar(pd.read_csv(args.arquivo, float_precision='round_trip'), args.raiz)
+        print(f"✅ '{args.arquivo}' importado para '{args.raiz}' ({len(meses)} partições).")
+    else:
+        montar_consolidado(args.destino, args.raiz)
+        print(f"✅ '{args.destino}' remontado a partir de '{args.raiz}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Índice horário da maré: um vetor contínuo de alturas indexado por horas desde 1970
+(horário local de Recife, sem fuso), construído uma vez a partir do CSV da maré e
+salvo ao lado dele. A consulta de um array de horários é só aritmética de índices,
+sem formatar datas em texto nem fazer merge.
+
+Uso:
+    python indice_mare.py            # (re)constrói o índice a partir do CSV
+"""
+import os
+import sys
+import hashlib
+import numpy as np
+import pandas as pd
+from io import StringIO
+import metricas
+
+CAMINHO_MARE_CSV = os.path.join('tide', 'mare_calculada_hora_em_hora_ano-completo.csv')
+CAMINHO_INDICE = os.path.join('tide', 'mare_indice_horario.npz')
+MAPEAMENTO_COLUNAS = {'Hora_Exata': 'datahora', 'datahora': 'datahora', 'Altura_m': 'AM', 'altura': 'AM', 'AM': 'AM'}
+NS_POR_HORA = 3600 * 10**9
+
+class MareForaDoIntervalo(ValueError):
+    """Algum horário consultado está fora do período coberto pela tabela de maré."""
+
+class IndiceMare:
+    def __init__(self, primeira_hora, valores, origem_sha256=None):
+        self.primeira_hora = int(primeira_hora)
+        self.valores = np.asarray(valores, dtype=np.float64)
+        self.origem_sha256 = origem_sha256
+
+    @property
+    def inicio(self):
+        return pd.Timestamp(self.primeira_hora * NS_POR_HORA)
+
+    @property
+    def fim(self):
+        return pd.Timestamp((self.primeira_hora + len(self.valores) - 1) * NS_POR_HORA)
+
+    def consultar(self, datahoras, fora_do_intervalo='erro', na_hora_cheia=True):
+        """
+        Altura da maré na hora cheia de cada horário (a hora é truncada, como no
+        `hora_ref` usado antes); com na_hora_cheia=False interpola linearmente entre
+        as horas vizinhas. Com fora_do_intervalo='erro' levanta MareForaDoIntervalo;
+        com 'nan' devolve NaN para esses horários.
+        """
+        ns = pd.to_datetime(np.atleast_1d(np.asarray(datahoras))).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        posicao, resto = np.divmod(ns, NS_POR_HORA)
+        posicao -= self.primeira_hora
+        fora = (posicao < 0) | (posicao >= len(self.valores))
+        if fora.any():
+            if fora_do_intervalo == 'erro':
+                primeiro = pd.Timestamp(ns[np.argmax(fora)])
+                raise MareForaDoIntervalo(
+                    f"{int(fora.sum())} horário(s) fora da tabela de maré (ex.: {primeiro}); "
+                    f"a tabela cobre de {self.inicio} a {self.fim}."
+                )
+            resultado = np.full(len(posicao), np.nan)
+            resultado[~fora] = self._valores(posicao[~fora], resto[~fora], na_hora_cheia)
+            return resultado
+        return self._valores(posicao, resto, na_hora_cheia)
+
+    def _valores(self, posicao, resto, na_hora_cheia):
+        if na_hora_cheia:
+            return self.valores[posicao]
+        seguinte = np.minimum(posicao + 1, len(self.valores) - 1)
+        fracao = resto / NS_POR_HORA
+        interpolado = self.valores[posicao] * (1 - fracao) + self.valores[seguinte] * fracao
+        return np.where(resto == 0, self.valores[posicao], interpolado)
+
+def _ler_texto(origem):
+    if origem.startswith(('http://', 'https://')):
+        import requests
+        response = requests.get(origem)
+        response.raise_for_status()
+        return response.content
+    with open(origem, 'rb') as f:
+        return f.read()
+
+def construir_indice(conteudo):
+    """Monta o índice a partir do conteúdo (bytes) do CSV de maré, ignorando marcas de conflito do git."""
+    texto = conteudo.decode('utf-8')
+    linhas = [l for l in texto.splitlines() if not l.startswith(('<<<<', '====', '>>>>')) and l.strip()]
+    if not linhas:
+        raise ValueError("CSV de maré vazio.")
+    separador = ';' if ';' in linhas[0] else ','
+    df = pd.read_csv(StringIO("\n".join(linhas)), sep=separador, decimal=',', encoding='utf-8')
+    df = df.rename(columns=MAPEAMENTO_COLUNAS)
+    if 'datahora' not in df.columns or 'AM' not in df.columns:
+        raise KeyError("Colunas de horário/altura não encontradas no CSV de maré.")
+    df['datahora'] = pd.to_datetime(df['datahora'], errors='coerce')
+    df['AM'] = pd.to_numeric(df['AM'].astype(str).str.replace(',', '.'), errors='coerce')
+    df = df.dropna(subset=['datahora'])
+
+    horas = df['datahora'].to_numpy(dtype='datetime64[ns]').astype(np.int64) // NS_POR_HORA
+    primeira = int(horas.min())
+    valores = np.full(int(horas.max()) - primeira + 1, np.nan)
+    valores[horas - primeira] = df['AM'].to_numpy(dtype=np.float64)  # repetidas: vale a última
+    return IndiceMare(primeira, valores, hashlib.sha256(conteudo).hexdigest())
+
+def salvar_indice(indice, caminho=CAMINHO_INDICE):
+    tmp = f"{caminho}.tmp.npz"
+    np.savez(tmp, primeira_hora=np.int64(indice.primeira_hora), valores=indice.valores,
+             origem_sha256=np.array(indice.origem_sha256 or ''))
+    os.replace(tmp, caminho)
+
+def carregar_indice(origem_csv=CAMINHO_MARE_CSV, caminho_indice=CAMINHO_INDICE):
+    """
+    Devolve o índice salvo se ele ainda corresponder ao CSV de origem; senão reconstrói
+    a partir do CSV (local ou URL) e tenta salvar para as próximas execuções.
+    """
+    local = not origem_csv.startswith(('http://', 'https://'))
+    if local and not os.path.exists(origem_csv) and os.path.exists(caminho_indice):
+        conteudo = None  # só o índice está disponível; confia nele
+    else:
+        conteudo = _ler_texto(origem_csv)
+
+    if os.path.exists(caminho_indice):
+        with np.load(caminho_indice) as npz:
+            sha = str(npz['origem_sha256'])
+            if conteudo is None or sha == hashlib.sha256(conteudo).hexdigest():
+                metricas.cache('indice_mare', True)
+                return IndiceMare(int(npz['primeira_hora']), npz['valores'], sha)
+
+    metricas.cache('indice_mare', False)
+    indice = construir_indice(conteudo)
+    try:
+        salvar_indice(indice, caminho_indice)
+    except OSError as e:
+        print(f"Aviso: não foi possível salvar o índice de maré: {e}", file=sys.stderr)
+    return indice
+
+if __name__ == "__main__":
+    indice = construir_indice(_ler_texto(CAMINHO_MARE_CSV))
+    salvar_indice(indice)
+    print(f"✅ Índice de maré salvo em '{CAMINHO_INDICE}' ({len(indice.valores)} horas, de {indice.inicio} a {indice.fim}).")
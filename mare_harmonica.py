@@ -0,0 +1,293 @@
+"""
+Previsão harmônica da maré: h(t) = Z0 + Σ f·A·cos(ω·t + u − g), avaliada de forma
+vetorizada para qualquer array de horários (a cada hora, a cada 5 min...), com as
+correções nodais (f, u) de cada constituinte pela longitude do nodo lunar.
+
+As constantes (Z0 e amplitude/fase de cada constituinte) são ajustadas por mínimos
+quadrados à tabela horária de tide/ e guardadas num JSON junto com a validação contra
+ela. A tabela é interpolada linearmente entre preamares e baixa-mares, então a previsão
+harmônica (que é suave) fica a alguns centímetros dela; o erro sai no JSON.
+
+Os valores de cada dia são calculados uma vez, de minuto em minuto, e memorizados.
+
+Uso:
+    python mare_harmonica.py ajustar     # ajusta as constantes à tabela de tide/ e valida
+    python mare_harmonica.py validar     # compara as constantes salvas com a tabela
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import indice_mare
+
+CAMINHO_CONSTANTES = os.path.join('tide', 'constantes_harmonicas_recife.json')
+NS_POR_MINUTO = 60 * 10**9
+MINUTOS_POR_DIA = 1440
+DIAS_MEMORIZADOS = 4096
+# Época J1900 (1899-12-31 12:00) em horas desde 1970, para a longitude do nodo lunar
+_J1900_H = pd.Timestamp('1899-12-31 12:00').value / (3600 * 10**9)
+
+# Velocidade angular (graus/hora) das constituintes ajustadas
+VELOCIDADES = {
+    'SA': 0.0410686, 'SSA': 0.0821373, 'MM': 0.5443747, 'MSF': 1.0158958, 'MF': 1.0980331,
+    '2Q1': 12.8542862, 'Q1': 13.3986609, 'RHO1': 13.4715145, 'O1': 13.9430356, 'M1': 14.4966939,
+    'P1': 14.9589314, 'S1': 15.0, 'K1': 15.0410686, 'J1': 15.5854433, 'OO1': 16.1391017,
+    'EPS2': 27.4238337, '2N2': 27.8953548, 'MU2': 27.9682084, 'N2': 28.4397295, 'NU2': 28.5125831,
+    'M2': 28.9841042, 'LDA2': 29.4556253, 'L2': 29.5284789, 'T2': 29.9589333, 'S2': 30.0,
+    'R2': 30.0410667, 'K2': 30.0821373, '2SM2': 31.0158958,
+    '2MK3': 42.9271398, 'M3': 43.4761563, 'MK3': 44.0251729, 'SK3': 45.0410686,
+    'MN4': 57.4238337, 'M4': 57.9682084, 'SN4': 58.4397295, 'MS4': 58.9841042, 'MK4': 59.0662415, 'S4': 60.0,
+    'M6': 86.9523127, '2MS6': 87.9682084, 'S6': 90.0, 'M8': 115.9364166,
+}
+
+def _nodo_lunar(horas):
+    """Longitude do nodo ascendente da Lua (graus) em horas desde 1970."""
+    seculos = (np.asarray(horas, dtype=np.float64) - _J1900_H) / (24 * 36525)
+    return 259.1560564 - 1934.1423972 * seculos
+
+def correcoes_nodais(nome, nodo):
+    """Fator f e ângulo u (graus) da constituinte para a longitude do nodo `nodo` (graus)."""
+    n = np.radians(nodo)
+    f_m2 = 1.0004 - 0.0373 * np.cos(n) + 0.0002 * np.cos(2 * n)
+    u_m2 = -2.14 * np.sin(n)
+    f_k1 = 1.0060 + 0.1150 * np.cos(n) - 0.0088 * np.cos(2 * n) + 0.0006 * np.cos(3 * n)
+    u_k1 = -8.86 * np.sin(n) + 0.68 * np.sin(2 * n) - 0.07 * np.sin(3 * n)
+    f_o1 = 1.0089 + 0.1871 * np.cos(n) - 0.0147 * np.cos(2 * n) + 0.0014 * np.cos(3 * n)
+    u_o1 = 10.80 * np.sin(n) - 1.34 * np.sin(2 * n) + 0.19 * np.sin(3 * n)
+    f_k2 = 1.0241 + 0.2863 * np.cos(n) + 0.0083 * np.cos(2 * n) - 0.0015 * np.cos(3 * n)
+    u_k2 = -17.74 * np.sin(n) + 0.68 * np.sin(2 * n) - 0.04 * np.sin(3 * n)
+    if nome in ('M2', 'N2', '2N2', 'MU2', 'NU2', 'L2', 'EPS2', 'LDA2', 'MS4', 'SN4'):
+        return f_m2, u_m2
+    if nome in ('O1', 'Q1', '2Q1', 'RHO1', 'M1'):
+        return f_o1, u_o1
+    if nome in ('K1', 'SK3'):
+        return f_k1, u_k1
+    if nome == 'K2':
+        return f_k2, u_k2
+    if nome in ('M4', 'MN4', '2MS6'):
+        return f_m2 ** 2, 2 * u_m2
+    if nome == 'M3':
+        return f_m2 ** 1.5, 1.5 * u_m2
+    if nome == 'M6':
+        return f_m2 ** 3, 3 * u_m2
+    if nome == 'M8':
+        return f_m2 ** 4, 4 * u_m2
+    if nome == 'MK3':
+        return f_m2 * f_k1, u_m2 + u_k1
+    if nome == '2MK3':
+        return f_m2 ** 2 * f_k1, 2 * u_m2 - u_k1
+    if nome == 'MK4':
+        return f_m2 * f_k2, u_m2 + u_k2
+    if nome in ('2SM2', 'MSF'):
+        return f_m2, -u_m2
+    if nome == 'MF':
+        return 1.043 + 0.414 * np.cos(n), -23.7 * np.sin(n) + 2.7 * np.sin(2 * n) - 0.4 * np.sin(3 * n)
+    if nome == 'MM':
+        return 1.0 - 0.130 * np.cos(n), np.zeros_like(n)
+    if nome == 'OO1':
+        return (1.1027 + 0.6504 * np.cos(n) + 0.0317 * np.cos(2 * n) - 0.0014 * np.cos(3 * n),
+                -36.68 * np.sin(n) + 4.02 * np.sin(2 * n) - 0.57 * np.sin(3 * n))
+    return np.ones_like(n), np.zeros_like(n)  # constituintes solares
+
+def _termos(nomes, horas, nodo):
+    """Colunas cos/sen (já com f e u) de cada constituinte nos horários dados (horas desde 1970)."""
+    colunas = []
+    for nome in nomes:
+        f, u = correcoes_nodais(nome, nodo)
+        angulo = np.radians(VELOCIDADES[nome] * horas + u)
+        colunas.append((f * np.cos(angulo), f * np.sin(angulo)))
+    return colunas
+
+class MareHarmonica:
+    def __init__(self, nivel_medio, constituintes, validacao=None, origem_sha256=None):
+        self.nivel_medio = float(nivel_medio)
+        # nome -> (amplitude em m, fase em graus)
+        self.constituintes = {k: (float(a), float(g)) for k, (a, g) in constituintes.items()}
+        self.validacao = validacao
+        self.origem_sha256 = origem_sha256
+        self._dias = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado['_dias'], estado['_trava'] = OrderedDict(), None
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._trava = threading.Lock()
+
+    def prever_horas(self, horas, nodo=None):
+        """Altura (m) em horários dados em horas (float) desde 1970, horário local sem fuso."""
+        horas = np.asarray(horas, dtype=np.float64)
+        nodo = _nodo_lunar(horas) if nodo is None else nodo
+        altura = np.full(horas.shape, self.nivel_medio)
+        nomes = list(self.constituintes)
+        for nome, (cos_, sen_) in zip(nomes, _termos(nomes, horas, nodo)):
+            amplitude, fase = self.constituintes[nome]
+            g = np.radians(fase)
+            altura += amplitude * (np.cos(g) * cos_ + np.sin(g) * sen_)
+        return altura
+
+    def _dia(self, dia):
+        """Os 1440 valores (um por minuto) do dia `dia` (dias desde 1970), memorizados."""
+        with self._trava:
+            valores = self._dias.get(dia)
+            if valores is not None:
+                self._dias.move_to_end(dia)
+                return valores
+        horas = (dia * MINUTOS_POR_DIA + np.arange(MINUTOS_POR_DIA)) / 60.0
+        # f e u variam em 18,6 anos: um valor por dia basta
+        valores = self.prever_horas(horas, nodo=_nodo_lunar(dia * 24 + 12))
+        with self._trava:
+            self._dias[dia] = valores
+            if len(self._dias) > DIAS_MEMORIZADOS:
+                self._dias.popitem(last=False)
+        return valores
+
+    def consultar(self, datahoras, fora_do_intervalo='erro', na_hora_cheia=True):
+        """
+        Altura da maré em cada horário. Com na_hora_cheia=True a hora é truncada, como
+        na tabela horária; senão vale o minuto do horário. A previsão cobre qualquer data,
+        então `fora_do_intervalo` existe só para manter a interface de IndiceMare.
+        """
+        ns = pd.to_datetime(np.atleast_1d(np.asarray(datahoras))).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        minutos = np.floor_divide(ns, NS_POR_MINUTO)
+        if na_hora_cheia:
+            minutos -= minutos % 60
+        dias, posicao = np.divmod(minutos, MINUTOS_POR_DIA)
+        unicos, qual = np.unique(dias, return_inverse=True)
+        if not len(unicos):
+            return np.empty(0)
+        tabela = np.stack([self._dia(int(d)) for d in unicos])
+        return tabela[qual.ravel(), posicao]
+
+    def para_json(self):
+        return {
+            'nivel_medio': self.nivel_medio,
+            'constituintes': {k: {'velocidade': VELOCIDADES[k], 'amplitude': a, 'fase': g} for k, (a, g) in self.constituintes.items()},
+            'origem_sha256': self.origem_sha256,
+            'validacao': self.validacao,
+        }
+
+def ajustar(indice, nomes=None, inicio=None, fim=None):
+    """Ajusta Z0 e amplitude/fase das constituintes aos valores horários de um IndiceMare."""
+    nomes = list(nomes or VELOCIDADES)
+    horas = indice.primeira_hora + np.arange(len(indice.valores), dtype=np.float64)
+    valido = ~np.isnan(indice.valores)
+    if inicio is not None:
+        valido &= horas >= inicio
+    if fim is not None:
+        valido &= horas < fim
+    h = horas[valido]
+    colunas = [np.ones(len(h))]
+    for cos_, sen_ in _termos(nomes, h, _nodo_lunar(h)):
+        colunas += [cos_, sen_]
+    coef, *_ = np.linalg.lstsq(np.column_stack(colunas), indice.valores[valido], rcond=None)
+    constituintes = {}
+    for i, nome in enumerate(nomes):
+        a, b = coef[1 + 2 * i], coef[2 + 2 * i]
+        constituintes[nome] = (float(np.hypot(a, b)), float(np.degrees(np.arctan2(b, a)) % 360))
+    return MareHarmonica(coef[0], constituintes, origem_sha256=indice.origem_sha256)
+
+def validar(mare, indice, inicio=None, fim=None):
+    """Erros da previsão contra a tabela horária (em metros)."""
+    horas = indice.primeira_hora + np.arange(len(indice.valores), dtype=np.float64)
+    valido = ~np.isnan(indice.valores)
+    if inicio is not None:
+        valido &= horas >= inicio
+    if fim is not None:
+        valido &= horas < fim
+    datahoras = (horas[valido].astype(np.int64) * 3600).astype('datetime64[s]')
+    erro = mare.consultar(datahoras) - indice.valores[valido]
+    return {
+        'horas': int(valido.sum()),
+        'rmse_m': round(float(np.sqrt(np.mean(erro ** 2))), 4),
+        'erro_max_m': round(float(np.abs(erro).max()), 4),
+        'vies_m': round(float(erro.mean()), 4),
+    }
+
+def ajustar_e_validar(indice):
+    """
+    Ajusta à tabela inteira e valida contra ela; além disso ajusta só ao primeiro ano e
+    valida no restante, para medir o erro em datas fora do período ajustado.
+    """
+    mare = ajustar(indice)
+    validacao = {'periodo': [str(indice.inicio), str(indice.fim)], 'ajuste': validar(mare, indice)}
+    corte = indice.primeira_hora + 8766
+    if corte < indice.primeira_hora + len(indice.valores) - 24 * 30:
+        validacao['extrapolacao'] = validar(ajustar(indice, fim=corte), indice, inicio=corte)
+    mare.validacao = validacao
+    return mare
+
+def salvar_constantes(mare, caminho=CAMINHO_CONSTANTES):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(mare.para_json(), f, indent=1)
+    os.replace(tmp, caminho)
+
+def carregar_constantes(caminho=CAMINHO_CONSTANTES):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        bruto = json.load(f)
+    constituintes = {k: (c['amplitude'], c['fase']) for k, c in bruto['constituintes'].items()}
+    return MareHarmonica(bruto['nivel_medio'], constituintes, bruto.get('validacao'), bruto.get('origem_sha256'))
+
+class TabelaComPrevisao:
+    """
+    Tabela horária como referência e previsão harmônica fora do período dela, para o
+    cálculo não parar quando a tabela do ano ainda não foi gerada.
+    """
+
+    def __init__(self, tabela, previsao):
+        self.tabela = tabela
+        self.previsao = previsao
+
+    def consultar(self, datahoras, fora_do_intervalo='erro', na_hora_cheia=True):
+        datahoras = pd.to_datetime(np.atleast_1d(np.asarray(datahoras)))
+        resultado = np.asarray(self.tabela.consultar(datahoras, fora_do_intervalo='nan', na_hora_cheia=na_hora_cheia), dtype=np.float64)
+        hora = datahoras.floor('h')
+        fora = np.asarray((hora < self.tabela.inicio) | (hora > self.tabela.fim))
+        if fora.any():
+            resultado[fora] = self.previsao.consultar(datahoras[fora], na_hora_cheia=na_hora_cheia)
+        return resultado
+
+def carregar_mare_cidade(cidade):
+    """
+    Fonte de maré de uma cidade do registro: a tabela horária (com a previsão harmônica
+    para fora do período dela, se houver constantes) ou, com "fonte": "harmonica", só a
+    previsão, sem ler a tabela.
+    """
+    caminho_constantes = cidade.get('mare_harmonicas')
+    previsao = carregar_constantes(caminho_constantes) if caminho_constantes and os.path.exists(caminho_constantes) else None
+    if cidade.get('mare_fonte') == 'harmonica':
+        if previsao is None:
+            raise FileNotFoundError(f"Constantes harmônicas não encontradas: {caminho_constantes}")
+        return previsao
+    tabela = indice_mare.carregar_indice(cidade['mare_csv'], cidade['mare_indice'])
+    return TabelaComPrevisao(tabela, previsao) if previsao is not None else tabela
+
+def main():
+    parser = argparse.ArgumentParser(description="Previsão harmônica da maré.")
+    parser.add_argument('comando', choices=['ajustar', 'validar'])
+    parser.add_argument('--tabela', default=indice_mare.CAMINHO_MARE_CSV, help="CSV horário de referência.")
+    parser.add_argument('--constantes', default=CAMINHO_CONSTANTES)
+    args = parser.parse_args()
+
+    indice = indice_mare.construir_indice(indice_mare._ler_texto(args.tabela))
+    if args.comando == 'ajustar':
+        mare = ajustar_e_validar(indice)
+        salvar_constantes(mare, args.constantes)
+        print(f"✅ {len(mare.constituintes)} constituintes salvas em '{args.constantes}'.")
+        print(json.dumps(mare.validacao, indent=1))
+    else:
+        mare = carregar_constantes(args.constantes)
+        if mare.origem_sha256 and mare.origem_sha256 != indice.origem_sha256:
+            print("Aviso: a tabela mudou desde o ajuste das constantes.", file=sys.stderr)
+        print(json.dumps(validar(mare, indice), indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Instrumentação leve do pipeline: duração de cada etapa, latência e status de cada
+requisição HTTP, linhas lidas e gravadas, acertos e falhas de cache e pico de memória.
+O pico de memória vem de ru_maxrss, que é o pico do processo inteiro até aquele momento:
+em cada etapa ele aparece como `pico_rss_processo_mb` (o pico do processo ao fim da etapa,
+não o quanto a etapa usou). Sem o módulo resource (Windows), não há leitura de memória.
+
+Desligada por padrão: sem METRICAS_DIR no ambiente, etapa() devolve sempre o mesmo
+contexto vazio e as demais funções retornam na primeira linha. Ligada, cada execução
+grava em METRICAS_DIR um relatório <execucao>.json e um <execucao>.prom no formato
+texto do Prometheus (para o textfile collector do node_exporter).
+
+Uso:
+    metricas.iniciar('coleta')
+    with metricas.etapa('busca_cemaden'):
+        ...
+    metricas.contar('linhas_gravadas', len(df), destino='armazem')
+    metricas.exportar()
+"""
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # sem getrusage (Windows): as métricas saem sem pico de memória
+    resource = None
+
+PASTA_METRICAS = os.getenv('METRICAS_DIR')
+PREFIXO_PROMETHEUS = 'risco_hoje'
+
+_NADA = nullcontext()
+_coletor = None
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+def _pico_rss_mb(filhos=False):
+    """Pico de memória residente do processo (ou dos filhos já encerrados), em MB; None sem resource."""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_CHILDREN if filhos else resource.RUSAGE_SELF).ru_maxrss
+    return round(maximo / (2**20 if sys.platform == 'darwin' else 1024), 1)  # bytes no macOS, KB no Linux
+
+class _Etapa:
+    __slots__ = ('coletor', 'chave', 'inicio')
+
+    def __init__(self, coletor, chave):
+        self.coletor, self.chave = coletor, chave
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.coletor.registrar_etapa(self.chave, time.perf_counter() - self.inicio)
+        return False
+
+class Coletor:
+    def __init__(self, execucao, pasta):
+        self.execucao = execucao
+        self.pasta = pasta
+        self.inicio = time.time()
+        self.etapas = {}       # (nome, rótulos) -> [segundos, vezes, máximo, pico RSS do processo em MB]
+        self.contadores = {}   # (nome, rótulos) -> valor
+        self.requisicoes = {}  # (alvo, status) -> [requisições, segundos, máximo]
+        self._trava = threading.Lock()
+
+    def registrar_etapa(self, chave, segundos):
+        pico = _pico_rss_mb() or 0.0
+        with self._trava:
+            etapa = self.etapas.setdefault(chave, [0.0, 0, 0.0, 0.0])
+            etapa[0] += segundos
+            etapa[1] += 1
+            etapa[2] = max(etapa[2], segundos)
+            etapa[3] = max(etapa[3], pico)
+
+    def retrato(self):
+        """Cópia dos valores acumulados, para mandar de um processo filho ao principal."""
+        with self._trava:
+            return {
+                'etapas': {k: list(v) for k, v in self.etapas.items()},
+                'contadores': dict(self.contadores),
+                'requisicoes': {k: list(v) for k, v in self.requisicoes.items()},
+            }
+
+    def incorporar(self, retrato):
+        with self._trava:
+            for chave, (segundos, vezes, maximo, pico) in retrato['etapas'].items():
+                etapa = self.etapas.setdefault(chave, [0.0, 0, 0.0, 0.0])
+                etapa[0] += segundos
+                etapa[1] += vezes
+                etapa[2] = max(etapa[2], maximo)
+                etapa[3] = max(etapa[3], pico)
+            for chave, valor in retrato['contadores'].items():
+                self.contadores[chave] = self.contadores.get(chave, 0) + valor
+            for chave, (n, segundos, maximo) in retrato['requisicoes'].items():
+                req = self.requisicoes.setdefault(chave, [0, 0.0, 0.0])
+                req[0] += n
+                req[1] += segundos
+                req[2] = max(req[2], maximo)
+
+    def relatorio(self):
+        with self._trava:
+            etapas = [{'nome': nome, 'rotulos': dict(rotulos), 'segundos': round(s, 4), 'vezes': n,
+                       'maximo_s': round(m, 4), 'pico_rss_processo_mb': p if resource is not None else None}
+                      for (nome, rotulos), (s, n, m, p) in self.etapas.items()]
+            contadores = [{'nome': nome, 'rotulos': dict(rotulos), 'valor': v} for (nome, rotulos), v in sorted(self.contadores.items())]
+            requisicoes = [{'alvo': alvo, 'status': status, 'requisicoes': n, 'latencia_total_s': round(s, 4),
+                            'latencia_media_s': round(s / n, 4), 'latencia_maxima_s': round(m, 4)}
+                           for (alvo, status), (n, s, m) in sorted(self.requisicoes.items())]
+        return {
+            'execucao': self.execucao,
+            'inicio': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.inicio)),
+            'duracao_s': round(time.time() - self.inicio, 3),
+            'etapas': etapas,
+            'http': requisicoes,
+            'contadores': contadores,
+            'pico_rss_mb': _pico_rss_mb(),
+            'pico_rss_filhos_mb': _pico_rss_mb(filhos=True),
+        }
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _rotulos(**rotulos):
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items()) + '}'
+
+def formatar_prometheus(relatorio):
+    """Relatório no formato texto de exposição do Prometheus."""
+    metricas = {}
+
+    def amostra(nome, tipo, ajuda, valor, **rotulos):
+        nome = f"{PREFIXO_PROMETHEUS}_{re.sub(r'[^a-zA-Z0-9_]', '_', nome)}"
+        linhas = metricas.setdefault(nome, [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"])
+        linhas.append(f"{nome}{_rotulos(execucao=relatorio['execucao'], **rotulos)} {valor}")
+
+    for e in relatorio['etapas']:
+        rotulos = dict(etapa=e['nome'], **e['rotulos'])
+        amostra('etapa_segundos_total', 'counter', 'Tempo gasto na etapa.', e['segundos'], **rotulos)
+        amostra('etapa_execucoes_total', 'counter', 'Vezes que a etapa rodou.', e['vezes'], **rotulos)
+        amostra('etapa_segundos_maximo', 'gauge', 'Maior duração de uma execução da etapa.', e['maximo_s'], **rotulos)
+    for r in relatorio['http']:
+        rotulos = dict(alvo=r['alvo'], status=r['status'])
+        amostra('http_requisicoes_total', 'counter', 'Requisições HTTP por alvo e status.', r['requisicoes'], **rotulos)
+        amostra('http_latencia_segundos_total', 'counter', 'Soma das latências HTTP.', r['latencia_total_s'], **rotulos)
+        amostra('http_latencia_segundos_maximo', 'gauge', 'Maior latência HTTP.', r['latencia_maxima_s'], **rotulos)
+    for c in relatorio['contadores']:
+        amostra(f"{c['nome']}_total", 'counter', f"Contador {c['nome']}.", c['valor'], **c['rotulos'])
+    if relatorio['pico_rss_mb'] is not None:
+        amostra('pico_memoria_bytes', 'gauge', 'Pico de memória residente.', int(relatorio['pico_rss_mb'] * 2**20), processo='principal')
+        amostra('pico_memoria_bytes', 'gauge', 'Pico de memória residente.', int(relatorio['pico_rss_filhos_mb'] * 2**20), processo='filhos')
+    amostra('duracao_segundos', 'gauge', 'Duração da execução.', relatorio['duracao_s'])
+    amostra('ultima_execucao_timestamp_seconds', 'gauge', 'Fim da última execução.', round(time.time(), 3))
+    return '\n'.join(l for linhas in metricas.values() for l in linhas) + '\n'
+
+def _gravar(caminho, texto):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(tmp, caminho)
+
+# --- Interface usada pelo pipeline (tudo vira nada sem coletor) ---
+
+def iniciar(execucao, pasta=None, acumular=False):
+    """
+    Liga a coleta se houver pasta de saída (parâmetro ou METRICAS_DIR). Com acumular=True,
+    mantém o coletor já ativo da mesma execução (o painel, que roda o script várias vezes
+    no mesmo processo, acumula como um serviço).
+    """
+    global _coletor
+    pasta = pasta or PASTA_METRICAS
+    if not pasta:
+        _coletor = None
+        return None
+    if not (acumular and _coletor is not None and _coletor.execucao == execucao):
+        _coletor = Coletor(execucao, pasta)
+    return _coletor
+
+def ativo():
+    return _coletor is not None
+
+def etapa(nome, **rotulos):
+    """Contexto que mede a duração de uma etapa."""
+    if _coletor is None:
+        return _NADA
+    return _Etapa(_coletor, _chave(nome, rotulos))
+
+def contar(nome, n=1, **rotulos):
+    """Soma `n` a um contador (linhas_lidas, linhas_gravadas, cache...)."""
+    if _coletor is None:
+        return
+    chave = _chave(nome, rotulos)
+    with _coletor._trava:
+        _coletor.contadores[chave] = _coletor.contadores.get(chave, 0) + n
+
+def valor(nome, **rotulos):
+    if _coletor is None:
+        return 0
+    return _coletor.contadores.get(_chave(nome, rotulos), 0)
+
+def cache(nome, acertou, n=1):
+    contar('cache', n, cache=nome, resultado='acerto' if acertou else 'falha')
+
+def http(alvo, segundos, status):
+    """Uma tentativa de requisição: `status` é o código HTTP ou o nome da exceção."""
+    if _coletor is None:
+        return
+    with _coletor._trava:
+        req = _coletor.requisicoes.setdefault((str(alvo), str(status)), [0, 0.0, 0.0])
+        req[0] += 1
+        req[1] += segundos
+        req[2] = max(req[2], segundos)
+
+def retrato():
+    return _coletor.retrato() if _coletor is not None else None
+
+def incorporar(retrato_filho):
+    if _coletor is not None and retrato_filho:
+        _coletor.incorporar(retrato_filho)
+
+def exportar():
+    """Grava o relatório JSON e o arquivo .prom da execução atual; devolve o relatório."""
+    if _coletor is None:
+        return None
+    relatorio = _coletor.relatorio()
+    try:
+        os.makedirs(_coletor.pasta, exist_ok=True)
+        base = os.path.join(_coletor.pasta, _coletor.execucao)
+        _gravar(f"{base}.json", json.dumps(relatorio, indent=1, ensure_ascii=False) + '\n')
+        _gravar(f"{base}.prom", formatar_prometheus(relatorio))
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar as métricas: {e}", file=sys.stderr)
+    return relatorio
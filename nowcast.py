@@ -0,0 +1,254 @@
+"""
+Nowcast do risco a cada coleta: o VP mais recente de cada estação, mantido constante,
+combinado com a maré das próximas horas numa grade de 5 em 5 minutos e classificado
+com os mesmos limites do histórico (classificar_risco), tudo de uma vez para a grade
+estações × horizonte.
+
+A grade começa no horário da coleta, não no da leitura: estação cuja última leitura tem
+mais de vp_continuo.ATRASO_MAXIMO_S fica marcada como desatualizada e fora dos alertas.
+
+Cada estação tem dois estados: a classe agora e a pior classe prevista no horizonte.
+Só mudanças em relação ao último estado emitido (guardado em dados/estado_alertas.json)
+viram alertas, entregues às saídas configuradas: o arquivo dados/alertas.jsonl e, com
+ALERTAS_WEBHOOK, um POST em JSON. Alertas que uma saída recusou ficam pendentes no
+estado só para ela e são reenviados na coleta seguinte; as saídas que já os aceitaram
+não os recebem de novo.
+
+Uso:
+    python nowcast.py [--cidade recife]     # roda sobre o dados/risco_agora.json atual
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import requests
+import metricas
+import registro_estacoes
+import vp_continuo
+from classificacao_risco import classificar_risco, ROTULOS_RISCO
+
+HORIZONTE_H = float(os.getenv('NOWCAST_HORIZONTE_H', '3'))
+PASSO_MIN = 5
+DURACAO_TICK_S = 300
+ARQUIVO_ESTADO_ALERTAS = os.path.join('dados', 'estado_alertas.json')
+ARQUIVO_ALERTAS = os.path.join('dados', 'alertas.jsonl')
+URL_WEBHOOK = os.getenv('ALERTAS_WEBHOOK')
+TIMEOUT_WEBHOOK = 10
+# Alertas pendentes guardados por saída; acima disso os mais antigos são descartados
+LIMITE_PENDENTES = 500
+
+def projetar(df_vp, mare, agora=None, horizonte_h=HORIZONTE_H, passo_min=PASSO_MIN):
+    """
+    Risco de cada estação de `agora` (padrão: o horário local atual) até `horizonte_h`
+    horas à frente: DataFrame com a classe agora, a pior classe prevista, quando ela é
+    atingida pela primeira vez e o maior nível previsto. Estações com leitura mais antiga
+    que vp_continuo.ATRASO_MAXIMO_S saem com `desatualizada` e sem classe.
+    """
+    if df_vp.empty:
+        return pd.DataFrame()
+    agora = (vp_continuo.agora_local() if agora is None else pd.Timestamp(agora)).floor('s')
+    atraso = vp_continuo.atraso_leitura(df_vp['datahora'], agora)
+    desatualizada = ~(atraso <= vp_continuo.ATRASO_MAXIMO_S)
+    # Mesma grade para todas as estações: a maré é consultada uma vez só
+    grade = agora + pd.to_timedelta(np.arange(0, horizonte_h * 60 + passo_min / 2, passo_min), unit='min')
+    am = np.asarray(mare.consultar(grade.to_numpy(), fora_do_intervalo='nan', na_hora_cheia=False), dtype=np.float64)
+    vp = pd.to_numeric(df_vp['VP'], errors='coerce').to_numpy(dtype=np.float64)
+    nivel = (vp[:, None] * am[None, :]).round(2)
+    nivel[desatualizada] = np.nan
+    classes = pd.Categorical(classificar_risco(nivel.ravel()), categories=ROTULOS_RISCO).codes.reshape(nivel.shape)
+
+    pior = classes.max(axis=1)
+    primeiro = np.argmax(classes == pior[:, None], axis=1)
+    rotulo = lambda c: ROTULOS_RISCO[c] if c >= 0 else None
+    return pd.DataFrame({
+        'codestacao': df_vp['codestacao'].astype(str).to_numpy(),
+        'nomeEstacao': df_vp['nomeEstacao'].to_numpy(),
+        'datahora': df_vp['datahora'].astype(str).to_numpy(),
+        'atraso_leitura_s': atraso.round(1),
+        'desatualizada': desatualizada,
+        'VP': vp,
+        'AM': np.full(len(vp), am[0]),
+        'Nivel_Risco_Valor': nivel[:, 0],
+        'classe_atual': [rotulo(c) for c in classes[:, 0]],
+        'classe_prevista': [rotulo(c) for c in pior],
+        'previsto_para': grade[primeiro].strftime(vp_continuo.FORMATO_DATAHORA),
+        'nivel_previsto': pd.DataFrame(nivel).max(axis=1).to_numpy(),
+    })
+
+def carregar_estado(caminho=ARQUIVO_ESTADO_ALERTAS):
+    """Estado dos alertas: {'estacoes': {cod: último estado emitido}, 'pendentes': {saída: [alertas]}}."""
+    estado = {}
+    if os.path.exists(caminho):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Aviso: estado dos alertas ilegível ({e}), recomeçando.", file=sys.stderr)
+    if estado and 'estacoes' not in estado:
+        estado = {'estacoes': estado}  # formato antigo, só com as estações
+    return {'estacoes': estado.get('estacoes', {}), 'pendentes': estado.get('pendentes', {})}
+
+def salvar_estado(estado, caminho=ARQUIVO_ESTADO_ALERTAS):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, caminho)
+
+def transicoes(df_projecao, estado, slug_cidade):
+    """
+    Alertas das estações cujo estado (classe agora ou pior classe prevista) mudou desde
+    o último emitido, e o estado novo. Estação sem estado conta como 'Baixo'; estação
+    sem VP válido agora ou com leitura desatualizada mantém o estado anterior.
+    """
+    novo_estado = {cod: dict(e) for cod, e in estado.items()}
+    eventos = []
+    for linha in df_projecao.itertuples(index=False):
+        if pd.isna(linha.classe_atual):
+            continue
+        anterior = estado.get(linha.codestacao, {'atual': ROTULOS_RISCO[0], 'previsto': ROTULOS_RISCO[0]})
+        for tipo, classe in (('atual', linha.classe_atual), ('previsto', linha.classe_prevista)):
+            if classe == anterior.get(tipo):
+                continue
+            chave = f"{slug_cidade}|{linha.codestacao}|{tipo}|{anterior.get(tipo)}|{classe}|{linha.datahora}"
+            eventos.append({
+                'id': hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16],
+                'cidade': slug_cidade,
+                'codestacao': linha.codestacao,
+                'nomeEstacao': linha.nomeEstacao,
+                'tipo': tipo,
+                'de': anterior.get(tipo),
+                'para': classe,
+                'subiu': ROTULOS_RISCO.index(classe) > ROTULOS_RISCO.index(anterior.get(tipo, ROTULOS_RISCO[0])),
+                'datahora_leitura': linha.datahora,
+                'atraso_leitura_s': float(linha.atraso_leitura_s),
+                'previsto_para': linha.previsto_para if tipo == 'previsto' else linha.datahora,
+                'VP': None if np.isnan(linha.VP) else round(float(linha.VP), 4),
+                'Nivel_Risco_Valor': None if np.isnan(linha.Nivel_Risco_Valor) else float(linha.Nivel_Risco_Valor),
+                'nivel_previsto': None if np.isnan(linha.nivel_previsto) else float(linha.nivel_previsto),
+            })
+        novo_estado[linha.codestacao] = {'atual': linha.classe_atual, 'previsto': linha.classe_prevista, 'datahora': linha.datahora}
+    return eventos, novo_estado
+
+# --- Saídas dos alertas: qualquer objeto com enviar(eventos) e um `nome` estável,
+# que identifica os alertas pendentes dela no estado ---
+
+class SaidaArquivo:
+    """Acrescenta os alertas, um JSON por linha, a um arquivo."""
+    nome = 'arquivo'
+
+    def __init__(self, caminho=ARQUIVO_ALERTAS):
+        self.caminho = caminho
+
+    def enviar(self, eventos):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            for evento in eventos:
+                f.write(json.dumps(evento, ensure_ascii=False) + '\n')
+
+class SaidaWebhook:
+    """Envia os alertas num POST JSON ({"alertas": [...]})."""
+    nome = 'webhook'
+
+    def __init__(self, url, sessao=None, timeout=TIMEOUT_WEBHOOK):
+        self.url = url
+        self.sessao = sessao or requests.Session()
+        self.timeout = timeout
+
+    def enviar(self, eventos):
+        inicio = time.perf_counter()
+        res = self.sessao.post(self.url, json={'alertas': eventos}, timeout=self.timeout)
+        metricas.http('webhook_alertas', time.perf_counter() - inicio, res.status_code)
+        res.raise_for_status()
+
+class SaidaMemoria:
+    """Guarda os alertas em memória; substitui o webhook em testes."""
+
+    def __init__(self, nome='memoria'):
+        self.nome = nome
+        self.eventos = []
+
+    def enviar(self, eventos):
+        self.eventos.extend(eventos)
+
+def saidas_padrao(cidade):
+    saidas = [SaidaArquivo(cidade['alertas'])]
+    if URL_WEBHOOK:
+        saidas.append(SaidaWebhook(URL_WEBHOOK))
+    return saidas
+
+def executar_nowcast(df_vp, mare, cidade, saidas=None, recebido_em=None, agora=None):
+    """
+    Projeta o risco, detecta as mudanças de estado e entrega os alertas, junto com os
+    pendentes de coletas anteriores de cada saída. `recebido_em` (time.time() de quando
+    as leituras chegaram) é a origem da latência registrada em cada alerta. Devolve a
+    lista de alertas novos.
+    """
+    recebido_em = recebido_em or time.time()
+    saidas = saidas_padrao(cidade) if saidas is None else saidas
+    with metricas.etapa('nowcast', cidade=cidade['slug']):
+        df_projecao = projetar(df_vp, mare, agora=agora)
+        if df_projecao.empty:
+            return []
+        atrasadas = int(df_projecao['desatualizada'].sum())
+        if atrasadas:
+            print(f"[{cidade['nome']}] Aviso: {atrasadas} estação(ões) com leitura de mais de {vp_continuo.ATRASO_MAXIMO_S / 60:.0f} min, fora dos alertas.", file=sys.stderr)
+        estado = carregar_estado(cidade['estado_alertas'])
+        eventos, estacoes = transicoes(df_projecao, estado['estacoes'], cidade['slug'])
+
+        emitido_em = time.time()
+        for evento in eventos:
+            evento['emitido_em'] = pd.Timestamp(emitido_em, unit='s', tz='UTC').tz_convert('America/Recife').strftime(vp_continuo.FORMATO_DATAHORA)
+            evento['latencia_s'] = round(emitido_em - recebido_em, 3)
+
+        # Pendentes de saídas que não estão mais configuradas são descartados
+        nomes = [getattr(saida, 'nome', type(saida).__name__) for saida in saidas]
+        pendentes = {nome: estado['pendentes'][nome] for nome in nomes if estado['pendentes'].get(nome)}
+        for saida, nome in zip(saidas, nomes):
+            lote = pendentes.pop(nome, []) + eventos
+            if not lote:
+                continue
+            try:
+                saida.enviar(lote)
+            except Exception as e:
+                pendentes[nome] = lote[-LIMITE_PENDENTES:]
+                print(f"[{cidade['nome']}] ❌ Falha ao entregar alertas ({nome}): {e}; {len(pendentes[nome])} ficam pendentes para a próxima coleta.", file=sys.stderr)
+        novo_estado = {'estacoes': estacoes, 'pendentes': pendentes}
+        if novo_estado != estado:
+            salvar_estado(novo_estado, cidade['estado_alertas'])
+
+    if not eventos:
+        return []
+    latencia = time.time() - recebido_em
+    metricas.contar('alertas', len(eventos), cidade=cidade['slug'])
+    if latencia > DURACAO_TICK_S:
+        print(f"[{cidade['nome']}] Aviso: alertas emitidos {latencia:.0f} s depois da leitura (mais que uma coleta).", file=sys.stderr)
+    return eventos
+
+def main():
+    import mare_harmonica
+    parser = argparse.ArgumentParser(description="Nowcast do risco e alertas de mudança de classe.")
+    parser.add_argument('--cidade', help="Cidade do registro (padrão: a primeira).")
+    args = parser.parse_args()
+    try:
+        cidade = registro_estacoes.selecionar_cidades([args.cidade] if args.cidade else None)[0]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erro no registro de estações: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    recebido_em = time.time()
+    retrato = vp_continuo.carregar_risco_agora(cidade['risco_agora'])
+    if not retrato or not retrato['estacoes']:
+        print(f"Sem risco agora em '{cidade['risco_agora']}'.")
+        return
+    eventos = executar_nowcast(pd.DataFrame(retrato['estacoes']), mare_harmonica.carregar_mare_cidade(cidade), cidade, recebido_em=recebido_em)
+    for evento in eventos:
+        print(f"{evento['nomeEstacao']}: {evento['tipo']} {evento['de']} -> {evento['para']} ({evento['previsto_para']})")
+    print(f"✅ {len(eventos)} alerta(s) em {time.time() - recebido_em:.3f} s.")
+
+if __name__ == "__main__":
+    main()
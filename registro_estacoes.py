@@ -0,0 +1,95 @@
+"""
+Registro das estações monitoradas, agrupadas por cidade (estacoes.json).
+
+Cada cidade é processada como um fragmento independente: tem a sua tabela de maré de
+referência e uma pasta própria que repete a estrutura da raiz do repositório
+(chuva_<cidade>_AAAA-MM-DD.csv, dados/chuva, dados/risco, resultado_risco_final.csv,
+manifesto_risco.json, dados/estado_vp.json, dados/risco_agora.json, dados/estado_alertas.json
+e dados/alertas.jsonl). Recife usa a
+própria raiz ("pasta": "."), então os caminhos de sempre não mudam.
+
+Formato de cada cidade em estacoes.json:
+    "olinda": {
+     "nome": "Olinda", "uf": "PE",
+     "pasta": "cidades/olinda",                       (opcional; este é o padrão)
+     "mare": {"csv": "tide/....csv", "indice": "....npz", "url": "https://...",
+              "harmonicas": "tide/constantes_....json", "fonte": "tabela"},
+                                                      (indice, url e harmonicas opcionais;
+                                                       com "fonte": "harmonica" a tabela
+                                                       também é opcional)
+     "url_chuva": "https://.../chuva_olinda_",        (opcional; reserva do painel)
+     "url_historico": "https://.../resultado_risco_final.csv",   (opcional)
+     "estacoes": [{"codestacao": "260960601A", "nome": "..."}]
+    }
+"""
+import os
+import json
+
+ARQUIVO_REGISTRO = os.getenv('REGISTRO_ESTACOES', 'estacoes.json')
+PASTA_CIDADES = 'cidades'
+
+def _caminho(pasta, *partes):
+    return os.path.normpath(os.path.join(pasta, *partes))
+
+def montar_cidade(slug, bruto):
+    """Completa a configuração de uma cidade com os caminhos de todas as suas saídas."""
+    pasta = bruto.get('pasta', os.path.join(PASTA_CIDADES, slug))
+    mare = bruto.get('mare') or {}
+    fonte = mare.get('fonte', 'tabela')
+    if fonte not in ('tabela', 'harmonica'):
+        raise ValueError(f"Cidade '{slug}': fonte de maré desconhecida '{fonte}'.")
+    if fonte == 'harmonica' and not mare.get('harmonicas'):
+        raise ValueError(f"Cidade '{slug}' com fonte de maré harmônica sem constantes no registro.")
+    if fonte == 'tabela' and not mare.get('csv'):
+        raise ValueError(f"Cidade '{slug}' sem tabela de maré de referência no registro.")
+    estacoes = bruto.get('estacoes') or []
+    if not estacoes:
+        raise ValueError(f"Cidade '{slug}' sem estações no registro.")
+    return {
+        'slug': slug,
+        'nome': bruto.get('nome', slug),
+        'uf': bruto.get('uf'),
+        'estacoes': estacoes,
+        'codigos': [str(e['codestacao']) for e in estacoes],
+        'nomes': [e['nome'] for e in estacoes],
+        'pasta': _caminho(pasta),
+        'mare_csv': mare.get('csv'),
+        'mare_indice': mare.get('indice') or (f"{os.path.splitext(mare['csv'])[0]}_indice.npz" if mare.get('csv') else None),
+        'mare_url': mare.get('url'),
+        'mare_harmonicas': mare.get('harmonicas'),
+        'mare_fonte': fonte,
+        'url_chuva': bruto.get('url_chuva'),
+        'url_historico': bruto.get('url_historico'),
+        'prefixo_csv_diario': _caminho(pasta, f"chuva_{slug}_"),
+        'raiz_chuva': _caminho(pasta, 'dados', 'chuva'),
+        'raiz_historico': _caminho(pasta, 'dados', 'risco'),
+        'historico': _caminho(pasta, 'resultado_risco_final.csv'),
+        'manifesto': _caminho(pasta, 'manifesto_risco.json'),
+        'estado_vp': _caminho(pasta, 'dados', 'estado_vp.json'),
+        'risco_agora': _caminho(pasta, 'dados', 'risco_agora.json'),
+        'estado_alertas': _caminho(pasta, 'dados', 'estado_alertas.json'),
+        'alertas': _caminho(pasta, 'dados', 'alertas.jsonl'),
+    }
+
+def carregar_registro(caminho=ARQUIVO_REGISTRO):
+    """Cidades do registro (slug -> configuração), na ordem do arquivo."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        bruto = json.load(f)
+    cidades = {slug: montar_cidade(slug, c) for slug, c in bruto.get('cidades', {}).items()}
+    if not cidades:
+        raise ValueError(f"Nenhuma cidade em '{caminho}'.")
+    return cidades
+
+def selecionar_cidades(slugs=None, caminho=ARQUIVO_REGISTRO):
+    """Lista das cidades pedidas (todas se `slugs` for vazio); levanta KeyError para slug desconhecido."""
+    cidades = carregar_registro(caminho)
+    if not slugs:
+        return list(cidades.values())
+    desconhecidas = [s for s in slugs if s not in cidades]
+    if desconhecidas:
+        raise KeyError(f"Cidade(s) fora do registro: {', '.join(desconhecidas)}")
+    return [cidades[s] for s in slugs]
+
+def cidade_padrao(caminho=ARQUIVO_REGISTRO):
+    """A primeira cidade do registro (Recife)."""
+    return next(iter(carregar_registro(caminho).values()))
@@ -1,23 +1,36 @@
+import os
 import pandas as pd
-import requests
 import numpy as np
 from datetime import datetime, date
+from functools import partial
+from io import BytesIO
 import pytz 
 import streamlit as st 
 import plotly.graph_objects as go 
-from io import StringIO
+import armazem_chuva
+import calculo_vp
+import indice_mare
+import mare_harmonica
+import metricas
+import cache_painel
+from classificacao_risco import classificar_risco
+import vp_continuo
+import registro_estacoes
 
-# 1. AMBIENTE DOS ARQUIVOS
-URL_BASE_CHUVAS = 'https://raw.githubusercontent.com/RafaellaB/risco-hoje/main/chuva_recife_' 
+# 1. AMBIENTE DOS ARQUIVOS (estações, pastas e URLs de cada cidade vêm do registro estacoes.json)
 SUFIXO_ARQUIVO_CHUVAS = '.csv'
-URL_ARQUIVO_MARE_AM = 'https://raw.githubusercontent.com/RafaellaB/risco-hoje/main/tide/mare_calculada_hora_em_hora_ano-completo.csv'
 CSV_DELIMITADOR = ',' 
 COLUNAS_NO_CSV_CHUVAS = ['datahora', 'nome', 'valor'] 
+# Validade das cópias remotas no cache compartilhado (cache_painel)
+VALIDADE_CHUVA_HOJE_S = 60
+VALIDADE_CHUVA_PASSADA_S = 3600
+VALIDADE_MARE_S = 24 * 3600
 
 # DICIONÁRIO DE TRADUÇÕES
 traducoes = {
     "Português": {
-        "titulo_pagina": "Risco de Alagamentos - Recife",
+        "titulo_pagina": "Risco de Alagamentos",
+        "cidade": "Cidade",
         "btn_atualizar": "Atualizar Dados",
         "btn_historico": "Ver Histórico",
         "msg_aguardando": "Aguardando dados de hoje",
@@ -28,10 +41,17 @@ traducoes = {
         "tempo": "Hora",
         "risco": "Risco",
         "sigla_chuva": "VP",
-        "sigla_mare": "AM"
+        "sigla_mare": "AM",
+        "header_agora": "Risco agora",
+        "sem_leitura": "Sem leitura recente",
+        "ultima_leitura": "Última leitura",
+        "atualizado_em": "Atualizado em",
+        "aviso_sem_mare": "Sem maré na tabela para {n} horário(s) de {estacoes}; o risco desses horários aparece como Baixo.",
+        "modo_semana": "Últimos 7 dias"
     },
     "English": {
-        "titulo_pagina": "Flood Risk - Recife",
+        "titulo_pagina": "Flood Risk",
+        "cidade": "City",
         "btn_atualizar": "Update Data",
         "btn_historico": "View History",
         "msg_aguardando": "Waiting for today's data",
@@ -42,117 +62,220 @@ traducoes = {
         "tempo": "Time",
         "risco": "Risk",
         "sigla_chuva": "RVI",
-        "sigla_mare": "THI"
+        "sigla_mare": "THI",
+        "header_agora": "Risk now",
+        "sem_leitura": "No recent reading",
+        "ultima_leitura": "Last reading",
+        "atualizado_em": "Updated at",
+        "aviso_sem_mare": "No tide in the table for {n} time(s) at {estacoes}; risk for those times is shown as Low.",
+        "modo_semana": "Last 7 days"
     }
 }
 
 # 2. FUNÇÕES DE CACHE
 @st.cache_data(show_spinner=False)
-def carregar_dados_mare_cache(url_am_data):
+def carregar_indice_mare_cache(csv_mare, caminho_indice, url_am_data, caminho_harmonicas=None, fonte='tabela'):
+    # Índice salvo ao lado do CSV na cópia local (ou só as constantes harmônicas); sem ela, monta a partir do CSV remoto
+    metricas.cache('painel_mare', False)
     try:
-        response = requests.get(url_am_data)
-        if response.status_code != 200: return pd.DataFrame()
-        linhas = [l for l in response.text.splitlines() if not l.startswith(('<<<<', '====', '>>>>')) and l.strip()]
-        if not linhas: return pd.DataFrame()
-        conteudo_limpo = "\n".join(linhas)
-        separador = ';' if ';' in linhas[0] else ','
-        df = pd.read_csv(StringIO(conteudo_limpo), sep=separador, decimal=',', encoding='utf-8')
-        mapeamento = {'Hora_Exata': 'datahora', 'datahora': 'datahora', 'Altura_m': 'AM', 'altura': 'AM', 'AM': 'AM'}
-        df = df.rename(columns=mapeamento)
-        df['datahora'] = pd.to_datetime(df['datahora'].astype(str).str.split(';').str[0], errors='coerce')
-        df = df.dropna(subset=['datahora'])
-        df['data'] = df['datahora'].dt.strftime('%Y-%m-%d')
-        df['hora_ref'] = df['datahora'].dt.strftime('%H:00:00')
-        df['AM'] = pd.to_numeric(df['AM'].astype(str).str.replace(',', '.'), errors='coerce')
-        return df[['data', 'hora_ref', 'AM']]
-    except: return pd.DataFrame()
+        locais = [c for c in (csv_mare, caminho_indice) if c]
+        if fonte == 'harmonica' or any(os.path.exists(c) for c in locais):
+            return mare_harmonica.carregar_mare_cidade({'mare_csv': csv_mare, 'mare_indice': caminho_indice,
+                                                        'mare_harmonicas': caminho_harmonicas, 'mare_fonte': fonte})
+        if not url_am_data: return None
+        # A tábua remota já chega analisada do cache compartilhado, sem a limpeza do texto
+        return cache_painel.obter(url_am_data, indice_mare.construir_indice, VALIDADE_MARE_S, nome='painel_mare_remota')
+    except: return None
+
+@st.cache_resource(show_spinner=False)
+def renovador_cache():
+    # Um por processo: mantém em dia as URLs que as sessões estão usando
+    renovador = cache_painel.Renovador()
+    renovador.start()
+    return renovador
+
+def analisar_csv_chuva(conteudo, separador=CSV_DELIMITADOR):
+    df_chuva_raw = pd.read_csv(BytesIO(conteudo), encoding='utf-8', sep=separador)
+    df_chuva_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'}, inplace=True)
+    df_chuva_raw['datahora'] = pd.to_datetime(df_chuva_raw['datahora'])
+    return df_chuva_raw
+
+def url_chuva(url_base, data_str):
+    return f"{url_base}{data_str}{SUFIXO_ARQUIVO_CHUVAS}"
+
+def _hoje_str():
+    return datetime.now(pytz.timezone('America/Recife')).strftime('%Y-%m-%d')
 
-@st.cache_data(ttl=300, show_spinner=False) 
-def carregar_dados_chuva_cache(url_base, data_de_hoje_str, separador, colunas_csv):
-    url_completa = f"{url_base}{data_de_hoje_str}{SUFIXO_ARQUIVO_CHUVAS}"
+def carregar_chuva_armazem(inicio, fim, raiz_armazem):
+    if not armazem_chuva.existe_armazem(raiz_armazem): return pd.DataFrame()
+    df_chuva_raw = armazem_chuva.carregar_chuva(inicio, fim, raiz=raiz_armazem)
+    df_chuva_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'}, inplace=True)
+    return df_chuva_raw
+
+def carregar_dados_chuva_cache(url_base, data_de_hoje_str, separador, colunas_csv, raiz_armazem=armazem_chuva.RAIZ_ARMAZEM):
+    # O armazém da cópia local só é posto em dia uma vez por dia (workflow diário): o dia de hoje
+    # vem sempre do CSV remoto, versionado a cada coleta, pelo cache compartilhado entre sessões.
+    # Dias passados vêm do armazém, com o CSV remoto como reserva.
+    hoje = data_de_hoje_str == _hoje_str()
     try:
-        df_chuva_raw = pd.read_csv(url_completa, encoding='utf-8', sep=separador)
-        df_chuva_raw.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'}, inplace=True)
-        df_chuva_raw['datahora'] = pd.to_datetime(df_chuva_raw['datahora'])
-        return df_chuva_raw
+        if not hoje:
+            df_chuva_raw = carregar_chuva_armazem(data_de_hoje_str, data_de_hoje_str, raiz_armazem)
+            if not df_chuva_raw.empty: return df_chuva_raw
+        if url_base:
+            url_completa = url_chuva(url_base, data_de_hoje_str)
+            validade = VALIDADE_CHUVA_HOJE_S if hoje else VALIDADE_CHUVA_PASSADA_S
+            analisar = partial(analisar_csv_chuva, separador=separador)
+            if hoje:
+                renovador_cache().registrar(url_completa, analisar, validade, nome='painel_chuva')
+            df_chuva_raw = cache_painel.obter(url_completa, analisar, validade, nome='painel_chuva')
+            if df_chuva_raw is not None and not df_chuva_raw.empty: return df_chuva_raw
+        # Sem CSV remoto (cidade sem URL, servidor fora do ar), o que o armazém tiver de hoje
+        return carregar_chuva_armazem(data_de_hoje_str, data_de_hoje_str, raiz_armazem) if hoje else pd.DataFrame()
     except: return pd.DataFrame()
 
+def carregar_chuva_periodo_cache(url_base, datas, separador, colunas_csv, raiz_armazem=armazem_chuva.RAIZ_ARMAZEM):
+    # Os dias passados saem do armazém de uma vez; hoje e os dias que faltam nele, dia a dia pelo cache
+    hoje = _hoje_str()
+    passadas = [d for d in datas if d != hoje]
+    partes, cobertas = [], set()
+    if passadas:
+        df_armazem = carregar_chuva_armazem(min(passadas), max(passadas), raiz_armazem)
+        if not df_armazem.empty:
+            partes.append(df_armazem)
+            cobertas = set(df_armazem['datahora'].dt.strftime('%Y-%m-%d'))
+    partes += [carregar_dados_chuva_cache(url_base, data, separador, colunas_csv, raiz_armazem) for data in datas if data not in cobertas]
+    partes = [df for df in partes if not df.empty]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+def consultar_cache(nome, funcao, *args):
+    """Chama uma função com st.cache_data medindo o tempo; a falha de cache é contada dentro dela."""
+    falhas = metricas.valor('cache', cache=nome, resultado='falha')
+    with metricas.etapa(nome):
+        resultado = funcao(*args)
+    if metricas.valor('cache', cache=nome, resultado='falha') == falhas:
+        metricas.cache(nome, True)
+    return resultado
+
 # 3. FUNÇÕES DE PROCESSAMENTO
 def processar_dados_chuva_simplificado(df_chuva, datas_desejadas, estacoes_desejadas):
-    df = df_chuva[df_chuva['nomeEstacao'].isin(estacoes_desejadas)].copy()
-    df['data'] = df['datahora'].dt.date.astype(str)
-    df = df[df['data'].isin(datas_desejadas)]
-    if df.empty: return pd.DataFrame()
-    df = df.set_index('datahora').sort_index()
-    resultados_por_estacao = []
-    for estacao, grupo in df.groupby('nomeEstacao'):
-        chuva_10min = grupo['valorMedida'].rolling('10min').sum()
-        chuva_2h = grupo['valorMedida'].rolling('2h').sum()
-        temp_df = pd.DataFrame({'chuva_10min': chuva_10min, 'chuva_2h': chuva_2h})
-        agregado_horario = temp_df.resample('h').last()
-        agregado_horario['VP'] = (agregado_horario['chuva_10min'] * 6) + agregado_horario['chuva_2h']
-        agregado_horario['nomeEstacao'] = estacao
-        resultados_por_estacao.append(agregado_horario)
-    df_vp = pd.concat(resultados_por_estacao).reset_index()
-    df_vp['data'] = df_vp['datahora'].dt.strftime('%Y-%m-%d')
-    df_vp['hora_ref'] = df_vp['datahora'].dt.strftime('%H:00:00')
-    return df_vp
+    return calculo_vp.calcular_vp(df_chuva, datas_desejadas, estacoes_desejadas)
+
+def exibir_risco_agora(retrato, idioma):
+    """
+    Mostra o retrato do risco atual (gerado a cada coleta pelo VP contínuo). O atraso de
+    cada leitura é conferido de novo aqui: se a coleta parou, o retrato também envelhece.
+    """
+    t = traducoes[idioma]
+    if not retrato or not retrato.get('estacoes'): return
+    st.subheader(t['header_agora'])
+    colunas = st.columns(len(retrato['estacoes']))
+    atrasos = vp_continuo.atraso_leitura([e['datahora'] for e in retrato['estacoes']])
+    for coluna, estacao, atraso in zip(colunas, retrato['estacoes'], atrasos):
+        vp, am = estacao.get('VP'), estacao.get('AM')
+        if estacao.get('desatualizada') or not atraso <= vp_continuo.ATRASO_MAXIMO_S:
+            coluna.metric(estacao['nomeEstacao'], t['sem_leitura'], help=f"{t['ultima_leitura']}: {estacao['datahora']}")
+            continue
+        coluna.metric(
+            estacao['nomeEstacao'], estacao.get('Classificacao_Risco') or '-',
+            help=f"{t['tempo']}: {estacao['datahora']} | {t['sigla_chuva']}: {vp if vp is None else round(vp, 2)} | {t['sigla_mare']}: {am}"
+        )
+    st.caption(f"{t['atualizado_em']}: {retrato.get('gerado_em', '-')}")
+    st.divider()
+
+MAPA_DE_CORES = {'Alto': '#D32F2F', 'Moderado Alto': '#FFA500', 'Moderado': '#FFC107', 'Baixo': '#4CAF50'}
+DIAS_MODO_SEMANA = 7
+
+@st.cache_data(show_spinner=False)
+def superficie_risco(lim_x, lim_y=5):
+    # Fundo do diagrama (VP × AM) como produto externo; lim_x inteiro dá a mesma grade que o limite original
+    x_grid, y_grid = np.arange(0, lim_x, 1), np.linspace(0, lim_y, 100)
+    return x_grid, y_grid, np.outer(y_grid, x_grid)
+
+def _formatar_data(data, idioma):
+    data_dt = pd.to_datetime(data, errors='coerce')
+    if pd.isna(data_dt):
+        return str(data)
+    return data_dt.strftime('%d/%m/%Y') if idioma == 'Português' else data_dt.strftime('%Y-%m-%d')
+
+def _figura_diagrama(grupo, t, idioma, com_data=False):
+    """Um diagrama com o fundo, a trajetória tracejada (uma por dia) e todos os pontos num único traço."""
+    fig = go.Figure()
+    lim_x = max(110, grupo['VP'].max() * 1.2 if not grupo.empty else 110)
+    x_grid, y_grid, z_grid = superficie_risco(int(np.ceil(lim_x)))
+    fig.add_trace(go.Heatmap(x=x_grid, y=y_grid, z=z_grid, colorscale=[[0, "#90EE90"], [0.3, "#FFD700"], [0.5, "#FFA500"], [1.0, "#D32F2F"]], showscale=False, zmin=0, zmax=100, hoverinfo='none'))
+
+    grupo = grupo.sort_values(by=['data', 'hora_ref'])
+    vp, am = grupo['VP'].to_numpy(dtype=float), grupo['AM'].to_numpy(dtype=float)
+    # Sem ligar o último ponto de um dia ao primeiro do seguinte
+    quebras = np.flatnonzero(grupo['data'].to_numpy()[1:] != grupo['data'].to_numpy()[:-1]) + 1
+    fig.add_trace(go.Scatter(x=np.insert(vp, quebras, np.nan), y=np.insert(am, quebras, np.nan), mode='lines', line=dict(color='black', width=1, dash='dash'), hoverinfo='none', showlegend=False))
+
+    risco = grupo['Classificacao_Risco'].astype(object)
+    tempo = grupo['hora_ref'].astype(str)
+    if com_data:
+        tempo = grupo['data'].map(lambda d: _formatar_data(d, idioma)) + ' ' + tempo
+    hovertext = (
+        f"<b>{t['tempo']}:</b> " + tempo + f"<br><b>{t['risco']}:</b> " + risco.astype(str)
+        + f"<br><b>{t['sigla_chuva']}:</b> " + grupo['VP'].map('{:.2f}'.format)
+        + f"<br><b>{t['sigla_mare']}:</b> " + grupo['AM'].map('{:.2f}'.format)
+    )
+    fig.add_trace(go.Scatter(
+        x=vp, y=am,
+        mode='markers',
+        marker=dict(color=risco.map(MAPA_DE_CORES).fillna('black').tolist(), size=10, line=dict(width=1, color='black')),
+        hoverinfo='text',
+        hovertext=hovertext.tolist(),
+        showlegend=False
+    ))
+
+    fig.update_layout(xaxis_title=t['eixo_x'], yaxis_title=t['eixo_y'], margin=dict(l=40, r=40, t=40, b=40))
+    return fig
 
 def gerar_diagramas(df_analisado, idioma):
     t = traducoes[idioma]
-    mapa_de_cores = {'Alto': '#D32F2F', 'Moderado Alto': '#FFA500', 'Moderado': '#FFC107', 'Baixo': '#4CAF50'}
-    
     for (data, estacao), grupo in df_analisado.groupby(['data', 'nomeEstacao']):
-        data_dt = pd.to_datetime(data, errors='coerce')
-        if pd.isna(data_dt):
-            data_formatada = str(data)
-        else:
-            data_formatada = data_dt.strftime('%d/%m/%Y') if idioma == 'Português' else data_dt.strftime('%Y-%m-%d')
+        st.subheader(f"{t['header_grafico']}: {estacao} - {_formatar_data(data, idioma)}")
+        st.plotly_chart(_figura_diagrama(grupo, t, idioma), use_container_width=True, key=f"chart_{data}_{estacao}")
 
-        st.subheader(f"{t['header_grafico']}: {estacao} - {data_formatada}")
-        fig = go.Figure()
-        
-        lim_x = max(110, grupo['VP'].max() * 1.2 if not grupo.empty else 110)
-        lim_y = 5 
-        x_grid, y_grid = np.arange(0, lim_x, 1), np.linspace(0, lim_y, 100)
-        z_grid = np.array([x * y for y in y_grid for x in x_grid]).reshape(len(y_grid), len(x_grid))
-        
-        fig.add_trace(go.Heatmap(x=x_grid, y=y_grid, z=z_grid, colorscale=[[0, "#90EE90"], [0.3, "#FFD700"], [0.5, "#FFA500"], [1.0, "#D32F2F"]], showscale=False, zmin=0, zmax=100, hoverinfo='none'))
-        
-        grupo = grupo.sort_values(by='hora_ref')
-        fig.add_trace(go.Scatter(x=grupo['VP'], y=grupo['AM'], mode='lines', line=dict(color='black', width=1, dash='dash'), hoverinfo='none', showlegend=False))
-        
-        for _, ponto in grupo.iterrows():
-            cor_ponto = mapa_de_cores.get(ponto['Classificacao_Risco'], 'black')
-            fig.add_trace(go.Scatter(
-                x=[ponto['VP']], y=[ponto['AM']], 
-                mode='markers', 
-                marker=dict(color=cor_ponto, size=10, line=dict(width=1, color='black')),
-                hoverinfo='text',
-                hovertext=f"<b>{t['tempo']}:</b> {ponto['hora_ref']}<br><b>{t['risco']}:</b> {ponto['Classificacao_Risco']}<br><b>{t['sigla_chuva']}:</b> {ponto['VP']:.2f}<br><b>{t['sigla_mare']}:</b> {ponto['AM']:.2f}",
-                showlegend=False
-            ))
-        
-        fig.update_layout(xaxis_title=t['eixo_x'], yaxis_title=t['eixo_y'], margin=dict(l=40, r=40, t=40, b=40))
-        st.plotly_chart(fig, use_container_width=True, key=f"chart_{data}_{estacao}")
+def gerar_diagramas_periodo(df_analisado, idioma):
+    """Modo semana: um diagrama por estação com todos os dias do período, em vez de um por dia."""
+    t = traducoes[idioma]
+    if df_analisado.empty: return
+    inicio, fim = _formatar_data(df_analisado['data'].min(), idioma), _formatar_data(df_analisado['data'].max(), idioma)
+    for estacao, grupo in df_analisado.groupby('nomeEstacao'):
+        st.subheader(f"{t['header_grafico']}: {estacao} - {inicio} a {fim}" if idioma == 'Português' else f"{t['header_grafico']}: {estacao} - {inicio} to {fim}")
+        st.plotly_chart(_figura_diagrama(grupo, t, idioma, com_data=True), use_container_width=True, key=f"chart_periodo_{estacao}")
 
 # BLOCO PRINCIPAL
 if __name__ == "__main__":
     st.set_page_config(page_title="Risco Recife Hoje", layout="wide")
+    # O processo do painel atende várias execuções do script: as métricas acumulam
+    metricas.iniciar('painel', acumular=True)
     fuso = pytz.timezone('America/Recife') 
     data_hoje_str = datetime.now(fuso).strftime('%Y-%m-%d')
 
     # --- SIDEBAR (ORDEM VISUAL PADRONIZADA) ---
     idioma_sel = st.sidebar.radio("Idioma / Language", ["Português", "English"], horizontal=True, label_visibility="collapsed")
     t = traducoes[idioma_sel]
+
+    cidades = registro_estacoes.carregar_registro()
+    slug_cidade = next(iter(cidades))
+    if len(cidades) > 1:
+        slug_cidade = st.sidebar.selectbox(t['cidade'], list(cidades), format_func=lambda s: cidades[s]['nome'])
+    cidade = cidades[slug_cidade]
     
     st.sidebar.markdown("---")
     
     # 1. Botão Atualizar (Ajustado para o padrão Primary e sem ícones)
     if st.sidebar.button(t['btn_atualizar'], use_container_width=True, type="primary"):
-        carregar_dados_chuva_cache.clear()
+        # Renova só o CSV de hoje desta cidade, uma vez para todos os cliques simultâneos
+        if cidade['url_chuva']:
+            cache_painel.renovar(url_chuva(cidade['url_chuva'], data_hoje_str), partial(analisar_csv_chuva, separador=CSV_DELIMITADOR),
+                                 cache_painel.INTERVALO_MINIMO_S, nome='painel_chuva')
         st.rerun()
 
+    modo_semana = st.sidebar.toggle(t['modo_semana'])
+
     # Espaçamento dinâmico para o rodapé
     st.sidebar.markdown("<br>"*12, unsafe_allow_html=True)
     st.sidebar.markdown("---")
@@ -161,23 +284,48 @@ if __name__ == "__main__":
     st.sidebar.link_button(t['btn_historico'], "https://painel-diagrama-de-risco-f5n2bwurkppdppawqhqkmz.streamlit.app/", use_container_width=True, type="primary")
 
     # --- CONTEÚDO PRINCIPAL ---
-    st.title(t['titulo_pagina'])
+    st.title(f"{t['titulo_pagina']} - {cidade['nome']}")
     st.divider()
 
     try:
-        df_am = carregar_dados_mare_cache(URL_ARQUIVO_MARE_AM)
-        df_chuva_raw = carregar_dados_chuva_cache(URL_BASE_CHUVAS, data_hoje_str, CSV_DELIMITADOR, COLUNAS_NO_CSV_CHUVAS)
+        exibir_risco_agora(vp_continuo.carregar_risco_agora(cidade['risco_agora']), idioma_sel)
+    except:
+        pass
+
+    try:
+        indice_am = consultar_cache('painel_mare', carregar_indice_mare_cache, cidade['mare_csv'], cidade['mare_indice'], cidade['mare_url'],
+                                    cidade['mare_harmonicas'], cidade['mare_fonte'])
+        if modo_semana:
+            datas = [d.strftime('%Y-%m-%d') for d in pd.date_range(end=data_hoje_str, periods=DIAS_MODO_SEMANA)]
+            with metricas.etapa('painel_chuva'):
+                df_chuva_raw = carregar_chuva_periodo_cache(cidade['url_chuva'], datas, CSV_DELIMITADOR, COLUNAS_NO_CSV_CHUVAS, cidade['raiz_chuva'])
+        else:
+            datas = [data_hoje_str]
+            with metricas.etapa('painel_chuva'):
+                df_chuva_raw = carregar_dados_chuva_cache(cidade['url_chuva'], data_hoje_str, CSV_DELIMITADOR, COLUNAS_NO_CSV_CHUVAS, cidade['raiz_chuva'])
+        metricas.contar('linhas_lidas', len(df_chuva_raw), origem='painel', cidade=cidade['slug'])
         
-        if df_chuva_raw.empty or df_am.empty:
+        if df_chuva_raw.empty or indice_am is None:
             st.info(f"{t['msg_aguardando']} ({datetime.now(fuso).strftime('%d/%m/%Y')}).")
         else:
-            df_vp = processar_dados_chuva_simplificado(df_chuva_raw, [data_hoje_str], ["Campina do Barreto", "Torreão", "RECIFE - APAC", "Imbiribeira", "Dois Irmãos"])
-            df_final = pd.merge(df_vp, df_am, on=['data', 'hora_ref'], how='left')
-            
-            df_final['Nivel_Risco_Valor'] = (df_final['VP'] * df_final['AM']).fillna(0)
-            bins = [-np.inf, 30, 50, 100, np.inf]
-            df_final['Classificacao_Risco'] = pd.cut(df_final['Nivel_Risco_Valor'], bins=bins, labels=['Baixo', 'Moderado', 'Moderado Alto', 'Alto'])
+            with metricas.etapa('painel_vp'):
+                df_chuva_raw = df_chuva_raw[df_chuva_raw['codestacao'].astype(str).isin(cidade['codigos'])]
+                df_vp = processar_dados_chuva_simplificado(df_chuva_raw, datas, None)
+                df_final = df_vp.copy()
+                # Horário fora da tábua de maré fica sem AM (risco Baixo, como no merge de antes) e com aviso, sem derrubar o painel
+                df_final['AM'] = indice_am.consultar(df_final['datahora'], fora_do_intervalo='nan')
+                sem_mare = df_final['AM'].isna() & df_final['VP'].notna()
+                if sem_mare.any():
+                    st.warning(t['aviso_sem_mare'].format(n=int(sem_mare.sum()), estacoes=', '.join(sorted(df_final.loc[sem_mare, 'nomeEstacao'].unique()))))
+                
+                df_final['Nivel_Risco_Valor'] = (df_final['VP'] * df_final['AM']).fillna(0)
+                df_final['Classificacao_Risco'] = classificar_risco(df_final['Nivel_Risco_Valor'])
             
-            gerar_diagramas(df_final, idioma_sel)
+            with metricas.etapa('painel_diagramas'):
+                if modo_semana:
+                    gerar_diagramas_periodo(df_final, idioma_sel)
+                else:
+                    gerar_diagramas(df_final, idioma_sel)
     except:
-        st.error(t['msg_erro'])
\ No newline at end of file
+        st.error(t['msg_erro'])
+    metricas.exportar()
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""Sincronização do armazém de chuva com os CSVs diários (armazem_chuva.migrar_csvs)."""
+import json
+import pandas as pd
+import armazem_chuva
+
+def csv_do_dia(pasta, data, valor):
+    pd.DataFrame({
+        'cidade': 'RECIFE', 'codestacao': '261160609A', 'datahora': [f"{data} 10:00:00", f"{data} 10:10:00"],
+        'id_sensor': 10, 'latitude': -8.1, 'longitude': -34.9, 'nome': 'Imbiribeira',
+        'offset': None, 'qualificacao': 0, 'uf': 'PE', 'valor': valor,
+    }).to_csv(pasta / f"chuva_recife_{data}.csv", index=False)
+
+def test_sincroniza_desde_o_ultimo_dia_do_manifesto(tmp_path):
+    datas = [str(d.date()) for d in pd.date_range('2026-08-01', '2026-08-10')]
+    for data in datas:
+        csv_do_dia(tmp_path, data, 0.2)
+    manifesto = tmp_path / 'manifesto_risco.json'
+    manifesto.write_text(json.dumps({'dias': {'2026-08-02': {}, '2026-08-03': {}}}), encoding='utf-8')
+    raiz = str(tmp_path / 'chuva')
+
+    # Uma semana sem o job diário: todos os dias desde o último calculado entram, não só os 3 últimos
+    desde = armazem_chuva.ultimo_dia_manifesto(str(manifesto))
+    assert desde == '2026-08-03'
+    armazem_chuva.migrar_csvs(str(tmp_path / 'chuva_recife_*.csv'), raiz, desde=desde)
+    dias = set(armazem_chuva.carregar_chuva('2026-08-01', '2026-08-10', raiz=raiz)['datahora'].dt.strftime('%Y-%m-%d'))
+    assert dias == set(datas[2:])
+
+def test_sem_manifesto_sincroniza_tudo(tmp_path):
+    assert armazem_chuva.ultimo_dia_manifesto(str(tmp_path / 'manifesto_risco.json')) is None
+    for data in ('2026-08-01', '2026-08-09'):
+        csv_do_dia(tmp_path, data, 0.4)
+    raiz = str(tmp_path / 'chuva')
+    armazem_chuva.migrar_csvs(str(tmp_path / 'chuva_recife_*.csv'), raiz, desde=None)
+    assert len(armazem_chuva.carregar_chuva('2026-08-01', '2026-08-10', raiz=raiz)) == 4
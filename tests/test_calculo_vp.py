@@ -0,0 +1,108 @@
+"""
+Testes dourados do motor vetorizado de VP (calculo_vp.calcular_vp) contra o cálculo
+original, estação por estação, com rolling('10min')/rolling('2h')/resample('h').last().
+A comparação é exata: os VPs publicados não podem mudar nem no último dígito.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import calculo_vp
+from conftest import RAIZ
+
+DIAS_CSV = ['2025-10-12', '2025-11-03', '2026-01-09', '2026-01-26', '2026-04-07', '2026-05-01', '2026-05-05', '2026-08-20']
+COLUNAS = ['data', 'hora_ref', 'nomeEstacao', 'chuva_10min', 'chuva_2h', 'VP']
+
+def vp_referencia(df_chuva, data_alvo):
+    """O cálculo de antes do motor único (o antigo calcular_risco_cli.processar_chuva_arquivo)."""
+    df = df_chuva.copy()
+    df['datahora'] = pd.to_datetime(df['datahora'])
+    df = df[df['datahora'].dt.strftime('%Y-%m-%d') == data_alvo]
+    if df.empty:
+        return pd.DataFrame(columns=COLUNAS)
+    df = df.set_index('datahora').sort_index()
+    resultados = []
+    for estacao, grupo in df.groupby('nomeEstacao'):
+        chuva_10min = grupo['valorMedida'].rolling('10min').sum()
+        chuva_2h = grupo['valorMedida'].rolling('2h').sum()
+        agregado = pd.DataFrame({'chuva_10min': chuva_10min, 'chuva_2h': chuva_2h}).resample('h').last()
+        agregado['VP'] = (agregado['chuva_10min'] * 6) + agregado['chuva_2h']
+        agregado['nomeEstacao'] = estacao
+        resultados.append(agregado)
+    df_vp = pd.concat(resultados).reset_index()
+    df_vp['data'] = df_vp['datahora'].dt.strftime('%Y-%m-%d')
+    df_vp['hora_ref'] = df_vp['datahora'].dt.strftime('%H:00:00')
+    return df_vp[COLUNAS]
+
+def comparar(df_chuva, datas):
+    esperado = pd.concat([vp_referencia(df_chuva, d) for d in datas], ignore_index=True)
+    obtido = calculo_vp.calcular_vp(df_chuva, datas)
+    obtido = obtido[COLUNAS] if not obtido.empty else pd.DataFrame(columns=COLUNAS)
+    # O motor ordena por estação e hora em todos os dias juntos; a referência, dia a dia
+    chave = ['nomeEstacao', 'data', 'hora_ref']
+    esperado = esperado.sort_values(chave, kind='stable', ignore_index=True)
+    obtido = obtido.sort_values(chave, kind='stable', ignore_index=True)
+    pd.testing.assert_frame_equal(obtido, esperado, check_exact=True, check_dtype=False)
+
+def ler_csv(data):
+    df = pd.read_csv(os.path.join(RAIZ, f"chuva_recife_{data}.csv"))
+    return df.rename(columns={'nome': 'nomeEstacao', 'valor': 'valorMedida'})
+
+@pytest.mark.parametrize('data', DIAS_CSV)
+def test_dia_do_historico(data):
+    comparar(ler_csv(data), [data])
+
+def test_varios_dias_numa_passada():
+    df = pd.concat([ler_csv(d) for d in DIAS_CSV], ignore_index=True)
+    # Leituras repetidas entre arquivos vizinhos ficam como estão, como no cálculo diário
+    comparar(df, DIAS_CSV)
+
+def leituras(estacao, inicio, minutos, valores):
+    base = pd.Timestamp(inicio)
+    return pd.DataFrame({
+        'datahora': [(base + pd.Timedelta(minutes=m)).strftime('%Y-%m-%d %H:%M:%S') for m in minutos],
+        'nomeEstacao': estacao,
+        'valorMedida': valores,
+    })
+
+def test_leituras_nan():
+    df = pd.concat([
+        leituras('A', '2026-03-01 00:00', range(0, 240, 10), [np.nan if i % 4 == 1 else 0.2 * i for i in range(24)]),
+        # Hora inteira só com NaN e estação que nunca tem leitura válida
+        leituras('B', '2026-03-01 05:00', range(0, 180, 10), [np.nan] * 6 + [1.1] * 6 + [np.nan] * 6),
+        leituras('C', '2026-03-01 00:00', range(0, 60, 10), [np.nan] * 6),
+    ], ignore_index=True)
+    comparar(df, ['2026-03-01'])
+
+def test_horarios_irregulares_e_repetidos():
+    minutos = [0, 3, 3, 7, 10, 10, 10, 21, 58, 59, 61, 130, 131, 250, 251, 252, 600]
+    rng = np.random.default_rng(7)
+    df = pd.concat([
+        leituras('A', '2026-03-02 00:00', minutos, rng.random(len(minutos)).round(3)),
+        # Valores iguais seguidos (o pandas devolve valor × n nesse caso)
+        leituras('B', '2026-03-02 00:00', minutos, [0.4] * len(minutos)),
+    ], ignore_index=True)
+    # Fora de ordem, como chegam às vezes do CEMADEN
+    df = df.sample(frac=1, random_state=3).reset_index(drop=True)
+    comparar(df, ['2026-03-02'])
+
+def test_estacao_que_comeca_no_meio_do_dia():
+    rng = np.random.default_rng(11)
+    df = pd.concat([
+        leituras('A', '2026-03-03 00:00', range(0, 1440, 10), rng.random(144).round(2)),
+        leituras('B', '2026-03-03 14:37', range(0, 560, 10), rng.random(56).round(2)),
+        # Lacuna de mais de 2 h no meio do dia: a soma recomeça do zero
+        leituras('C', '2026-03-03 01:00', list(range(0, 60, 5)) + list(range(400, 460, 5)), rng.random(24).round(2)),
+    ], ignore_index=True)
+    comparar(df, ['2026-03-03'])
+
+def test_janela_nao_atravessa_a_meia_noite():
+    # A janela não atravessa a meia-noite: cada dia é calculado sozinho
+    df = leituras('A', '2026-03-04 23:00', range(0, 120, 5), [1.0 + 0.01 * i for i in range(24)])
+    comparar(df, ['2026-03-04', '2026-03-05'])
+
+def test_filtro_de_estacoes():
+    df = pd.concat([leituras(e, '2026-03-06 00:00', range(0, 120, 10), [0.5] * 12) for e in 'ABC'], ignore_index=True)
+    obtido = calculo_vp.calcular_vp(df, ['2026-03-06'], estacoes=['B'])
+    assert set(obtido['nomeEstacao']) == {'B'}
+    assert calculo_vp.calcular_vp(df, ['2026-03-07']).empty
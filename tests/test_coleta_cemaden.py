@@ -0,0 +1,115 @@
+"""Coleta do CEMADEN (atualizar_dados) contra o servidor local de benchmarks/stub_cemaden.py."""
+import os
+import shutil
+import pytest
+import pandas as pd
+import atualizar_dados
+import metricas
+from conftest import RAIZ
+from benchmarks.stub_cemaden import iniciar_stub
+
+ESTACOES = ['261160614A', '261160609A', '261160623A', '261160618A', '261160603A']
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    servidor, url_dados = iniciar_stub(latencia=0.0, jitter=0.0, leituras=3)
+    base = url_dados.rsplit('/', 1)[0]
+    monkeypatch.setattr(atualizar_dados, 'URL_DADOS_CEMADEN', url_dados)
+    monkeypatch.setattr(atualizar_dados, 'URL_TOKEN_CEMADEN', f"{base}/token")
+    monkeypatch.setattr(atualizar_dados, 'ARQUIVO_CACHE_TOKEN', str(tmp_path / 'token.json'))
+    monkeypatch.setattr(atualizar_dados, 'BACKOFF_BASE', 0.001)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+def test_ordem_das_estacoes_independe_da_chegada(stub):
+    # A primeira estação da lista é a última a responder
+    stub.latencias = {cod: 0.05 * (len(ESTACOES) - i) for i, cod in enumerate(ESTACOES)}
+    df = atualizar_dados.buscar_dados_cemaden('token-stub', ESTACOES, paralelismo=len(ESTACOES))
+    assert list(dict.fromkeys(df['codestacao'])) == ESTACOES
+    assert len(df) == 3 * len(ESTACOES)
+
+def test_repete_falhas_transitorias(stub):
+    stub.falhas = {ESTACOES[0]: [503, 502], ESTACOES[1]: [429]}
+    df = atualizar_dados.buscar_dados_cemaden('token-stub', ESTACOES)
+    assert set(df['codestacao']) == set(ESTACOES)
+    assert stub.por_estacao[ESTACOES[0]] == 3
+    assert stub.por_estacao[ESTACOES[1]] == 2
+    assert stub.por_estacao[ESTACOES[2]] == 1
+
+def test_desiste_apos_as_tentativas(stub, capsys):
+    stub.falhas = {ESTACOES[0]: [503] * 10}
+    df = atualizar_dados.buscar_dados_cemaden('token-stub', ESTACOES)
+    assert ESTACOES[0] not in set(df['codestacao'])
+    assert stub.por_estacao[ESTACOES[0]] == atualizar_dados.TENTATIVAS
+    assert ESTACOES[0] in capsys.readouterr().err
+
+def test_erro_definitivo_nao_repete(stub):
+    stub.falhas = {ESTACOES[0]: [404]}
+    df = atualizar_dados.buscar_dados_cemaden('token-stub', ESTACOES)
+    assert ESTACOES[0] not in set(df['codestacao'])
+    assert stub.por_estacao[ESTACOES[0]] == 1
+
+def test_backoff_exponencial_com_jitter(stub, monkeypatch):
+    esperas = []
+    sortear = atualizar_dados.espera_backoff
+    monkeypatch.setattr(atualizar_dados, 'espera_backoff', lambda t: esperas.append(sortear(t)) or 0.0)
+    monkeypatch.setattr(atualizar_dados, 'BACKOFF_BASE', 0.5)
+    stub.falhas = {ESTACOES[0]: [503] * 3}
+    atualizar_dados.buscar_dados_cemaden('token-stub', ESTACOES[:1])
+    assert len(esperas) == 3
+    for tentativa, espera in enumerate(esperas):
+        assert 0 <= espera <= min(atualizar_dados.BACKOFF_MAXIMO, 0.5 * 2 ** tentativa)
+    sorteadas = {sortear(3) for _ in range(20)}
+    assert len(sorteadas) > 1 and max(sorteadas) <= 4.0
+
+def test_token_recusado_renova_uma_vez(stub):
+    stub.token_valido = 'token-novo'
+    renovacoes = []
+    def renovar():
+        renovacoes.append(1)
+        return 'token-novo'
+    df = atualizar_dados.buscar_dados_cemaden('token-velho', ESTACOES, renovar_token=renovar)
+    assert len(renovacoes) == 1
+    assert list(dict.fromkeys(df['codestacao'])) == ESTACOES
+    assert all(stub.por_estacao[cod] == 2 for cod in ESTACOES)
+
+def test_token_recusado_sem_renovacao(stub, capsys):
+    stub.token_valido = 'token-novo'
+    df = atualizar_dados.buscar_dados_cemaden('token-velho', ESTACOES, renovar_token=lambda: None)
+    assert df.empty
+    assert 'Token recusado' in capsys.readouterr().err
+
+def test_token_em_cache_e_renovado(stub):
+    sessao = atualizar_dados.criar_sessao()
+    assert atualizar_dados.obter_token_cacheado('a@b', 'x', sessao) == 'token-stub'
+    assert atualizar_dados.obter_token_cacheado('a@b', 'x', sessao) == 'token-stub'
+    assert stub.tokens_emitidos == 1
+    stub.token_valido = 'token-novo'
+    assert atualizar_dados.obter_token_cacheado('a@b', 'x', sessao, renovar=True) == 'token-novo'
+    assert atualizar_dados.obter_token_cacheado('a@b', 'x', sessao) == 'token-novo'
+    assert stub.tokens_emitidos == 2
+
+def test_coleta_completa(stub, monkeypatch, tmp_path):
+    # main() numa cópia mínima do repositório: registro e tábuas de maré
+    shutil.copy(os.path.join(RAIZ, 'estacoes.json'), tmp_path)
+    shutil.copytree(os.path.join(RAIZ, 'tide'), tmp_path / 'tide')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CEMADEN_EMAIL', 'a@b')
+    monkeypatch.setenv('CEMADEN_PASS', 'x')
+    monkeypatch.setattr(atualizar_dados.nowcast, 'URL_WEBHOOK', None)
+    metricas.iniciar('coleta', pasta=str(tmp_path / 'metricas'))
+    stub.token_valido = 'token-stub'
+    stub.falhas = {ESTACOES[-1]: [503] * 10}
+    try:
+        atualizar_dados.main()
+    finally:
+        metricas.iniciar('coleta', pasta='')
+
+    diarios = sorted(tmp_path.glob('chuva_recife_*.csv'))
+    assert diarios
+    df = pd.concat([pd.read_csv(f, dtype={'codestacao': str}) for f in diarios])
+    assert set(df['codestacao']) == set(ESTACOES[:-1])
+    assert (tmp_path / 'dados' / 'chuva').is_dir()
+    assert (tmp_path / 'dados' / 'risco_agora.json').exists()
+    assert (tmp_path / 'dados' / 'estado_alertas.json').exists()
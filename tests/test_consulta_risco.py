@@ -0,0 +1,124 @@
+"""Consultas indexadas ao histórico de risco (consulta_risco.py), contra o pandas."""
+import json
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+import pandas as pd
+import pytest
+import consulta_risco
+import historico_risco
+from classificacao_risco import classificar_risco
+
+ESTACOES = ['Campina do Barreto', 'Imbiribeira', 'RECIFE - APAC']
+
+def historico(inicio, horas, semente):
+    rng = np.random.default_rng(semente)
+    instantes = pd.date_range(inicio, periods=horas, freq='h')
+    df = pd.DataFrame([(t, e) for t in instantes for e in ESTACOES], columns=['datahora', 'nomeEstacao'])
+    df['data'] = df['datahora'].dt.strftime('%Y-%m-%d')
+    df['hora_ref'] = df['datahora'].dt.strftime('%H:00:00')
+    df['VP'] = (rng.random(len(df)) * 80).round(2)
+    df.loc[rng.random(len(df)) < 0.05, 'VP'] = np.nan
+    df['AM'] = (rng.random(len(df)) * 2).round(2)
+    df['Nivel_Risco_Valor'] = (df['VP'] * df['AM']).round(2)
+    df['Classificacao_Risco'] = classificar_risco(df['Nivel_Risco_Valor']).astype(object)
+    return df[historico_risco.COLUNAS_HISTORICO]
+
+@pytest.fixture
+def base(tmp_path):
+    raiz = str(tmp_path / 'risco')
+    df = historico('2026-01-29 00:00', 24 * 5, semente=1)
+    historico_risco.mesclar(df, raiz)
+    return raiz, df, consulta_risco.ConsultaRisco(raiz, pasta_indice=str(tmp_path / 'indice'))
+
+def test_por_estacao(base):
+    raiz, df, consulta = base
+    obtido = pd.DataFrame(consulta.por_estacao('Imbiribeira', '2026-01-31', '2026-02-01'))
+    esperado = df[(df['nomeEstacao'] == 'Imbiribeira') & df['data'].between('2026-01-31', '2026-02-01')]
+    esperado = esperado.sort_values(['data', 'hora_ref'], ignore_index=True)
+    # Atravessa a virada do mês em ordem cronológica
+    assert list(obtido['data'].unique()) == ['2026-01-31', '2026-02-01']
+    pd.testing.assert_frame_equal(obtido[historico_risco.COLUNAS_HISTORICO], esperado, check_dtype=False)
+    assert consulta.por_estacao('Inexistente') == []
+
+def test_horas_por_mes(base):
+    raiz, df, consulta = base
+    obtido = pd.DataFrame(consulta.horas_por_mes('Moderado Alto'))
+    alto = df[df['Classificacao_Risco'] == 'Moderado Alto']
+    esperado = alto.groupby([alto['data'].str[:7].rename('mes'), 'nomeEstacao']).size().rename('horas').reset_index()
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+    filtrado = consulta.horas_por_mes('Moderado Alto', estacao='Imbiribeira', de='2026-02-01')
+    assert filtrado == [{'mes': '2026-02', 'nomeEstacao': 'Imbiribeira',
+                         'horas': int(((alto['nomeEstacao'] == 'Imbiribeira') & (alto['data'] >= '2026-02-01')).sum())}]
+    with pytest.raises(ValueError):
+        consulta.horas_por_mes('Altíssimo')
+
+def test_piores_horas(base):
+    raiz, df, consulta = base
+    obtido = consulta.piores_horas(7)
+    esperado = df.dropna(subset=['Nivel_Risco_Valor']).sort_values(
+        ['Nivel_Risco_Valor', 'data', 'hora_ref'], ascending=False).head(7)
+    assert [(r['data'], r['hora_ref'], r['nomeEstacao'], r['Nivel_Risco_Valor']) for r in obtido] == \
+        list(esperado[['data', 'hora_ref', 'nomeEstacao', 'Nivel_Risco_Valor']].itertuples(index=False, name=None))
+    assert all(r['nomeEstacao'] == 'RECIFE - APAC' for r in consulta.piores_horas(3, estacao='RECIFE - APAC'))
+
+def test_nova_versao_do_historico_refaz_o_indice(base, tmp_path, monkeypatch):
+    raiz, df, consulta = base
+    antes = consulta.piores_horas(1)[0]
+    novo = df[(df['data'] == '2026-02-02') & (df['hora_ref'] == '05:00:00') & (df['nomeEstacao'] == 'Imbiribeira')].copy()
+    novo['VP'], novo['AM'], novo['Nivel_Risco_Valor'], novo['Classificacao_Risco'] = 999.0, 1.0, 999.0, 'Alto'
+    historico_risco.mesclar(novo, raiz)
+
+    depois = consulta.piores_horas(1)[0]
+    assert depois != antes
+    assert (depois['data'], depois['hora_ref'], depois['Nivel_Risco_Valor']) == ('2026-02-02', '05:00:00', 999.0)
+
+    # Outra instância reaproveita os índices salvos em disco, sem reler os CSVs
+    monkeypatch.setattr(historico_risco, 'ler_particao', lambda *a, **k: pytest.fail('CSV relido'))
+    outra = consulta_risco.ConsultaRisco(raiz, pasta_indice=str(tmp_path / 'indice'))
+    assert outra.piores_horas(1)[0] == depois
+
+def test_resposta_em_cache_nao_e_compartilhada(base):
+    raiz, df, consulta = base
+    primeira = consulta.por_estacao('Imbiribeira', '2026-01-30', '2026-01-30')
+    original = [dict(r) for r in primeira]
+    primeira[0]['VP'] = -1
+    primeira.append({'intruso': True})
+    assert consulta.por_estacao('Imbiribeira', '2026-01-30', '2026-01-30') == original
+    estacoes = consulta.estacoes()
+    estacoes.clear()
+    assert consulta.estacoes() == ESTACOES
+
+@pytest.fixture
+def servidor(base, tmp_path):
+    raiz, df, consulta = base
+    srv = consulta_risco._Servidor(('127.0.0.1', 0), {'recife': {'raiz_historico': raiz}})
+    srv.consultas = {'recife': consulta}
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+def pedir(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as res:
+            return res.status, json.loads(res.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_rotas_http(servidor, base):
+    raiz, df, consulta = base
+    assert pedir(f"{servidor}/estacoes") == (200, ESTACOES)
+    status, corpo = pedir(f"{servidor}/risco?estacao=Imbiribeira&de=2026-02-01&ate=2026-02-01")
+    assert status == 200 and len(corpo) == 24
+    assert pedir(f"{servidor}/horas-por-mes?classe=Alto&cidade=recife")[1] == consulta.horas_por_mes('Alto')
+    assert pedir(f"{servidor}/piores?n=5")[1] == consulta.piores_horas(5)
+
+    assert pedir(f"{servidor}/risco")[0] == 400
+    assert pedir(f"{servidor}/piores?n=0")[0] == 400
+    assert pedir(f"{servidor}/horas-por-mes?classe=Nenhum")[0] == 400
+    assert pedir(f"{servidor}/nada")[0] == 404
+    assert pedir(f"{servidor}/estacoes?cidade=olinda")[0] == 404
@@ -0,0 +1,30 @@
+"""Ingestão só de leituras novas nos CSVs diários (atualizar_dados.atualizar_csv_diario)."""
+import pandas as pd
+import atualizar_dados
+
+def lote(valores, inicio=0):
+    return pd.DataFrame({
+        'cidade': 'RECIFE', 'codestacao': '261160609A',
+        'datahora': [f"2026-08-20 10:{m:02d}:00" for m in range(inicio, inicio + 10 * len(valores), 10)],
+        'id_sensor': 10, 'latitude': -8.1, 'longitude': -34.9, 'nome': 'Imbiribeira',
+        'offset': None, 'qualificacao': 0, 'uf': 'PE', 'valor': valores,
+    })
+
+def test_criacao_acrescimo_e_correcao(tmp_path, capsys):
+    arquivo = str(tmp_path / 'chuva_recife_2026-08-20.csv')
+
+    assert len(atualizar_dados.atualizar_csv_diario(lote([0.0, 0.2]), arquivo)) == 2
+    assert 'criado. Total: 2 registros' in capsys.readouterr().out
+
+    assert len(atualizar_dados.atualizar_csv_diario(lote([0.0, 0.2, 0.4]), arquivo)) == 1
+    assert "atualizado (+1). Total: 3 registros" in capsys.readouterr().out
+
+    assert atualizar_dados.atualizar_csv_diario(lote([0.0, 0.2, 0.4]), arquivo).empty
+    assert 'sem leituras novas' in capsys.readouterr().out
+
+    diferencas = atualizar_dados.atualizar_csv_diario(lote([0.0, 0.6, 0.4, 0.8]), arquivo)
+    assert list(diferencas['valor']) == [0.6, 0.8]
+    assert 'reescrito com 1 correção(ões) (+1 novas). Total: 4 registros' in capsys.readouterr().out
+
+    df = pd.read_csv(arquivo)
+    assert list(df['valor']) == [0.0, 0.6, 0.4, 0.8]
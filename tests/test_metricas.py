@@ -0,0 +1,38 @@
+"""Relatório de métricas (metricas.py), inclusive sem o módulo resource (Windows)."""
+import sys
+import json
+import importlib
+import metricas
+
+def coletar(pasta):
+    metricas.iniciar('teste', pasta=str(pasta))
+    try:
+        with metricas.etapa('carregar', cidade='recife'):
+            metricas.contar('linhas_lidas', 10)
+        metricas.http('cemaden', 0.25, 200)
+        return metricas.exportar()
+    finally:
+        metricas.iniciar('teste', pasta='')
+
+def test_relatorio_e_prometheus(tmp_path):
+    relatorio = coletar(tmp_path)
+    etapa, = relatorio['etapas']
+    assert etapa['nome'] == 'carregar' and etapa['vezes'] == 1
+    # Pico do processo ao fim da etapa, não o consumo da etapa
+    assert etapa['pico_rss_processo_mb'] > 0
+    assert json.loads((tmp_path / 'teste.json').read_text(encoding='utf-8'))['http'][0]['requisicoes'] == 1
+    assert 'risco_hoje_pico_memoria_bytes' in (tmp_path / 'teste.prom').read_text(encoding='utf-8')
+
+def test_sem_resource(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'resource', None)  # import resource levanta ImportError
+    try:
+        importlib.reload(metricas)
+        assert metricas.resource is None
+        relatorio = coletar(tmp_path)
+        assert relatorio['pico_rss_mb'] is None
+        assert relatorio['etapas'][0]['pico_rss_processo_mb'] is None
+        prom = (tmp_path / 'teste.prom').read_text(encoding='utf-8')
+        assert 'pico_memoria_bytes' not in prom and 'etapa_segundos_total' in prom
+    finally:
+        monkeypatch.delitem(sys.modules, 'resource')
+        importlib.reload(metricas)
@@ -0,0 +1,105 @@
+"""Alertas do nowcast (nowcast.executar_nowcast) com saídas em memória e maré fixa."""
+import json
+import numpy as np
+import pandas as pd
+import nowcast
+
+AGORA = pd.Timestamp('2026-08-20 10:00:00')
+
+class MareFixa:
+    """Mesma altura em qualquer horário; guarda os horários consultados."""
+
+    def __init__(self, valor=1.0):
+        self.valor = valor
+        self.consultas = []
+
+    def consultar(self, datahoras, fora_do_intervalo='nan', na_hora_cheia=False):
+        self.consultas.append(pd.DatetimeIndex(datahoras))
+        return np.full(len(datahoras), self.valor)
+
+class SaidaInstavel(nowcast.SaidaMemoria):
+    def __init__(self, nome='instavel'):
+        super().__init__(nome)
+        self.fora_do_ar = True
+
+    def enviar(self, eventos):
+        if self.fora_do_ar:
+            raise ConnectionError('webhook fora do ar')
+        super().enviar(eventos)
+
+def cidade(tmp_path):
+    return {'slug': 'recife', 'nome': 'Recife', 'estado_alertas': str(tmp_path / 'estado_alertas.json'), 'alertas': str(tmp_path / 'alertas.jsonl')}
+
+def retrato(vp, minutos_atras=2):
+    datahora = (AGORA - pd.Timedelta(minutes=minutos_atras)).strftime('%Y-%m-%d %H:%M:%S')
+    return pd.DataFrame([{'codestacao': '261160609A', 'nomeEstacao': 'Imbiribeira', 'datahora': datahora, 'VP': vp}])
+
+def rodar(tmp_path, df_vp, saidas, minutos=0):
+    return nowcast.executar_nowcast(df_vp, MareFixa(), cidade(tmp_path), saidas=saidas, agora=AGORA + pd.Timedelta(minutes=minutos))
+
+def test_primeira_transicao(tmp_path):
+    memoria = nowcast.SaidaMemoria()
+    eventos = rodar(tmp_path, retrato(40.0), [memoria])
+
+    assert [(e['tipo'], e['de'], e['para']) for e in eventos] == [('atual', 'Baixo', 'Moderado'), ('previsto', 'Baixo', 'Moderado')]
+    assert memoria.eventos == eventos
+    assert eventos[0]['atraso_leitura_s'] == 120.0
+    estado = json.loads((tmp_path / 'estado_alertas.json').read_text(encoding='utf-8'))
+    assert estado['estacoes']['261160609A']['atual'] == 'Moderado'
+    assert estado['pendentes'] == {}
+
+def test_estado_inalterado_nao_repete(tmp_path):
+    memoria = nowcast.SaidaMemoria()
+    rodar(tmp_path, retrato(40.0), [memoria])
+    assert rodar(tmp_path, retrato(40.0), [memoria], minutos=5) == []
+    assert len(memoria.eventos) == 2
+
+    eventos = rodar(tmp_path, retrato(120.0), [memoria], minutos=10)
+    assert [(e['de'], e['para']) for e in eventos] == [('Moderado', 'Alto')] * 2
+    assert len(memoria.eventos) == 4
+
+def test_saida_com_falha_recebe_depois_sem_repetir_nas_outras(tmp_path):
+    arquivo = nowcast.SaidaArquivo(cidade(tmp_path)['alertas'])
+    instavel = SaidaInstavel()
+    eventos = rodar(tmp_path, retrato(40.0), [arquivo, instavel])
+
+    # Para a saída que falhou, nada avançou: os alertas ficam pendentes só para ela
+    estado = nowcast.carregar_estado(cidade(tmp_path)['estado_alertas'])
+    assert [e['id'] for e in estado['pendentes']['instavel']] == [e['id'] for e in eventos]
+    assert 'arquivo' not in estado['pendentes']
+
+    # Coleta seguinte ainda com falha: o arquivo não recebe os mesmos alertas de novo
+    assert rodar(tmp_path, retrato(40.0), [arquivo, instavel], minutos=5) == []
+    instavel.fora_do_ar = False
+    assert rodar(tmp_path, retrato(40.0), [arquivo, instavel], minutos=10) == []
+
+    linhas = (tmp_path / 'alertas.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(l)['id'] for l in linhas] == [e['id'] for e in eventos]
+    assert [e['id'] for e in instavel.eventos] == [e['id'] for e in eventos]
+    assert nowcast.carregar_estado(cidade(tmp_path)['estado_alertas'])['pendentes'] == {}
+
+def test_saida_unica_com_falha_reenvia_na_coleta_seguinte(tmp_path):
+    instavel = SaidaInstavel()
+    eventos = rodar(tmp_path, retrato(120.0), [instavel])
+    instavel.fora_do_ar = False
+    # A estação volta a Baixo antes da entrega: saem os alertas pendentes e os da volta
+    novos = rodar(tmp_path, retrato(5.0), [instavel], minutos=5)
+    assert [(e['de'], e['para']) for e in instavel.eventos] == [('Baixo', 'Alto')] * 2 + [('Alto', 'Baixo')] * 2
+    assert [e['id'] for e in instavel.eventos] == [e['id'] for e in eventos + novos]
+
+def test_grade_comeca_agora_e_leitura_atrasada_fica_fora(tmp_path):
+    mare = MareFixa()
+    df_vp = pd.concat([retrato(120.0, minutos_atras=180), retrato(40.0)], ignore_index=True)
+    df_vp.loc[1, 'codestacao'] = '261160603A'
+    projecao = nowcast.projetar(df_vp, mare, agora=AGORA)
+
+    assert mare.consultas[0][0] == AGORA
+    assert list(projecao['desatualizada']) == [True, False]
+    assert pd.isna(projecao.loc[0, 'classe_atual'])
+    assert (pd.to_datetime(projecao['previsto_para']) >= AGORA).all()
+
+    memoria = nowcast.SaidaMemoria()
+    nowcast.executar_nowcast(df_vp, mare, cidade(tmp_path), saidas=[memoria], agora=AGORA)
+    assert {e['codestacao'] for e in memoria.eventos} == {'261160603A'}
+    estado = nowcast.carregar_estado(cidade(tmp_path)['estado_alertas'])
+    assert set(estado['estacoes']) == {'261160603A'}
@@ -0,0 +1,29 @@
+"""Retrato do risco agora (vp_continuo.CalculadoraVPContinua.risco_agora)."""
+import numpy as np
+import pandas as pd
+import vp_continuo
+
+class MareFixa:
+    def consultar(self, datahoras, fora_do_intervalo='nan', na_hora_cheia=False):
+        return np.full(len(datahoras), 1.0)
+
+def leituras(cod, nome, inicio, n):
+    base = pd.Timestamp(inicio)
+    return pd.DataFrame({
+        'codestacao': cod, 'nome': nome, 'valor': 5.0,
+        'datahora': [(base + pd.Timedelta(minutes=10 * i)).strftime('%Y-%m-%d %H:%M:%S') for i in range(n)],
+    })
+
+def test_estacao_parada_sai_sem_classe():
+    calc = vp_continuo.CalculadoraVPContinua()
+    calc.atualizar(pd.concat([leituras('A', 'Ativa', '2026-08-20 09:00', 7), leituras('P', 'Parada', '2026-08-20 06:00', 7)]))
+    df = calc.risco_agora(MareFixa(), agora=pd.Timestamp('2026-08-20 10:05:00')).set_index('codestacao')
+
+    assert df.loc['A', 'atraso_leitura_s'] == 300.0
+    assert not df.loc['A', 'desatualizada']
+    assert df.loc['A', 'Classificacao_Risco'] == 'Moderado Alto'
+    # A parada mantém o último VP como informação, mas não é mais "risco agora"
+    assert df.loc['P', 'desatualizada']
+    assert df.loc['P', 'VP'] == df.loc['A', 'VP']
+    assert pd.isna(df.loc['P', 'Classificacao_Risco'])
+    assert pd.isna(df.loc['P', 'Nivel_Risco_Valor'])
@@ -0,0 +1,181 @@
+"""
+VP contínuo: mantém, por estação, um buffer circular com as leituras das últimas 2 horas
+(persistido entre execuções) e atualiza VP e risco a cada lote de 5 minutos sem recalcular
+o dia inteiro. Ao fim de cada atualização grava um retrato do "risco agora" para o painel.
+Estação cuja última leitura tem mais de ATRASO_MAXIMO_S sai do retrato marcada como
+desatualizada e sem classe de risco, em vez de repetir o último risco indefinidamente.
+
+As janelas seguem as mesmas regras do cálculo horário (calculo_vp): 10 min e 2 h fechadas
+à direita e sem atravessar a meia-noite.
+"""
+import os
+import sys
+import json
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+import armazem_chuva
+import indice_mare
+from classificacao_risco import classificar_risco
+
+ARQUIVO_ESTADO = os.path.join('dados', 'estado_vp.json')
+ARQUIVO_RISCO_AGORA = os.path.join('dados', 'risco_agora.json')
+JANELA_10MIN_S = 10 * 60
+JANELA_2H_S = 2 * 3600
+FORMATO_DATAHORA = '%Y-%m-%d %H:%M:%S'
+# Uma estação em dia mede de 10 em 10 min, e a leitura pode chegar uma coleta (5 min) depois
+ATRASO_MAXIMO_S = float(os.getenv('RISCO_ATRASO_MAXIMO_S', str(15 * 60)))
+
+def _epoch(datahora):
+    return int(pd.Timestamp(datahora).value // 10**9)
+
+def _texto(epoch_s):
+    return pd.Timestamp(epoch_s, unit='s').strftime(FORMATO_DATAHORA)
+
+def agora_local():
+    return pd.Timestamp.now(tz='America/Recife').tz_localize(None)
+
+def atraso_leitura(datahoras, agora=None):
+    """Segundos entre cada leitura (horário local) e `agora` (padrão: o horário local atual)."""
+    agora = agora_local() if agora is None else pd.Timestamp(agora)
+    return (agora - pd.to_datetime(pd.Series(datahoras))).dt.total_seconds().to_numpy()
+
+class CalculadoraVPContinua:
+    def __init__(self, estacoes=None):
+        # codestacao -> {'nome': str, 'leituras': deque[(epoch_s, valor)] em ordem de horário}
+        self.estacoes = estacoes or {}
+
+    @classmethod
+    def carregar(cls, caminho=ARQUIVO_ESTADO):
+        if not os.path.exists(caminho):
+            return None
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                bruto = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Aviso: estado do VP ilegível ({e}).", file=sys.stderr)
+            return None
+        return cls({cod: {'nome': e['nome'], 'leituras': deque((int(t), v) for t, v in e['leituras'])}
+                    for cod, e in bruto.get('estacoes', {}).items()})
+
+    @classmethod
+    def a_partir_do_armazem(cls, data, raiz=armazem_chuva.RAIZ_ARMAZEM):
+        """Reconstrói o estado a partir das leituras do dia no armazém (quando não há estado salvo)."""
+        calc = cls()
+        calc.atualizar(armazem_chuva.carregar_chuva(data, raiz=raiz))
+        return calc
+
+    def salvar(self, caminho=ARQUIVO_ESTADO):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        bruto = {'estacoes': {cod: {'nome': e['nome'], 'leituras': [list(l) for l in e['leituras']]}
+                              for cod, e in sorted(self.estacoes.items())}}
+        tmp = f"{caminho}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(bruto, f, ensure_ascii=False)
+        os.replace(tmp, caminho)
+
+    def _inserir(self, estado, t, valor):
+        leituras = estado['leituras']
+        if not leituras or t > leituras[-1][0]:
+            leituras.append((t, valor))
+            return
+        # Leitura atrasada ou corrigida: insere na posição certa (o buffer é pequeno)
+        itens = [l for l in leituras if l[0] != t] + [(t, valor)]
+        itens.sort(key=lambda l: l[0])
+        leituras.clear()
+        leituras.extend(itens)
+
+    def _podar(self, estado):
+        """Descarta leituras fora da janela de 2 h ou de um dia anterior ao da última leitura."""
+        leituras = estado['leituras']
+        if not leituras:
+            return
+        ultimo = leituras[-1][0]
+        inicio_dia = ultimo - ultimo % 86400
+        limite = max(ultimo - JANELA_2H_S, inicio_dia - 1)
+        while leituras and leituras[0][0] <= limite:
+            leituras.popleft()
+
+    def atualizar(self, df_leituras):
+        """Incorpora um lote de leituras (colunas dos CSVs do CEMADEN); custo proporcional ao lote."""
+        if df_leituras is None or df_leituras.empty:
+            return
+        tocadas = set()
+        for cod, nome, datahora, valor in zip(df_leituras['codestacao'].astype(str), df_leituras['nome'],
+                                              df_leituras['datahora'], pd.to_numeric(df_leituras['valor'], errors='coerce')):
+            estado = self.estacoes.setdefault(cod, {'nome': nome, 'leituras': deque()})
+            estado['nome'] = nome
+            t = _epoch(datahora)
+            # Leituras mais velhas que a janela atual não mudam o VP de agora
+            if estado['leituras'] and t <= estado['leituras'][-1][0] - JANELA_2H_S:
+                continue
+            self._inserir(estado, t, None if pd.isna(valor) else float(valor))
+            tocadas.add(cod)
+        for cod in tocadas:
+            self._podar(self.estacoes[cod])
+
+    def vp_atual(self):
+        """VP na última leitura de cada estação: DataFrame com uma linha por estação."""
+        linhas = []
+        for cod, estado in sorted(self.estacoes.items()):
+            leituras = estado['leituras']
+            if not leituras:
+                continue
+            ultimo = leituras[-1][0]
+            v10 = [v for t, v in leituras if t > ultimo - JANELA_10MIN_S and v is not None]
+            v2h = [v for t, v in leituras if t > ultimo - JANELA_2H_S and v is not None]
+            chuva_10min = math.fsum(v10) if v10 else np.nan
+            chuva_2h = math.fsum(v2h) if v2h else np.nan
+            linhas.append({
+                'codestacao': cod, 'nomeEstacao': estado['nome'], 'datahora': _texto(ultimo),
+                'chuva_10min': chuva_10min, 'chuva_2h': chuva_2h, 'VP': chuva_10min * 6 + chuva_2h,
+            })
+        return pd.DataFrame(linhas)
+
+    def risco_agora(self, indice, agora=None):
+        """
+        VP atual combinado com a maré no horário da última leitura e classificado. Estações
+        com leitura mais antiga que ATRASO_MAXIMO_S ficam com `desatualizada` e sem classe.
+        """
+        df = self.vp_atual()
+        if df.empty:
+            return df
+        df['AM'] = indice.consultar(pd.to_datetime(df['datahora']), fora_do_intervalo='nan', na_hora_cheia=False)
+        df['Nivel_Risco_Valor'] = (df['VP'] * df['AM']).round(2)
+        df['Classificacao_Risco'] = classificar_risco(df['Nivel_Risco_Valor']).astype(object)
+        df['atraso_leitura_s'] = atraso_leitura(df['datahora'], agora).round(1)
+        df['desatualizada'] = ~(df['atraso_leitura_s'] <= ATRASO_MAXIMO_S)
+        df.loc[df['desatualizada'], ['Nivel_Risco_Valor', 'Classificacao_Risco']] = None
+        return df
+
+def salvar_risco_agora(df_risco, caminho=ARQUIVO_RISCO_AGORA):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    registros = json.loads(df_risco.to_json(orient='records', force_ascii=False)) if not df_risco.empty else []
+    retrato = {'gerado_em': pd.Timestamp.now(tz='America/Recife').strftime(FORMATO_DATAHORA), 'estacoes': registros}
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(retrato, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, caminho)
+    return retrato
+
+def carregar_risco_agora(caminho=ARQUIVO_RISCO_AGORA):
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def atualizar_risco_agora(df_novas, data_hoje, indice=None, raiz=armazem_chuva.RAIZ_ARMAZEM,
+                          caminho_estado=ARQUIVO_ESTADO, caminho_retrato=ARQUIVO_RISCO_AGORA):
+    """
+    Passo chamado a cada coleta: carrega o estado (ou o reconstrói do armazém),
+    aplica as leituras novas, salva o estado e o retrato do risco agora.
+    """
+    calc = CalculadoraVPContinua.carregar(caminho_estado)
+    if calc is None:
+        calc = CalculadoraVPContinua.a_partir_do_armazem(data_hoje, raiz)
+    else:
+        calc.atualizar(df_novas)
+    calc.salvar(caminho_estado)
+    df_risco = calc.risco_agora(indice or indice_mare.carregar_indice())
+    return salvar_risco_agora(df_risco, caminho_retrato)